@@ -20,9 +20,14 @@ from .helpers import collection_name
 from .helpers import model_for
 from .helpers import serializer_for
 from .helpers import url_for
+from .invalidation import InvalidationBus
+from .invalidation import Transport
 from .helpers import primary_key_for
+from .jsoncodecs import JSONCodec
 from .manager import APIManager
 from .manager import IllegalArgumentError
+from .search import FilterLimits
+from .search import TextSearch
 from .serialization import DefaultDeserializer
 from .serialization import DefaultSerializer
 from .serialization import DeserializationException
@@ -31,7 +36,12 @@ from .serialization import SerializationException
 from .serialization import simple_serialize
 from .serialization import simple_serialize_many
 from .views import CONTENT_TYPE
+from .views import CountStrategy
 from .views import ProcessingException
+from .views import QueryCache
+from .views import ResponseCache
+from .views import Timing
+from .views import Validator
 
 #: The current version of this extension.
 #:
@@ -43,17 +53,27 @@ __all__ = [
     'APIManager',
     'collection_name',
     'CONTENT_TYPE',
+    'CountStrategy',
     'DefaultDeserializer',
     'DefaultSerializer',
     'DeserializationException',
+    'FilterLimits',
     'IllegalArgumentError',
+    'InvalidationBus',
+    'JSONCodec',
     'model_for',
     'MultipleExceptions',
     'primary_key_for',
     'ProcessingException',
+    'QueryCache',
+    'ResponseCache',
     'SerializationException',
     'serializer_for',
+    'TextSearch',
+    'Timing',
+    'Transport',
     'simple_serialize',
     'simple_serialize_many',
     'url_for',
+    'Validator',
 ]
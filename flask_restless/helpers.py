@@ -22,19 +22,31 @@ model.
    https://docs.sqlalchemy.org/en/latest/core/inspection.html
 
 """
+from collections import OrderedDict
 import datetime
 import inspect
+from threading import Lock
 
 from dateutil.parser import parse as parse_datetime
 from sqlalchemy import Date
 from sqlalchemy import DateTime
+from sqlalchemy import event
 from sqlalchemy import Interval
 from sqlalchemy import Time
 from sqlalchemy.exc import NoInspectionAvailable
 from sqlalchemy.ext.associationproxy import AssociationProxy
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.orm import Mapper
+from sqlalchemy.orm import object_session
 from sqlalchemy.orm import RelationshipProperty as RelProperty
+from sqlalchemy.orm.exc import UnmappedColumnError
+from sqlalchemy.orm.interfaces import MANYTOONE
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.sql import func
 from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.util import ClauseAdapter
 from sqlalchemy.inspection import inspect as sqlalchemy_inspect
 from werkzeug.urls import url_quote_plus
 
@@ -43,6 +55,107 @@ from werkzeug.urls import url_quote_plus
 #: value of the field.
 CURRENT_TIME_MARKERS = ('CURRENT_TIMESTAMP', 'CURRENT_DATE', 'LOCALTIMESTAMP')
 
+#: The maximum number of primary key values to place in the ``IN``
+#: clause of a single query issued by :func:`load_relationship`.
+#:
+#: Some database backends, notably SQLite, limit the number of bound
+#: parameters in a single statement.
+LOAD_BATCH_SIZE = 500
+
+
+class ModelMetadata(object):
+    """Introspection information about a SQLAlchemy model class.
+
+    Use the :func:`model_metadata` function to get the instance of this
+    class for a given model; the information is computed once for each
+    model and discarded whenever SQLAlchemy configures new mappers,
+    since configuring a mapper may add relationships (for example, via
+    backrefs) to other models.
+
+    Attributes that depend only on the model are computed when the
+    object is created. Attributes that depend on the name of a field
+    are dictionaries, filled by the helper functions in this module the
+    first time they are asked about each field.
+
+    """
+
+    __slots__ = ('model', 'mapper', 'relations', 'relationship_names',
+                 'primary_key_names', 'foreign_key_columns', 'foreign_keys',
+                 'related_models', 'like_list', 'fields', 'field_types',
+                 'to_one_foreign_keys')
+
+    def __init__(self, model):
+        # Make sure that relationships defined via backrefs on other
+        # models are visible before inspecting this one.
+        configure_mappers()
+        mapper = sqlalchemy_inspect(model)
+        self.model = model
+        self.mapper = mapper
+        # If we didn't have to deal with association proxies, we could
+        # just use `list(mapper.relationships)`, but we want to replace
+        # all association attributes with the actual remote attributes,
+        # as the user would expect. Therefore, we get a dictionary
+        # mapping relationship name to association proxy local attribute
+        # name, then replace the key with the value wherever such a key
+        # appears in the list of relationships.
+        alldescriptors = mapper.all_orm_descriptors.items()
+        # TODO In Python 2.7+, this should be a dict comprehension.
+        association_proxies = dict((v.local_attr.key, k)
+                                   for k, v in alldescriptors
+                                   if isinstance(v, AssociationProxy))
+        relationship_names = mapper.relationships.keys()
+        self.relations = tuple(association_proxies.get(r, r)
+                               for r in relationship_names)
+        self.relationship_names = frozenset(relationship_names)
+        self.primary_key_names = tuple(column.name
+                                       for column in mapper.primary_key)
+        self.foreign_key_columns = tuple(c for c in mapper.columns
+                                         if c.foreign_keys)
+        self.foreign_keys = tuple(c.name for c in self.foreign_key_columns)
+        # The remaining attributes are mappings keyed by field name,
+        # filled in by the corresponding helper functions.
+        self.related_models = {}
+        self.like_list = {}
+        self.fields = {}
+        self.field_types = {}
+        self.to_one_foreign_keys = {}
+
+
+#: The :class:`ModelMetadata` object for each model class for which one
+#: has been requested from :func:`model_metadata`.
+_model_metadata = {}
+
+
+def model_metadata(model):
+    """Returns the :class:`ModelMetadata` object for the specified
+    SQLAlchemy model class.
+
+    This function raises :exc:`sqlalchemy.exc.NoInspectionAvailable` if
+    `model` is not a mapped class.
+
+    """
+    try:
+        return _model_metadata[model]
+    except KeyError:
+        metadata = ModelMetadata(model)
+        _model_metadata[model] = metadata
+        return metadata
+
+
+def _clear_model_metadata(*args):
+    """Discards all :class:`ModelMetadata` objects, so that they are
+    recomputed the next time they are requested.
+
+    This function is called whenever a new class is mapped and whenever
+    mappers are configured.
+
+    """
+    _model_metadata.clear()
+
+
+event.listen(Mapper, 'instrument_class', _clear_model_metadata)
+event.listen(Mapper, 'after_configured', _clear_model_metadata)
+
 
 def session_query(session, model):
     """Returns a SQLAlchemy query object for the specified `model`.
@@ -99,19 +212,7 @@ def get_relations(model):
         ['tags']
 
     """
-    mapper = sqlalchemy_inspect(model)
-    # If we didn't have to deal with association proxies, we could just
-    # do `return list(mapper.relationships)`, but we want to replace all
-    # association attributes with the actual remote attributes, as the
-    # user would expect. Therefore, we get a dictionary mapping
-    # relationship name to association proxy local attribute name, then
-    # replace the key with the value wherever such a key appears in the
-    # list of relationships.
-    alldescriptors = mapper.all_orm_descriptors.items()
-    # TODO In Python 2.7+, this should be a dict comprehension.
-    association_proxies = dict((v.local_attr.key, k) for k, v in alldescriptors
-                               if isinstance(v, AssociationProxy))
-    return [association_proxies.get(r, r) for r in mapper.relationships.keys()]
+    return list(model_metadata(model).relations)
 
 
 def get_related_model(model, relationname):
@@ -142,12 +243,16 @@ def get_related_model(model, relationname):
     the model of the proxied remote relation.
 
     """
-    mapper = sqlalchemy_inspect(model)
-    attribute = mapper.all_orm_descriptors[relationname]
+    metadata = model_metadata(model)
+    if relationname in metadata.related_models:
+        return metadata.related_models[relationname]
+    attribute = metadata.mapper.all_orm_descriptors[relationname]
     # HACK This is required for Python 3.3 only. I'm guessing it lazily
     # loads the attribute or something like that.
     hasattr(model, relationname)
-    return get_related_model_from_attribute(attribute)
+    related_model = get_related_model_from_attribute(attribute)
+    metadata.related_models[relationname] = related_model
+    return related_model
 
 
 def get_related_model_from_attribute(attribute):
@@ -172,8 +277,7 @@ def foreign_key_columns(model):
     foreign keys for relationships in the specified model class.
 
     """
-    mapper = sqlalchemy_inspect(model)
-    return [c for c in mapper.columns if c.foreign_keys]
+    return list(model_metadata(model).foreign_key_columns)
 
 
 def foreign_keys(model):
@@ -181,7 +285,66 @@ def foreign_keys(model):
     relationships in the specified model class.
 
     """
-    return [column.name for column in foreign_key_columns(model)]
+    return list(model_metadata(model).foreign_keys)
+
+
+def to_one_foreign_key(model, relationname):
+    """Returns the pair of attribute names that link a many-to-one
+    relationship to the related model, or ``None``.
+
+    If the relationship of `model` named `relationname` is a many-to-one
+    relationship defined by a single column with a foreign key constraint
+    that references a column of a related model that does not participate
+    in an inheritance hierarchy, this function returns a two-tuple whose
+    elements are the name of the attribute of `model` that holds the
+    foreign key value and the name of the attribute of the related model
+    that it references. In this case, the primary key of the related
+    instance can be read directly from the foreign key attribute, without
+    loading the related instance.
+
+    In all other cases, including association proxies and relationships
+    whose join condition is not backed by a foreign key constraint, this
+    function returns ``None``. Without a constraint, the foreign key
+    value may refer to a row that does not exist, and only loading the
+    related instance reveals that the relationship is null.
+
+    """
+    metadata = model_metadata(model)
+    if relationname not in metadata.mapper.relationships:
+        return None
+    if relationname not in metadata.to_one_foreign_keys:
+        result = _to_one_foreign_key(metadata.mapper, relationname)
+        metadata.to_one_foreign_keys[relationname] = result
+    return metadata.to_one_foreign_keys[relationname]
+
+
+def _to_one_foreign_key(mapper, relationname):
+    """Computes the return value of :func:`to_one_foreign_key` for the
+    model whose mapper is `mapper`.
+
+    """
+    prop = mapper.relationships[relationname]
+    if prop.direction is not MANYTOONE or prop.uselist:
+        return None
+    if prop.secondary is not None or len(prop.local_remote_pairs) != 1:
+        return None
+    # The type of the related instance cannot be known without loading
+    # it if the related model is polymorphic.
+    related_mapper = prop.mapper
+    if (related_mapper.polymorphic_on is not None or
+            related_mapper.inherits is not None or
+            len(related_mapper.self_and_descendants) > 1):
+        return None
+    local_column, remote_column = prop.local_remote_pairs[0]
+    if not any(foreign_key.column is remote_column
+               for foreign_key in local_column.foreign_keys):
+        return None
+    try:
+        local_attr = mapper.get_property_by_column(local_column).key
+        remote_attr = related_mapper.get_property_by_column(remote_column).key
+    except UnmappedColumnError:
+        return None
+    return local_attr, remote_attr
 
 
 def has_field(model, fieldname):
@@ -189,13 +352,25 @@ def has_field(model, fieldname):
     settable hybrid property for this field name.
 
     """
-    mapper = sqlalchemy_inspect(model)
+    metadata = model_metadata(model)
+    # Field names may come from the client, so only the names of actual
+    # descriptors are remembered; otherwise the mapping would grow
+    # without bound.
+    if fieldname not in metadata.mapper.all_orm_descriptors:
+        return False
+    if fieldname not in metadata.fields:
+        metadata.fields[fieldname] = _has_field(metadata, fieldname)
+    return metadata.fields[fieldname]
+
+
+def _has_field(metadata, fieldname):
+    """Computes the return value of :func:`has_field` for the model
+    described by the :class:`ModelMetadata` object `metadata`.
+
+    """
     # Get all descriptors, which include columns, relationships, and
     # other things like association proxies and hybrid properties.
-    descriptors = mapper.all_orm_descriptors
-    if fieldname not in descriptors:
-        return False
-    field = descriptors[fieldname]
+    field = metadata.mapper.all_orm_descriptors[fieldname]
     # First, we check whether `fieldname` specifies a settable hybrid
     # property. This is a bit flimsy: we check whether the `fset`
     # attribute has been set on the `hybrid_property` instance. The
@@ -204,7 +379,7 @@ def has_field(model, fieldname):
     if hasattr(field, 'fset'):
         return field.fset is not None
     # At this point, we simply check that the attribute is not callable.
-    return not callable(getattr(model, fieldname))
+    return not callable(getattr(metadata.model, fieldname))
 
 
 def is_relationship(model, fieldname):
@@ -220,8 +395,7 @@ def is_relationship(model, fieldname):
     proxies.
 
     """
-    mapper = sqlalchemy_inspect(model)
-    return fieldname in mapper.relationships
+    return fieldname in model_metadata(model).relationship_names
 
 
 def get_field_type(model, fieldname):
@@ -231,6 +405,15 @@ def get_field_type(model, fieldname):
     specifies a hybrid property, this function returns `None`.
 
     """
+    metadata = model_metadata(model)
+    if fieldname not in metadata.field_types:
+        field_type = _get_field_type(model, fieldname)
+        metadata.field_types[fieldname] = field_type
+    return metadata.field_types[fieldname]
+
+
+def _get_field_type(model, fieldname):
+    """Computes the return value of :func:`get_field_type`."""
     field = getattr(model, fieldname)
     if isinstance(field, ColumnElement):
         return field.type
@@ -250,8 +433,7 @@ def primary_key_names(model):
     The returned list contains the name of each primary key as a string.
 
     """
-    mapper = sqlalchemy_inspect(model)
-    return [column.name for column in mapper.primary_key]
+    return list(model_metadata(model).primary_key_names)
 
 
 def primary_key_value(instance, as_string=False):
@@ -293,11 +475,130 @@ def is_like_list(model_or_instance, relationname):
         model = get_model(model_or_instance)
     else:
         model = model_or_instance
+    metadata = model_metadata(model)
+    if relationname not in metadata.like_list:
+        relation = metadata.mapper.all_orm_descriptors[relationname]
+        if isinstance(relation, AssociationProxy):
+            relation = relation.local_attr
+        metadata.like_list[relationname] = relation.property.uselist
+    return metadata.like_list[relationname]
+
+
+def load_relationship(instances, relationname):
+    """Loads the relationship named `relationname` for each of the given
+    instances of a SQLAlchemy model using one query for all of them.
+
+    `instances` is a list of instances of a single SQLAlchemy model
+    class. Lazily loading a relationship on each instance separately
+    requires one query per instance; this function instead issues a
+    single query that selects the related instances of all the parent
+    instances by primary key (or a few queries, if there are more than
+    :data:`LOAD_BATCH_SIZE` instances), then populates the relationship
+    attribute of each instance as if it had been loaded by SQLAlchemy.
+
+    Instances on which the relationship has already been loaded are
+    ignored. This function does nothing for association proxies, for
+    relationships that are not lazily loaded (for example, those
+    configured with ``lazy='dynamic'``), for models with a composite
+    primary key, and for instances that have not been persisted; in
+    those cases the relationship is simply loaded on attribute access as
+    usual.
+
+    Related instances are ordered by the ``order_by`` argument of the
+    relationship, if it has one, and by primary key otherwise.
+
+    For a many-to-one relationship that references the primary key of
+    the related model (as determined by :func:`to_one_foreign_key`),
+    related instances are looked up by the foreign key value of each
+    instance, and only those that are not already present in the session
+    are selected from the database.
+
+    """
+    if not instances:
+        return
+    model = get_model(instances[0])
     mapper = sqlalchemy_inspect(model)
-    relation = mapper.all_orm_descriptors[relationname]
-    if isinstance(relation, AssociationProxy):
-        relation = relation.local_attr
-    return relation.property.uselist
+    if relationname not in mapper.relationships:
+        return
+    prop = mapper.relationships[relationname]
+    if prop.lazy not in (True, 'select'):
+        return
+    if len(mapper.primary_key) != 1:
+        return
+    # Only instances that have been persisted to the database have a
+    # primary key by which to select their related instances.
+    states = map(sqlalchemy_inspect, instances)
+    instances = [state.obj() for state in states
+                 if state.persistent and relationname in state.unloaded]
+    if not instances:
+        return
+    session = object_session(instances[0])
+    foreign_key = to_one_foreign_key(model, relationname)
+    if foreign_key is not None:
+        local_attr, remote_attr = foreign_key
+        related_model = prop.mapper.class_
+        if primary_key_names(related_model) == [remote_attr]:
+            _load_to_one(session, instances, relationname, related_model,
+                         local_attr, remote_attr)
+            return
+    # Use an alias for the related model, in case the relationship is
+    # self-referential.
+    related_model = aliased(prop.mapper.class_)
+    adapter = ClauseAdapter(sqlalchemy_inspect(related_model).selectable)
+    if prop.order_by:
+        order_by = [adapter.traverse(c) for c in prop.order_by]
+    else:
+        order_by = [adapter.traverse(c) for c in prop.mapper.primary_key]
+    pk_attr = mapper.get_property_by_column(mapper.primary_key[0]).key
+    primary_key = getattr(model, pk_attr)
+    relation = getattr(model, relationname).of_type(related_model)
+    query = session.query(primary_key, related_model).select_from(model)
+    query = query.join(related_model, relation).order_by(*order_by)
+    # TODO In Python 2.7+, this should be a dict comprehension.
+    related = dict((getattr(instance, pk_attr), []) for instance in instances)
+    pk_values = list(related)
+    for i in range(0, len(pk_values), LOAD_BATCH_SIZE):
+        batch = pk_values[i:i + LOAD_BATCH_SIZE]
+        for pk_value, related_instance in query.filter(primary_key.in_(batch)):
+            related[pk_value].append(related_instance)
+    for instance in instances:
+        value = related[getattr(instance, pk_attr)]
+        if not prop.uselist:
+            value = value[0] if value else None
+        set_committed_value(instance, relationname, value)
+
+
+def _load_to_one(session, instances, relationname, related_model, local_attr,
+                 remote_attr):
+    """Loads a many-to-one relationship for each of the given instances,
+    as described in :func:`load_relationship`.
+
+    `local_attr` is the name of the foreign key attribute of the
+    instances and `remote_attr` is the name of the primary key attribute
+    of `related_model` that it references.
+
+    """
+    identity_map = session.identity_map
+    related = {}
+    missing = []
+    for value in set(getattr(instance, local_attr) for instance in instances):
+        if value is None:
+            continue
+        key = identity_key(related_model, value)
+        related_instance = identity_map.get(key)
+        if related_instance is None:
+            missing.append(value)
+        else:
+            related[value] = related_instance
+    primary_key = getattr(related_model, remote_attr)
+    query = session.query(related_model)
+    for i in range(0, len(missing), LOAD_BATCH_SIZE):
+        batch = missing[i:i + LOAD_BATCH_SIZE]
+        for related_instance in query.filter(primary_key.in_(batch)):
+            related[getattr(related_instance, remote_attr)] = related_instance
+    for instance in instances:
+        value = related.get(getattr(instance, local_attr))
+        set_committed_value(instance, relationname, value)
 
 
 def is_mapped_class(cls):
@@ -305,6 +606,8 @@ def is_mapped_class(cls):
     a mapped class.
 
     """
+    if cls in _model_metadata:
+        return True
     try:
         sqlalchemy_inspect(cls)
     except NoInspectionAvailable:
@@ -387,6 +690,77 @@ def get_model(instance):
     return type(instance)
 
 
+class LRUCache(object):
+    """A mapping with a bounded number of entries that evicts the least
+    recently used entry when it is full.
+
+    `maxsize` is the maximum number of entries to keep. If `maxsize` is
+    ``None``, the cache grows without bound.
+
+    Instances of this class are safe to share among threads.
+
+    """
+
+    def __init__(self, maxsize=128):
+        #: The maximum number of entries kept in this cache.
+        self.maxsize = maxsize
+
+        #: The number of successful lookups performed on this cache.
+        self.hits = 0
+
+        #: The number of unsuccessful lookups performed on this cache.
+        self.misses = 0
+
+        # TODO In Python 3.2+, we can use `OrderedDict.move_to_end()`
+        # instead of popping and reinserting keys.
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Returns the value stored under `key`, or `default` if there
+        is no such key.
+
+        A successful lookup marks the entry as the most recently used.
+
+        """
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Removes the entry for `key` and returns its value, or
+        `default` if there is no such key.
+
+        """
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        """Removes all entries from this cache."""
+        with self._lock:
+            self._data.clear()
+
+
 # This code comes from <http://stackoverflow.com/a/6798042/108197>, which is
 # licensed under the Creative Commons Attribution-ShareAlike License version
 # 3.0 Unported.
@@ -416,6 +790,111 @@ class Singleton(_Singleton('SingletonMeta', (object,), {})):
     pass
 
 
+class APIRegistry(object):
+    """A global index of the APIs created by all :class:`APIManager`
+    objects.
+
+    This index backs the :func:`url_for`, :func:`model_for`,
+    :func:`collection_name`, :func:`serializer_for`, and
+    :func:`primary_key_for` functions, so that each lookup requires only
+    a dictionary access instead of a search through each
+    :class:`APIManager`.
+
+    The :class:`APIManager` objects themselves are stored in the set
+    :attr:`managers`. APIs created by a manager that has been removed
+    from that set are ignored and eventually removed from the index.
+
+    """
+
+    def __init__(self):
+        #: The set of registered :class:`APIManager` objects.
+        self.managers = set()
+
+        #: A mapping from model to a list of pairs of the form
+        #: ``(manager, info)``, where `info` is the :class:`APIInfo`
+        #: describing the API created by `manager` for the model.
+        self.apis = {}
+
+        #: A mapping from collection name to a list of pairs of the form
+        #: ``(manager, model)``, where `model` is the model for which
+        #: `manager` created an API with that collection name.
+        self.models = {}
+
+    def register(self, apimanager):
+        """Inform this object about the specified :class:`APIManager`
+        object.
+
+        """
+        self.managers.add(apimanager)
+        # Take this opportunity to forget the APIs of managers that
+        # have been removed from the set of known managers.
+        for index in self.apis, self.models:
+            for key, entries in list(index.items()):
+                entries = [e for e in entries if e[0] in self.managers]
+                if entries:
+                    index[key] = entries
+                else:
+                    del index[key]
+
+    def add_api(self, apimanager, model, info):
+        """Inform this object that the specified :class:`APIManager`
+        object has created an API for `model`, as described by the
+        :class:`APIInfo` object `info`.
+
+        If `apimanager` has previously created an API for `model`, this
+        replaces it.
+
+        """
+        entries = self.apis.setdefault(model, [])
+        for manager, old_info in entries:
+            if manager is apimanager:
+                entries.remove((manager, old_info))
+                old_models = self.models[old_info.collection_name]
+                old_models.remove((manager, model))
+                break
+        entries.append((apimanager, info))
+        self.models.setdefault(info.collection_name, []).append((apimanager,
+                                                                 model))
+
+    def _lookup(self, index, key):
+        """Returns the first entry for `key` in `index` whose manager is
+        still known to this object, or ``None`` if there is no such
+        entry.
+
+        """
+        entries = index.get(key)
+        if not entries:
+            return None
+        if entries[0][0] in self.managers:
+            return entries[0]
+        entries[:] = [e for e in entries if e[0] in self.managers]
+        return entries[0] if entries else None
+
+    def api_for(self, model):
+        """Returns a pair of the form ``(manager, info)``, where
+        `manager` is an :class:`APIManager` that has created an API for
+        `model` and `info` is the :class:`APIInfo` describing that API.
+
+        If no API has been created for `model`, this returns ``None``.
+
+        """
+        return self._lookup(self.apis, model)
+
+    def model_for(self, collection_name):
+        """Returns a pair of the form ``(manager, model)``, where
+        `manager` is an :class:`APIManager` that has created an API with
+        the given collection name for `model`.
+
+        If no such API has been created, this returns ``None``.
+
+        """
+        return self._lookup(self.models, collection_name)
+
+
+#: The global index of created APIs.
+api_registry = APIRegistry()
+
+
 class KnowsAPIManagers:
     """An object that allows client code to register :class:`APIManager`
     objects.
@@ -423,14 +902,26 @@ class KnowsAPIManagers:
     """
 
     def __init__(self):
-        #: A global list of created :class:`APIManager` objects.
-        self.created_managers = set()
+        #: A global set of created :class:`APIManager` objects.
+        #:
+        #: This set is shared by all objects of this class.
+        self.created_managers = api_registry.managers
 
     def register(self, apimanager):
         """Inform this object about the specified :class:`APIManager` object.
 
         """
-        self.created_managers.add(apimanager)
+        api_registry.register(apimanager)
+
+
+def _unknown_model_message(model):
+    """Returns the message of the exception raised when no API has been
+    created for `model`.
+
+    """
+    return ('Model {0} is not known to any APIManager objects; maybe you'
+            ' have not called APIManager.create_api() for this'
+            ' model.').format(model)
 
 
 class ModelFinder(KnowsAPIManagers, Singleton):
@@ -440,16 +931,15 @@ class ModelFinder(KnowsAPIManagers, Singleton):
         if _apimanager is not None:
             # This may raise ValueError.
             return _apimanager.model_for(resource_type, **kw)
-        for manager in self.created_managers:
-            try:
-                return self(resource_type, _apimanager=manager, **kw)
-            except ValueError:
-                pass
-        message = ('No model with collection name {0} is known to any'
-                   ' APIManager objects; maybe you have not set the'
-                   ' `collection_name` keyword argument when calling'
-                   ' `APIManager.create_api()`?').format(resource_type)
-        raise ValueError(message)
+        entry = api_registry.model_for(resource_type)
+        if entry is None:
+            message = ('No model with collection name {0} is known to any'
+                       ' APIManager objects; maybe you have not set the'
+                       ' `collection_name` keyword argument when calling'
+                       ' `APIManager.create_api()`?').format(resource_type)
+            raise ValueError(message)
+        manager, model = entry
+        return model
 
 
 class CollectionNameFinder(KnowsAPIManagers, Singleton):
@@ -462,15 +952,11 @@ class CollectionNameFinder(KnowsAPIManagers, Singleton):
                            ' {1}').format(_apimanager, model)
                 raise ValueError(message)
             return _apimanager.collection_name(model, **kw)
-        for manager in self.created_managers:
-            try:
-                return self(model, _apimanager=manager, **kw)
-            except ValueError:
-                pass
-        message = ('Model {0} is not known to any APIManager'
-                   ' objects; maybe you have not called'
-                   ' APIManager.create_api() for this model.').format(model)
-        raise ValueError(message)
+        entry = api_registry.api_for(model)
+        if entry is None:
+            raise ValueError(_unknown_model_message(model))
+        manager, info = entry
+        return info.collection_name
 
 
 class UrlFinder(KnowsAPIManagers, Singleton):
@@ -485,23 +971,15 @@ class UrlFinder(KnowsAPIManagers, Singleton):
                            ' {1}; maybe another APIManager instance'
                            ' did?').format(_apimanager, model)
                 raise ValueError(message)
-            return _apimanager.url_for(model, resource_id=resource_id,
-                                       relation_name=relation_name,
-                                       related_resource_id=related_resource_id,
-                                       relationship=relationship, **kw)
-        for manager in self.created_managers:
-            try:
-                return self(model, resource_id=resource_id,
-                            relation_name=relation_name,
-                            related_resource_id=related_resource_id,
-                            relationship=relationship, _apimanager=manager,
-                            **kw)
-            except ValueError:
-                pass
-        message = ('Model {0} is not known to any APIManager'
-                   ' objects; maybe you have not called'
-                   ' APIManager.create_api() for this model.').format(model)
-        raise ValueError(message)
+        else:
+            entry = api_registry.api_for(model)
+            if entry is None:
+                raise ValueError(_unknown_model_message(model))
+            _apimanager = entry[0]
+        return _apimanager.url_for(model, resource_id=resource_id,
+                                   relation_name=relation_name,
+                                   related_resource_id=related_resource_id,
+                                   relationship=relationship, **kw)
 
 
 class SerializerFinder(KnowsAPIManagers, Singleton):
@@ -514,15 +992,11 @@ class SerializerFinder(KnowsAPIManagers, Singleton):
                            ' {1}').format(_apimanager, model)
                 raise ValueError(message)
             return _apimanager.serializer_for(model, **kw)
-        for manager in self.created_managers:
-            try:
-                return self(model, _apimanager=manager, **kw)
-            except ValueError:
-                pass
-        message = ('Model {0} is not known to any APIManager'
-                   ' objects; maybe you have not called'
-                   ' APIManager.create_api() for this model.').format(model)
-        raise ValueError(message)
+        entry = api_registry.api_for(model)
+        if entry is None:
+            raise ValueError(_unknown_model_message(model))
+        manager, info = entry
+        return info.serializer
 
 
 class PrimaryKeyFinder(KnowsAPIManagers, Singleton):
@@ -535,22 +1009,22 @@ class PrimaryKeyFinder(KnowsAPIManagers, Singleton):
             model = instance_or_model.__class__
 
         if _apimanager is not None:
-            managers_to_search = [_apimanager]
-        else:
-            managers_to_search = self.created_managers
-        for manager in managers_to_search:
-            if model in manager.created_apis_for:
-                primary_key = manager.primary_key_for(model, **kw)
-                break
+            if model not in _apimanager.created_apis_for:
+                message = ('Model "{0}" is not known to APIManager "{1}";'
+                           ' maybe you have not called APIManager.create_api()'
+                           ' for this model?').format(model, _apimanager)
+                raise ValueError(message)
+            primary_key = _apimanager.primary_key_for(model, **kw)
         else:
-            message = ('Model "{0}" is not known to {1}; maybe you have not'
-                       ' called APIManager.create_api() for this model?')
-            if _apimanager is not None:
-                manager_string = 'APIManager "{0}"'.format(_apimanager)
-            else:
-                manager_string = 'any APIManager objects'
-            message = message.format(model, manager_string)
-            raise ValueError(message)
+            entry = api_registry.api_for(model)
+            if entry is None:
+                message = ('Model "{0}" is not known to any APIManager'
+                           ' objects; maybe you have not called'
+                           ' APIManager.create_api() for this'
+                           ' model?').format(model)
+                raise ValueError(message)
+            manager, info = entry
+            primary_key = info.primary_key
 
         # If `APIManager.create_api(model)` was called without providing
         # a value for the `primary_key` keyword argument, then we must
@@ -0,0 +1,331 @@
+# invalidation.py - sharing cache invalidations among processes
+#
+# Copyright 2011 Lincoln de Sousa <lincoln@comum.org>.
+# Copyright 2012, 2013, 2014, 2015, 2016 Jeffrey Finkelstein
+#           <jeffrey.finkelstein@gmail.com> and contributors.
+#
+# This file is part of Flask-Restless.
+#
+# Flask-Restless is distributed under both the GNU Affero General Public
+# License version 3 and under the 3-clause BSD license. For more
+# information, see LICENSE.AGPL and LICENSE.BSD.
+"""Broadcasting the tables changed in one process to the caches of the
+other processes that serve the same application.
+
+The query cache and the response cache remove their entries when
+changes are committed in the session of the
+:class:`~flask_restless.APIManager`, but only in the process in which
+the changes were committed. When an application is served by several
+worker processes, an :class:`InvalidationBus` publishes the names of
+the tables changed by each commit in one process to the other
+processes, which remove the entries tagged with those tables from their
+own caches.
+
+A :class:`Transport` carries the messages of the bus between processes.
+:class:`UnixSocketTransport` sends datagrams over Unix domain sockets to
+the other processes on the same host.
+
+The :func:`create_invalidation_bus` function returns an instance of a
+bus given the directory of its sockets.
+
+"""
+from errno import EAGAIN
+from errno import ECONNREFUSED
+from errno import EEXIST
+from errno import EMSGSIZE
+from errno import ENOBUFS
+from errno import ENOENT
+from errno import EWOULDBLOCK
+from functools import wraps
+import json
+import os
+import socket
+from threading import Lock
+from uuid import uuid4
+
+from .views.caching import ChangeListener
+from .views.caching import QueryCache
+
+#: The file name extension of the sockets of a
+#: :class:`UnixSocketTransport`.
+SOCKET_SUFFIX = '.sock'
+
+#: The file name extension of the file that marks a socket whose
+#: messages have been lost.
+OVERFLOW_SUFFIX = '.overflow'
+
+
+class Transport(object):
+    """Carries messages from one process to all other processes
+    connected to the same transport.
+
+    **This is a base class with no implementation.** Subclasses must
+    override :meth:`publish` and :meth:`receive`.
+
+    """
+
+    def publish(self, message):
+        """Sends `message`, a :class:`bytes` object, to each of the other
+        processes.
+
+        This method must not block waiting for the other processes to
+        receive the message.
+
+        **This method is not implemented in this base class; subclasses
+        must override this method.**
+
+        """
+        raise NotImplementedError
+
+    def receive(self):
+        """Returns the messages sent by other processes since the last
+        call to this method, without blocking.
+
+        This method returns a pair of the form ``(messages, complete)``,
+        where ``messages`` is the list of messages and ``complete`` is
+        ``False`` if some messages sent to this process may have been
+        lost.
+
+        **This method is not implemented in this base class; subclasses
+        must override this method.**
+
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Stops receiving messages and releases the resources held by
+        this transport.
+
+        """
+        pass
+
+
+class UnixSocketTransport(Transport):
+    """Carries messages among the processes on this host as datagrams
+    over Unix domain sockets in the directory `path`.
+
+    Each process binds its own socket in the directory the first time it
+    publishes or receives a message, including each process forked from
+    a process that already has a socket, and publishes a message by
+    sending it to each of the other sockets in the directory. The
+    sockets of processes that have exited are removed by the next
+    process that publishes a message.
+
+    Publishing never blocks. If the queue of another process is full,
+    the message is dropped and the socket of that process is marked, so
+    that the next call to :meth:`receive` in that process reports the
+    loss.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pid = None
+        self._socket = None
+        self._address = None
+        self._lock = Lock()
+
+    def _bind(self):
+        """Returns the socket of the current process, binding it if it
+        has not been bound already.
+
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return self._socket
+            try:
+                os.makedirs(self.path)
+            except OSError as exception:
+                if exception.errno != EEXIST:
+                    raise
+            address = os.path.join(self.path, uuid4().hex + SOCKET_SUFFIX)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(address)
+            sock.setblocking(False)
+            # A process forked from another shares the socket of its
+            # parent, which must remain open for the parent.
+            self._socket, self._address = sock, address
+            self._pid = os.getpid()
+            return sock
+
+    def _peers(self):
+        """Returns the list of addresses of the sockets of the other
+        processes.
+
+        """
+        return [os.path.join(self.path, name)
+                for name in os.listdir(self.path)
+                if name.endswith(SOCKET_SUFFIX)
+                and os.path.join(self.path, name) != self._address]
+
+    def publish(self, message):
+        sock = self._bind()
+        for address in self._peers():
+            try:
+                sock.sendto(message, address)
+            except socket.error as exception:
+                if exception.errno in (ECONNREFUSED, ENOENT):
+                    _remove(address)
+                elif exception.errno in (EAGAIN, EWOULDBLOCK, ENOBUFS,
+                                         EMSGSIZE):
+                    open(address + OVERFLOW_SUFFIX, 'a').close()
+                else:
+                    raise
+
+    def receive(self):
+        sock = self._bind()
+        # Check for the mark before reading the queue, so that no
+        # message is lost without being reported by this or the next
+        # call.
+        overflow = self._address + OVERFLOW_SUFFIX
+        complete = not os.path.exists(overflow)
+        if not complete:
+            _remove(overflow)
+        messages = []
+        while True:
+            try:
+                messages.append(sock.recv(65536))
+            except socket.error as exception:
+                if exception.errno in (EAGAIN, EWOULDBLOCK):
+                    break
+                raise
+        return messages, complete
+
+    def close(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._socket.close()
+            _remove(self._address)
+            _remove(self._address + OVERFLOW_SUFFIX)
+            self._pid = self._socket = self._address = None
+
+
+def _remove(path):
+    """Removes the file at `path`, if it exists."""
+    try:
+        os.remove(path)
+    except OSError as exception:
+        if exception.errno != ENOENT:
+            raise
+
+
+class InvalidationBus(object):
+    """Publishes the names of the tables changed by each transaction
+    committed in this process to the other processes connected to
+    `transport`, an instance of :class:`Transport`, and invalidates the
+    caches of this process when other processes change tables.
+
+    Messages from other processes are received when :meth:`poll` is
+    called, which the views created by
+    :class:`~flask_restless.APIManager` do at the beginning of each
+    request, so that a request never reads a cache entry made out of
+    date by a transaction committed in another process before the
+    request was received.
+
+    """
+
+    def __init__(self, transport):
+        #: The :class:`Transport` that carries the messages of this bus.
+        self.transport = transport
+
+        self._caches = []
+        self._listener = ChangeListener(self.publish)
+
+    def subscribe(self, cache):
+        """Removes the entries of `cache` tagged with the tables changed
+        by other processes.
+
+        `cache` is an object with ``invalidate(tables)`` and ``clear()``
+        methods, like a :class:`~flask_restless.QueryCache` or a
+        :class:`~flask_restless.ResponseCache`. Subscribing the same
+        cache more than once has no effect.
+
+        """
+        if not any(c is cache for c in self._caches):
+            self._caches.append(cache)
+
+    def attach(self, session):
+        """Publishes the tables changed by each transaction committed in
+        `session`.
+
+        For more information, see :meth:`.ChangeListener.attach`.
+
+        """
+        self._listener.attach(session)
+
+    def publish(self, tables):
+        """Publishes the set of table names `tables` to the other
+        processes.
+
+        """
+        message = json.dumps({'tables': sorted(tables)})
+        self.transport.publish(message.encode('utf-8'))
+
+    def poll(self):
+        """Invalidates the entries of the subscribed caches tagged with
+        the tables published by other processes since the last call to
+        this method.
+
+        If some messages were lost, every entry of the subscribed caches
+        is removed.
+
+        """
+        messages, complete = self.transport.receive()
+        if not complete:
+            for cache in self._caches:
+                _changed(cache, None)
+            return
+        tables = set()
+        for message in messages:
+            tables.update(json.loads(message.decode('utf-8'))['tables'])
+        if tables:
+            for cache in self._caches:
+                _changed(cache, tables)
+
+    def polling(self, view):
+        """Returns a view function that calls :meth:`poll` before calling
+        the view function `view`.
+
+        """
+        @wraps(view)
+        def new_func(*args, **kw):
+            self.poll()
+            return view(*args, **kw)
+        return new_func
+
+
+def _changed(cache, tables):
+    """Removes the entries of `cache` tagged with any of the table names
+    in `tables`, or every entry if `tables` is ``None``.
+
+    A :class:`~flask_restless.QueryCache` is told through its
+    :meth:`~flask_restless.QueryCache.changed` method, so that it does
+    not store the results of queries that were running at the time.
+
+    """
+    if isinstance(cache, QueryCache):
+        cache.changed(tables)
+    elif tables is None:
+        cache.clear()
+    else:
+        cache.invalidate(tables)
+
+
+def create_invalidation_bus(bus=None):
+    """Returns an instance of :class:`InvalidationBus`, or ``None`` if
+    changes should not be published to other processes.
+
+    If `bus` is ``None``, this returns ``None``. If it is a string, this
+    returns a bus with a :class:`UnixSocketTransport` whose sockets are
+    in the directory with that path. If it is an instance of
+    :class:`Transport`, this returns a bus with that transport. If it is
+    already an instance of :class:`InvalidationBus`, it is returned
+    unchanged.
+
+    """
+    if bus is None or isinstance(bus, InvalidationBus):
+        return bus
+    if isinstance(bus, Transport):
+        return InvalidationBus(bus)
+    return InvalidationBus(UnixSocketTransport(bus))
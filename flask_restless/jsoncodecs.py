@@ -0,0 +1,216 @@
+# jsoncodecs.py - pluggable JSON encoding and decoding
+#
+# Copyright 2011 Lincoln de Sousa <lincoln@comum.org>.
+# Copyright 2012, 2013, 2014, 2015, 2016 Jeffrey Finkelstein
+#           <jeffrey.finkelstein@gmail.com> and contributors.
+#
+# This file is part of Flask-Restless.
+#
+# Flask-Restless is distributed under both the GNU Affero General Public
+# License version 3 and under the 3-clause BSD license. For more
+# information, see LICENSE.AGPL and LICENSE.BSD.
+"""Classes for encoding and decoding JSON documents.
+
+A :class:`JSONCodec` is used by the views created by
+:class:`~flask_restless.APIManager` to decode the bodies of requests and
+to encode the JSON API documents sent in responses. The default,
+:class:`FlaskJSONCodec`, uses the JSON encoder and decoder of the Flask
+application. The other codecs use faster third-party JSON libraries, if
+they are installed.
+
+Each codec that uses a third-party library delegates the encoding of
+objects that are not JSON primitives, like :class:`datetime.datetime`,
+:class:`uuid.UUID`, and :class:`decimal.Decimal` objects, to the JSON
+encoder of the Flask application, so that these objects are encoded
+exactly as they would be by the default codec.
+
+The :func:`create_codec` function returns an instance of a codec given
+its name.
+
+"""
+from flask import current_app
+from flask import json
+
+
+class JSONCodec(object):
+    """Encodes Python objects as JSON strings and decodes JSON strings
+    into Python objects.
+
+    **This is a base class with no implementation.**
+
+    """
+
+    def loads(self, data):
+        """Returns the Python object represented by the JSON document
+        `data`.
+
+        `data` is either a :class:`bytes` object containing a UTF-8
+        encoded JSON document or a string.
+
+        If `data` is not a valid JSON document, this method must raise
+        :exc:`ValueError`.
+
+        **This method is not implemented in this base class; subclasses
+        must override this method.**
+
+        """
+        raise NotImplementedError
+
+    def dumps(self, obj):
+        """Returns a string containing the JSON encoding of `obj`.
+
+        This method must be called within a Flask application context.
+
+        **This method is not implemented in this base class; subclasses
+        must override this method.**
+
+        """
+        raise NotImplementedError
+
+
+def _default(obj):
+    """Returns a JSON-serializable version of `obj`, as determined by
+    the JSON encoder of the current Flask application.
+
+    This function raises :exc:`TypeError` if the encoder does not know
+    how to serialize `obj`.
+
+    """
+    return current_app.json_encoder().default(obj)
+
+
+class FlaskJSONCodec(JSONCodec):
+    """A codec that uses the JSON encoder and decoder of the current
+    Flask application, as provided by :mod:`flask.json`.
+
+    """
+
+    def loads(self, data):
+        return json.loads(data)
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+
+class OrjsonCodec(JSONCodec):
+    """A codec that uses the `orjson`_ library.
+
+    Instantiating this class raises :exc:`ImportError` if orjson is not
+    installed.
+
+    .. _orjson: https://github.com/ijl/orjson
+
+    """
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        # orjson encodes dates and times in its own way, so we defer to
+        # the Flask encoder for those objects instead.
+        self._options = (orjson.OPT_PASSTHROUGH_DATETIME |
+                         orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+    def dumps(self, obj):
+        options = self._options
+        if current_app.config.get('JSON_SORT_KEYS', True):
+            options |= self._orjson.OPT_SORT_KEYS
+        encoded = self._orjson.dumps(obj, default=_default, option=options)
+        return encoded.decode('utf-8')
+
+
+class RapidJSONCodec(JSONCodec):
+    """A codec that uses the `python-rapidjson`_ library.
+
+    Instantiating this class raises :exc:`ImportError` if
+    python-rapidjson is not installed.
+
+    .. _python-rapidjson: https://github.com/python-rapidjson/python-rapidjson
+
+    """
+
+    def __init__(self):
+        import rapidjson
+        self._rapidjson = rapidjson
+
+    def loads(self, data):
+        return self._rapidjson.loads(data)
+
+    def dumps(self, obj):
+        rapidjson = self._rapidjson
+        sort_keys = current_app.config.get('JSON_SORT_KEYS', True)
+        # Disable the native handling of dates, times, and UUIDs, so
+        # that those objects are encoded by the Flask encoder instead.
+        return rapidjson.dumps(obj, default=_default, sort_keys=sort_keys,
+                               datetime_mode=rapidjson.DM_NONE,
+                               uuid_mode=rapidjson.UM_NONE)
+
+
+class UJSONCodec(FlaskJSONCodec):
+    """A codec that uses the `ujson`_ library to decode JSON documents.
+
+    ujson always encodes :class:`decimal.Decimal` objects as
+    floating-point numbers, which would differ from the behavior of the
+    Flask encoder, so this codec uses the Flask encoder for encoding and
+    ujson only for decoding.
+
+    Instantiating this class raises :exc:`ImportError` if ujson is not
+    installed.
+
+    .. _ujson: https://github.com/ultrajson/ultrajson
+
+    """
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def loads(self, data):
+        return self._ujson.loads(data)
+
+
+#: Codec classes keyed by name, as accepted by :func:`create_codec`.
+CODECS = {
+    'flask': FlaskJSONCodec,
+    'orjson': OrjsonCodec,
+    'rapidjson': RapidJSONCodec,
+    'ujson': UJSONCodec,
+}
+
+#: The names of the codecs to try, in order of preference, when the
+#: ``'auto'`` codec is requested from :func:`create_codec`.
+AUTO_CODECS = ('orjson', 'rapidjson', 'ujson')
+
+
+def create_codec(codec=None):
+    """Returns an instance of :class:`JSONCodec`.
+
+    If `codec` is ``None`` or ``'flask'``, this returns an instance of
+    :class:`FlaskJSONCodec`. If `codec` is a string naming one of the
+    :data:`CODECS`, this returns an instance of that codec; if the
+    corresponding library is not installed, :exc:`ImportError` is
+    raised. If `codec` is ``'auto'``, this returns an instance of the
+    first codec in :data:`AUTO_CODECS` whose library is installed, or
+    an instance of :class:`FlaskJSONCodec` if none are installed. If
+    `codec` is already an instance of :class:`JSONCodec`, it is returned
+    unchanged.
+
+    In any other case, this function raises :exc:`ValueError`.
+
+    """
+    if codec is None:
+        return FlaskJSONCodec()
+    if isinstance(codec, JSONCodec):
+        return codec
+    if codec == 'auto':
+        for name in AUTO_CODECS:
+            try:
+                return CODECS[name]()
+            except ImportError:
+                pass
+        return FlaskJSONCodec()
+    if codec not in CODECS:
+        raise ValueError('unknown JSON codec "{0}"'.format(codec))
+    return CODECS[codec]()
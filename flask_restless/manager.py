@@ -17,23 +17,36 @@ their SQLAlchemy models.
 """
 from collections import defaultdict
 from collections import namedtuple
+from functools import partial
 from uuid import uuid1
 import sys
+try:
+    from urllib.parse import quote
+except ImportError:
+    from urllib import quote
 
 from sqlalchemy.inspection import inspect
+from flask import _request_ctx_stack
 from flask import Blueprint
 from flask import url_for as flask_url_for
-
-from .helpers import collection_name
-from .helpers import model_for
-from .helpers import primary_key_for
-from .helpers import serializer_for
-from .helpers import url_for
+from werkzeug.routing import BuildError
+
+from .helpers import api_registry
+from .invalidation import create_invalidation_bus
+from .jsoncodecs import create_codec
+from .search import create_filter_limits
+from .search import create_text_search
+from .search.operators import IN_LIST_THRESHOLD
 from .serialization import DefaultSerializer
 from .serialization import DefaultDeserializer
 from .views import API
 from .views import FunctionAPI
 from .views import RelationshipAPI
+from .views.caching import create_query_cache
+from .views.caching import create_response_cache
+from .views.conditional import create_validator
+from .views.counting import create_count_strategy
+from .views.timing import create_timing
 
 #: The names of HTTP methods that allow fetching information.
 READONLY_METHODS = frozenset(('GET', ))
@@ -48,6 +61,18 @@ ALL_METHODS = READONLY_METHODS | WRITEONLY_METHODS
 #: The default URL prefix for APIs created by instance of :class:`APIManager`.
 DEFAULT_URL_PREFIX = '/api'
 
+#: The names of the variable parts of the URL rules for an API, in the
+#: order in which they appear in the URLs.
+URL_ARGUMENTS = ('resource_id', 'relation_name', 'related_resource_id')
+
+#: Placeholder values for each of the :data:`URL_ARGUMENTS`, used to
+#: create URL templates when a blueprint is registered on an application.
+URL_PLACEHOLDERS = ('__restless_0__', '__restless_1__', '__restless_2__')
+
+#: The keyword arguments to :meth:`APIManager.url_for` for which the
+#: URL can be created from a precomputed URL template.
+URL_TEMPLATE_KEYWORDS = frozenset(URL_ARGUMENTS + ('relationship', '_method'))
+
 if sys.version_info < (3, ):
     STRING_TYPES = (str, unicode)  # noqa
 else:
@@ -78,6 +103,16 @@ APIInfo = namedtuple('APIInfo', ['collection_name', 'blueprint_name',
                                  'serializer', 'primary_key'])
 
 
+def _url_quote(value):
+    """Returns `value` quoted for use as a variable part of a URL, in
+    the same way as when Werkzeug builds a URL for a URL rule.
+
+    """
+    if not isinstance(value, bytes):
+        value = u'{0}'.format(value).encode('utf-8')
+    return quote(value, safe='/:')
+
+
 class IllegalArgumentError(Exception):
     """This exception is raised when a calling function has provided illegal
     arguments to a function or method.
@@ -148,6 +183,24 @@ class APIManager(object):
     information on using preprocessors and postprocessors, see
     :doc:`processors`.
 
+    `json_codec` determines the library used to decode the bodies of
+    requests to and encode the bodies of responses from all APIs created
+    by this instance. It may be ``None`` (the default), in which case the
+    JSON encoder and decoder of the Flask application are used, the name
+    of a codec, like ``'orjson'`` or ``'auto'``, or an instance of
+    :class:`~flask_restless.jsoncodecs.JSONCodec`. For more information,
+    see :ref:`jsoncodecs`.
+
+    `invalidation_bus` publishes the tables changed by each transaction
+    committed in `session` to the other processes serving the
+    application, so that the query and response caches of all APIs
+    created by this instance are invalidated in every process. It may be
+    ``None`` (the default), in which case caches are invalidated only in
+    the process that committed the changes, the path of a directory in
+    which each process creates a Unix domain socket, or an instance of
+    :class:`~flask_restless.InvalidationBus`. For more information, see
+    :ref:`invalidationbus`.
+
     """
 
     #: The format of the name of the API view for a given model.
@@ -157,7 +210,8 @@ class APIManager(object):
     APINAME_FORMAT = '{0}api'
 
     def __init__(self, app=None, session=None, flask_sqlalchemy_db=None,
-                 preprocessors=None, postprocessors=None, url_prefix=None):
+                 preprocessors=None, postprocessors=None, url_prefix=None,
+                 json_codec=None, invalidation_bus=None):
         if session is None and flask_sqlalchemy_db is None:
             msg = 'must specify either `flask_sqlalchemy_db` or `session`'
             raise ValueError(msg)
@@ -168,12 +222,8 @@ class APIManager(object):
         # `url_for`, `model_for`, and `collection_name` functions.
         #
         # TODO This is a bit of poor code style because it requires the
-        # APIManager to know about these global functions that use it.
-        url_for.register(self)
-        model_for.register(self)
-        collection_name.register(self)
-        serializer_for.register(self)
-        primary_key_for.register(self)
+        # APIManager to know about the global index used by those functions.
+        api_registry.register(self)
 
         #: A mapping whose keys are models for which this object has
         #: created an API via the :meth:`create_api_blueprint` method
@@ -203,6 +253,26 @@ class APIManager(object):
         #: :meth:`create_api` method.
         self.url_prefix = url_prefix
 
+        #: A mapping from model to URL templates for the API created for
+        #: that model, as computed by :meth:`_create_url_templates`.
+        #:
+        #: The value is ``None`` if the URLs cannot be determined from a
+        #: single set of templates, for example, if the blueprint has
+        #: been registered on two applications with different URL
+        #: prefixes.
+        self.url_templates = {}
+
+        #: The :class:`~flask_restless.jsoncodecs.JSONCodec` used by all
+        #: APIs created by this manager.
+        self.json_codec = create_codec(json_codec)
+
+        #: The :class:`~flask_restless.InvalidationBus` that shares the
+        #: invalidations of the caches of all APIs created by this
+        #: manager with other processes, or ``None``.
+        self.invalidation_bus = create_invalidation_bus(invalidation_bus)
+        if self.invalidation_bus is not None:
+            self.invalidation_bus.attach(session)
+
         # if self.app is not None:
         #     self.init_app(self.app)
 
@@ -264,9 +334,31 @@ class APIManager(object):
         The remaining keyword arguments are passed directly on to
         :func:`flask.url_for`.
 
+        Within a request context, URLs for resources, relationships, and
+        related resources are created from the URL templates computed
+        when the blueprint for `model` was registered, instead of by
+        :func:`flask.url_for`; see :meth:`_create_url_templates`.
+
         .. _Flask request context: http://flask.pocoo.org/docs/0.10/reqcontext/
 
         """
+        templates = self.url_templates.get(model)
+        context = _request_ctx_stack.top
+        if (templates is not None and context is not None
+                and URL_TEMPLATE_KEYWORDS.issuperset(kw)):
+            values = [kw.get(name) for name in URL_ARGUMENTS]
+            # The number of URL arguments specified, which must be
+            # specified in order; for example, it makes no sense to
+            # specify a relation name without a resource ID.
+            n = values.index(None) if None in values else len(values)
+            key = (n, bool(kw.get('relationship')))
+            method = kw.get('_method')
+            if key in templates and all(v is None for v in values[n:]):
+                template, allows_get = templates[key]
+                if method is None or (method == 'GET' and allows_get):
+                    args = map(_url_quote, values[:n])
+                    path = template.format(*args)
+                    return context.request.script_root + path
         collection_name = self.created_apis_for[model].collection_name
         blueprint_name = self.created_apis_for[model].blueprint_name
         api_name = APIManager.api_name(collection_name)
@@ -395,7 +487,13 @@ class APIManager(object):
                              serializer_class=None, deserializer_class=None,
                              includes=None, allow_to_many_replacement=False,
                              allow_delete_from_to_many_relationships=False,
-                             allow_client_generated_ids=False):
+                             allow_client_generated_ids=False,
+                             streaming=False, cursor_pagination=False,
+                             count_strategy=None, filter_limits=None,
+                             text_search=None, query_cache=None,
+                             validator=None, response_cache=None,
+                             timing=None,
+                             in_list_threshold=IN_LIST_THRESHOLD):
         """Creates and returns a ReSTful API interface as a blueprint, but does
         not register it on any :class:`flask.Flask` application.
 
@@ -590,6 +688,95 @@ class APIManager(object):
         this be a UUID. This is ``False`` by default. For more information, see
         :doc:`creating`.
 
+        If `streaming` is ``True``, the response to a request for all
+        resources in a collection (that is, with a page size of zero) is
+        streamed to the client as it is generated, instead of being
+        built entirely in memory. This is ``False`` by default. For more
+        information, see :ref:`streaming`.
+
+        If `cursor_pagination` is ``True``, collections of resources are
+        paginated by opaque cursors that identify the position of a
+        resource in the collection instead of by page number, unless the
+        client requests a page number. This requires the secret key of
+        the Flask application to be set, since cursors are signed; if it
+        is not set when the API is registered on an application,
+        :exc:`IllegalArgumentError` is raised. This is ``False`` by
+        default. For more information, see
+        :ref:`cursorpagination`.
+
+        `count_strategy` determines how the total number of resources in
+        a paginated collection is computed. It is either the name of a
+        strategy, ``'exact'``, ``'window'``, ``'none'``,
+        ``'estimated'``, or ``'cached'``, or an instance of a subclass of
+        :class:`~flask_restless.CountStrategy`. If it is ``None``, the
+        resources are counted exactly. For more information, see
+        :ref:`countstrategies`.
+
+        `filter_limits` limits the cost of the filters that clients may
+        request. It is either a dictionary whose keys are the names of
+        the keyword arguments of :class:`~flask_restless.FilterLimits`,
+        such as ``'max_depth'`` or ``'max_in_list'``, or an instance of
+        that class. If a request has filters that exceed these limits,
+        the server responds with :http:status:`400` without querying the
+        database. If it is ``None``, filters are not limited. For more
+        information, see :ref:`filterlimits`.
+
+        `text_search` names the fields that clients may search with the
+        ``match`` operator. It is either a list of field names, a
+        dictionary whose keys are the names of the keyword arguments of
+        :class:`~flask_restless.TextSearch`, or an instance of that
+        class. If it is ``None``, clients may not use the ``match``
+        operator. For more information, see :ref:`textsearch`.
+
+        `query_cache` caches the resources on each page of a collection
+        and the total number of resources, until changes to the tables
+        from which they were read are committed in the session of this
+        manager. It is either ``True``, for a cache in the memory of the
+        current process, a dictionary whose keys are the names of the
+        keyword arguments of
+        :class:`~flask_restless.views.caching.InMemoryQueryCache`, such
+        as ``'maxsize'``, or an instance of a subclass of
+        :class:`~flask_restless.QueryCache`. If it is ``None``, query
+        results are not cached. For more information, see
+        :ref:`querycache`.
+
+        `validator` determines the ``ETag`` and ``Last-Modified`` headers
+        of responses to :http:method:`get` requests, which allow clients
+        to make conditional requests. It is either ``'hash'``, for an
+        entity tag computed from the body of each response, the name of
+        a version or modification time column of the model, or an
+        instance of a subclass of :class:`~flask_restless.Validator`. If
+        it is ``None``, responses have no validators. For more
+        information, see :ref:`conditional`.
+
+        `response_cache` caches the encoded responses to :http:method:`get`
+        requests, until changes to the tables that store the resources in
+        those responses are committed in the session of this manager. It
+        is either ``True``, for a cache with the default settings, a
+        dictionary whose keys are the names of the keyword arguments of
+        :class:`~flask_restless.ResponseCache`, such as ``'maxsize'`` or
+        ``'vary'``, or an instance of that class. If it is ``None``,
+        responses are not cached. If there are preprocessors for
+        :http:method:`get` requests, :exc:`IllegalArgumentError` is
+        raised unless the cache was created with
+        ``bypass_preprocessors=True``. For more information, see
+        :ref:`responsecache`.
+
+        `timing` measures the time spent in each phase of handling a
+        request, like searching, counting, and serializing, and reports
+        it in the ``Server-Timing`` header of the response. It is either
+        ``True``, for the default settings, a dictionary whose keys are
+        the names of the keyword arguments of
+        :class:`~flask_restless.Timing`, such as ``'callbacks'``, or an
+        instance of that class. If it is ``None``, requests are not
+        timed. For more information, see :ref:`timing`.
+
+        `in_list_threshold` is the number of values in the argument of an
+        ``in`` or ``not_in`` filter above which the values are sent to
+        the database as a single parameter instead of one parameter for
+        each value. If it is ``None``, each value is always a separate
+        parameter. For more information, see :ref:`inlists`.
+
         """
         # Perform some sanity checks on the provided keyword arguments.
         if only is not None and exclude is not None:
@@ -598,6 +785,9 @@ class APIManager(object):
         if collection_name == '':
             msg = 'Collection name must be nonempty'
             raise IllegalArgumentError(msg)
+        if in_list_threshold is not None and in_list_threshold < 0:
+            msg = 'in_list_threshold must be nonnegative or None'
+            raise IllegalArgumentError(msg)
         if collection_name is None:
             # If the model is polymorphic in a single table inheritance
             # scenario, this should *not* be the tablename, but perhaps
@@ -646,6 +836,38 @@ class APIManager(object):
         acgi = allow_client_generated_ids
         deserializer = deserializer_class(self.session, model,
                                           allow_client_generated_ids=acgi)
+        # Instantiate the count strategy once for all requests, so that
+        # strategies like the cached count keep their state between
+        # requests.
+        count_strategy = create_count_strategy(count_strategy)
+        filter_limits = create_filter_limits(filter_limits)
+        text_search = create_text_search(text_search)
+        response_cache = create_response_cache(response_cache)
+        if response_cache is not None:
+            # Cached responses are returned without calling the
+            # preprocessors, which may decide whether a request is
+            # allowed.
+            if (not response_cache.bypass_preprocessors and
+                    any(value for key, value in preprocessors_.items()
+                        if key.startswith('GET_'))):
+                msg = ('Cannot cache the responses of an API with'
+                       ' preprocessors for GET requests, unless the'
+                       ' `bypass_preprocessors` keyword argument to'
+                       ' ResponseCache is True')
+                raise IllegalArgumentError(msg)
+            response_cache.attach(self.session)
+        # The query cache must see the changes committed in the session
+        # in order to discard results that are out of date.
+        query_cache = create_query_cache(query_cache)
+        if query_cache is not None:
+            query_cache.attach(self.session)
+        validator = create_validator(validator)
+        timing = create_timing(timing)
+        bus = self.invalidation_bus
+        if bus is not None:
+            for cache in (query_cache, response_cache):
+                if cache is not None:
+                    bus.subscribe(cache)
         # Create the view function for the API for this model.
         #
         # Rename some variables with long names for the sake of brevity.
@@ -658,9 +880,27 @@ class APIManager(object):
                                allow_to_many_replacement=atmr,
                                page_size=page_size,
                                max_page_size=max_page_size,
+                               streaming=streaming,
+                               cursor_pagination=cursor_pagination,
+                               count_strategy=count_strategy,
+                               filter_limits=filter_limits,
+                               text_search=text_search,
+                               in_list_threshold=in_list_threshold,
+                               query_cache=query_cache,
+                               validator=validator,
+                               timing=timing,
+                               json_codec=self.json_codec,
                                serializer=serializer,
                                deserializer=deserializer,
                                includes=includes)
+        # Responses from the cache are returned before the view is even
+        # instantiated.
+        if response_cache is not None:
+            api_view = response_cache.cached(api_view, model)
+        # Changes committed in other processes are received before the
+        # caches are read.
+        if bus is not None:
+            api_view = bus.polling(api_view)
 
         # add the URL rules to the blueprint: the first is for methods on the
         # collection only, the second is for methods which may or may not
@@ -705,8 +945,20 @@ class APIManager(object):
                       primary_key=primary_key,
                       validation_exceptions=validation_exceptions,
                       allow_to_many_replacement=allow_to_many_replacement,
+                      filter_limits=filter_limits,
+                      text_search=text_search,
+                      in_list_threshold=in_list_threshold,
+                      query_cache=query_cache,
+                      validator=validator,
+                      timing=timing,
+                      json_codec=self.json_codec,
                       # Keyword arguments RelationshipAPI.__init__()
                       allow_delete_from_to_many_relationships=adftmr)
+        if response_cache is not None:
+            relationship_api_view = \
+                response_cache.cached(relationship_api_view, model)
+        if bus is not None:
+            relationship_api_view = bus.polling(relationship_api_view)
         # When PATCH is allowed, certain non-PATCH requests are allowed
         # on relationship URLs.
         relationship_methods = READONLY_METHODS & methods
@@ -769,12 +1021,96 @@ class APIManager(object):
             blueprint.add_url_rule(eval_endpoint, methods=eval_methods,
                                    view_func=eval_api_view)
 
+        # Compute the URL templates for this API when the blueprint is
+        # registered on an application, since only then is the URL
+        # prefix known for certain.
+        self.url_templates.pop(model, None)
+        blueprint.record(partial(self._create_url_templates, model, apiname))
+        # Cursors are signed with the secret key of each application on
+        # which the blueprint is registered.
+        if cursor_pagination:
+            blueprint.record(self._check_secret_key)
+
         # Finally, record that this APIManager instance has created an API for
         # the specified model.
-        self.created_apis_for[model] = APIInfo(collection_name, blueprint.name,
-                                               serializer, primary_key)
+        info = APIInfo(collection_name, blueprint.name, serializer,
+                       primary_key)
+        self.created_apis_for[model] = info
+        api_registry.add_api(self, model, info)
         return blueprint
 
+    def _create_url_templates(self, model, apiname, state):
+        """Computes the URL templates for the API created for `model`.
+
+        `apiname` is the name of the view function for the API, as
+        returned by :meth:`api_name`, and `state` is the
+        :class:`~flask.blueprints.BlueprintSetupState` object that
+        Flask provides when registering the blueprint containing the API
+        on an application.
+
+        The templates are stored in :attr:`url_templates`. They are
+        created by building each URL with placeholders for the variable
+        parts, so the links generated from them are exactly the URLs
+        that :func:`flask.url_for` would build, relative to the script
+        root of the application.
+
+        """
+        url_map = state.app.url_map
+        # URLs for subdomains or hosts may be absolute, so they are
+        # always built by Flask instead.
+        if url_map.host_matching or state.subdomain is not None:
+            self.url_templates[model] = None
+            return
+        adapter = url_map.bind('', script_name='/')
+        endpoint = '{0}.{1}'.format(state.blueprint.name, apiname)
+        endpoints = {
+            (0, False): endpoint,
+            (1, False): endpoint,
+            (2, False): endpoint,
+            (3, False): endpoint,
+            (2, True): '{0}.relationships'.format(endpoint)
+        }
+        templates = {}
+        for (n, relationship), endpoint in endpoints.items():
+            # TODO In Python 2.7+, this should be a dict comprehension.
+            values = dict(zip(URL_ARGUMENTS, URL_PLACEHOLDERS[:n]))
+            try:
+                path = adapter.build(endpoint, values)
+            except BuildError:
+                continue
+            try:
+                adapter.build(endpoint, values, method='GET')
+            except BuildError:
+                allows_get = False
+            else:
+                allows_get = True
+            template = path.replace('{', '{{').replace('}', '}}')
+            for i, placeholder in enumerate(URL_PLACEHOLDERS[:n]):
+                template = template.replace(placeholder, '{{{0}}}'.format(i))
+            templates[n, relationship] = (template, allows_get)
+        # If the blueprint has already been registered on another
+        # application at a different URL, we cannot use templates.
+        if self.url_templates.get(model, templates) != templates:
+            templates = None
+        self.url_templates[model] = templates
+
+    @staticmethod
+    def _check_secret_key(state):
+        """Raises :exc:`IllegalArgumentError` if the application on which
+        a blueprint is being registered, as given by the
+        :class:`~flask.blueprints.BlueprintSetupState` `state`, does not
+        have a secret key.
+
+        This is recorded on the blueprints of APIs created with
+        ``cursor_pagination=True``, since cursors cannot be signed
+        without a secret key.
+
+        """
+        if not state.app.secret_key:
+            msg = ('cursor pagination requires the secret key of the Flask'
+                   ' application to be set before the API is registered')
+            raise IllegalArgumentError(msg)
+
     def create_api(self, *args, **kw):
         """Creates and possibly registers a ReSTful API blueprint for
         the given SQLAlchemy model.
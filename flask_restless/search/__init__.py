@@ -21,19 +21,38 @@ you to create the SQLAlchemy expressions without executing them.
 
 The :exc:`FilterParsingError` and :exc:`FilterCreationError` exceptions
 are the exceptions that may be raised by the func:`search` and
-:func:`create_filters` functions.
+:func:`create_filters` functions. The :exc:`FilterLimitError` exception
+is raised by those functions when the filters exceed the given
+:class:`FilterLimits`.
+
+The :class:`TextSearch` class declares the fields that clients may
+search with the ``match`` operator, and the
+:func:`create_text_search_index` function creates the database objects
+that the operator uses.
 
 """
+from .filters import create_filter_limits
 from .filters import FilterCreationError
+from .filters import FilterLimitError
+from .filters import FilterLimits
 from .filters import FilterParsingError
 from .drivers import create_filters
 from .drivers import search
 from .drivers import search_relationship
+from .textsearch import create_text_search
+from .textsearch import create_text_search_index
+from .textsearch import TextSearch
 
 __all__ = [
+    'create_filter_limits',
     'create_filters',
+    'create_text_search',
+    'create_text_search_index',
     'FilterCreationError',
+    'FilterLimitError',
+    'FilterLimits',
     'FilterParsingError',
     'search',
     'search_relationship',
+    'TextSearch',
 ]
@@ -14,22 +14,33 @@
 The :func:`search` and :func:`search_relationship` functions return
 filtered queries on a SQLAlchemy model. The latter specifically
 restricts the query to only those instances of a model that are related
-to a particular object via a given to-many relationship.
+to a particular object via a given to-many relationship, without loading
+that relationship.
 
 """
-from sqlalchemy.orm import aliased
-from sqlalchemy.sql import false as FALSE
+from sqlalchemy.ext.associationproxy import AssociationProxy
+from sqlalchemy.orm import join
+from sqlalchemy.orm import with_parent
+from sqlalchemy.sql.expression import select
 
 from ..helpers import get_model
 from ..helpers import get_related_model
+from ..helpers import get_related_model_from_attribute
+from ..helpers import model_metadata
+from ..helpers import primary_key_for
 from ..helpers import primary_key_names
-from ..helpers import primary_key_value
 from ..helpers import session_query
 from .filters import create_filters
+from .operators import IN_LIST_THRESHOLD
+from .joins import JoinPlanner
+from .textsearch import check_text_search
+from .textsearch import relevance
+from .textsearch import text_matches
 
 
 def search_relationship(session, instance, relation, filters=None, sort=None,
-                        group_by=None):
+                        group_by=None, filter_limits=None, text_search=None,
+                        in_list_threshold=IN_LIST_THRESHOLD):
     """Returns a filtered, sorted, and grouped SQLAlchemy query
     restricted to those objects related to a given instance.
 
@@ -40,8 +51,14 @@ def search_relationship(session, instance, relation, filters=None, sort=None,
 
 `   `relation` is a string naming a to-many relationship of `instance`.
 
-    `filters`, `sort`, and `group_by` are identical to the corresponding
-    arguments of :func:`.search`.
+    `filters`, `sort`, `group_by`, `filter_limits`, `text_search`, and
+    `in_list_threshold` are identical to the corresponding arguments of
+    :func:`.search`.
+
+    The related instances are selected by a criterion on the foreign
+    key (or the association table) that refers to the primary key of
+    `instance`, so the relationship is never loaded into memory, and the
+    filtering, sorting, and pagination all happen in the database.
 
     """
     model = get_model(instance)
@@ -49,22 +66,48 @@ def search_relationship(session, instance, relation, filters=None, sort=None,
     query = session_query(session, related_model)
 
     # Filter by only those related values that are related to `instance`.
-    relationship = getattr(instance, relation)
-    # TODO In Python 2.7+, this should be a set comprehension.
-    primary_keys = set(primary_key_value(inst) for inst in relationship)
-    # If the relationship is empty, we can avoid a potentially expensive
-    # filtering operation by simply returning an intentionally empty
-    # query.
-    if not primary_keys:
-        return query.filter(FALSE())
-    query = query.filter(primary_key_value(related_model).in_(primary_keys))
+    query = query.filter(_related_criterion(instance, model, relation,
+                                            related_model))
 
     return search(session, related_model, filters=filters, sort=sort,
-                  group_by=group_by, _initial_query=query)
+                  group_by=group_by, filter_limits=filter_limits,
+                  text_search=text_search,
+                  in_list_threshold=in_list_threshold, _initial_query=query)
+
+
+def _related_criterion(instance, model, relation, related_model):
+    """Returns a SQL expression that is true exactly for those instances
+    of `related_model` that are related to `instance`, an instance of
+    `model`, via the relationship named `relation`.
+
+    For a relationship, this is the criterion that SQLAlchemy would use
+    to lazy load the relationship, for example ``article.author_id =
+    :param_1``, or a criterion on the association table in the case of
+    a many-to-many relationship.
+
+    For an association proxy, this is a subquery selecting the primary
+    keys of the proxied instances via the intermediate model.
+
+    """
+    descriptor = model_metadata(model).mapper.all_orm_descriptors[relation]
+    if not isinstance(descriptor, AssociationProxy):
+        return with_parent(instance, getattr(model, relation))
+    # Get the association proxy bound to `model`, which knows its local
+    # attribute (a relationship to the intermediate model) and its
+    # remote attribute (a relationship from the intermediate model to
+    # `related_model`).
+    proxy = getattr(model, relation)
+    intermediate_model = get_related_model_from_attribute(proxy.local_attr)
+    primary_key = getattr(related_model, primary_key_for(related_model))
+    joined = join(intermediate_model, related_model, proxy.remote_attr)
+    subquery = select([primary_key]).select_from(joined)
+    subquery = subquery.where(with_parent(instance, proxy.local_attr))
+    return primary_key.in_(subquery)
 
 
 def search(session, model, filters=None, sort=None, group_by=None,
-           _initial_query=None):
+           filter_limits=None, text_search=None,
+           in_list_threshold=IN_LIST_THRESHOLD, _initial_query=None):
     """Returns a filtered, sorted, and grouped SQLAlchemy query.
 
     `session` is the SQLAlchemy session in which to create the query.
@@ -80,11 +123,36 @@ def search(session, model, filters=None, sort=None, group_by=None,
     `sort` is a list of pairs of the form ``(direction, fieldname)``,
     where ``direction`` is either '+' or '-' and ``fieldname`` is a
     string representing an attribute of the model or a dot-separated
-    relationship path (for example, 'owner.name').
+    relationship path (for example, 'owner.name' or
+    'owner.company.name').
 
     `group_by` is a list of dot-separated relationship paths on which to
     group the query results.
 
+    The relationships on the dot-separated paths in `filters`, `sort`,
+    and `group_by` are joined to the query by a
+    :class:`.joins.JoinPlanner`, so each relationship path is joined
+    only once, with an outer join unless the join cannot remove rows
+    from the result.
+
+    `filter_limits` is either ``None`` or an instance of
+    :class:`.filters.FilterLimits` that limits the cost of `filters`. If
+    the filters exceed those limits, this function raises
+    :exc:`.filters.FilterLimitError` without creating the query.
+
+    `text_search` is either ``None`` or an instance of
+    :class:`.textsearch.TextSearch` that names the fields of `model`
+    that may be searched with the ``match`` operator. If `filters` use
+    that operator on any other field, this function raises
+    :exc:`.filters.FilterCreationError`. If `sort` is empty and
+    `text_search` orders results by relevance, the results of a query
+    with the ``match`` operator are ordered by their relevance.
+
+    `in_list_threshold` is the number of values in the argument of an
+    ``in`` or ``not_in`` filter above which the values are sent to the
+    database as a single parameter, or ``None`` if each value should
+    always be a separate parameter.
+
     If `_initial_query` is provided, the filters, sorting, and grouping
     will be appended to this query. Otherwise, an empty query will be
     created for the specified model.
@@ -97,45 +165,39 @@ def search(session, model, filters=None, sort=None, group_by=None,
     if query is None:
         query = session_query(session, model)
 
+    # Each relationship on a dotted field name is joined once, no matter
+    # how many of the filters, sort fields, and grouping fields use it.
+    joins = JoinPlanner(model)
+
     # Filter the query.
     #
     # This function call may raise an exception.
-    filters = create_filters(model, filters)
-    query = query.filter(*filters)
-
-    # Order the query. If no order field is specified, order by primary
+    filters = list(create_filters(model, filters, limits=filter_limits,
+                                  joins=joins,
+                                  in_list_threshold=in_list_threshold))
+    matches = text_matches(filters)
+    if matches:
+        check_text_search(model, matches, text_search)
+
+    # Order the query. If no order field is specified, order by
+    # relevance to the full-text search, if requested, then by primary
     # key.
-    # if not _ignore_sort:
+    order = []
     if sort:
         for (symbol, field_name) in sort:
-            direction_name = 'asc' if symbol == '+' else 'desc'
-            if '.' in field_name:
-                field_name, field_name_in_relation = field_name.split('.')
-                relation_model = aliased(get_related_model(model, field_name))
-                field = getattr(relation_model, field_name_in_relation)
-                direction = getattr(field, direction_name)
-                query = query.join(relation_model)
-                query = query.order_by(direction())
-            else:
-                field = getattr(model, field_name)
-                direction = getattr(field, direction_name)
-                query = query.order_by(direction())
+            field = joins.attribute(field_name)
+            order.append(field.asc() if symbol == '+' else field.desc())
     else:
+        if matches and text_search.order_by_relevance:
+            order.extend(relevance(matches))
         pks = primary_key_names(model)
-        pk_order = (getattr(model, field).asc() for field in pks)
-        query = query.order_by(*pk_order)
+        order.extend(getattr(model, field).asc() for field in pks)
 
     # Group the query.
-    if group_by:
-        for field_name in group_by:
-            if '.' in field_name:
-                field_name, field_name_in_relation = field_name.split('.')
-                relation_model = aliased(get_related_model(model, field_name))
-                field = getattr(relation_model, field_name_in_relation)
-                query = query.join(relation_model)
-                query = query.group_by(field)
-            else:
-                field = getattr(model, field_name)
-                query = query.group_by(field)
+    groups = [joins.attribute(field_name) for field_name in group_by or ()]
 
+    query = joins.apply(query)
+    query = query.filter(*filters).order_by(*order)
+    if groups:
+        query = query.group_by(*groups)
     return query
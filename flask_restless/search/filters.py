@@ -20,18 +20,59 @@ The :exc:`FilterParsingError` and :exc:`FilterCreationError` exceptions
 provide information about problems that arise from parsing filters and
 generating the SQLAlchemy expressions, respectively.
 
+The name of a field may be a dotted field name, like ``author.name``,
+naming an attribute of a model related by a path of to-one
+relationships. Such a field is represented by a :class:`FieldPath`
+until the filter is converted into a SQLAlchemy expression, when it
+becomes an attribute of an alias of the related model joined to the
+query by a :class:`~.joins.JoinPlanner`.
+
+Parsed filters are cached by the shape of the filter, that is, the
+filter with its values removed, so that requests that differ only in the
+values of their filters reuse the same :class:`Filter` object.
+
+Before a filter is converted into a SQLAlchemy expression, the
+:func:`optimize` function simplifies it, so that the database receives
+a smaller expression than the one written by the client.
+
+The :class:`FilterLimits` class restricts the cost of the filters that
+a client may request, as measured by :func:`filter_cost`. Filters over
+the limits cause a :exc:`FilterLimitError` before any SQL is generated.
+
 """
-from operator import methodcaller
 from functools import partial
+from itertools import count
 
 from sqlalchemy import and_
+from sqlalchemy import Date
+from sqlalchemy import DateTime
+from sqlalchemy import event
+from sqlalchemy import false
+from sqlalchemy import Interval
 from sqlalchemy import not_
 from sqlalchemy import or_
-
+from sqlalchemy import Time
+from sqlalchemy import true
+from sqlalchemy.orm import Mapper
+from sqlalchemy.orm.attributes import QueryableAttribute
+from sqlalchemy.sql.expression import ClauseElement
+
+from ..helpers import get_field_type
+from ..helpers import get_related_model
 from ..helpers import get_related_model_from_attribute
+from ..helpers import is_like_list
+from ..helpers import LRUCache
 from ..helpers import string_to_datetime
 from .operators import create_operation
+from .operators import equals
+from .operators import ilike
+from .operators import in_
+from .operators import IN_LIST_THRESHOLD
+from .operators import like
+from .operators import not_in
+from .operators import not_like
 from .operators import NO_ARGUMENT
+from .operators import OPERATORS
 from .operators import OperatorCreationError
 
 
@@ -46,6 +87,192 @@ class FilterParsingError(Exception):
     """
 
 
+class FilterLimitError(Exception):
+    """Raised when a filter exceeds one of the limits of a
+    :class:`FilterLimits` object.
+
+    """
+
+
+#: The maximum number of parsed filters kept in the cache used by
+#: :func:`create_filters`.
+FILTER_CACHE_SIZE = 1024
+
+#: Parsed filters, keyed by model and the shape of the filter, as
+#: computed by :func:`_filter_key`.
+_filter_cache = LRUCache(maxsize=FILTER_CACHE_SIZE)
+
+
+def _clear_filter_cache(*args):
+    """Discards all cached filters.
+
+    Configuring new mappers may change the attributes of a model, so
+    filters parsed before then may no longer be valid.
+
+    """
+    _filter_cache.clear()
+
+
+event.listen(Mapper, 'after_configured', _clear_filter_cache)
+
+
+class Literal(object):
+    """A placeholder for the value on the right side of the operator of
+    a :class:`FieldFilter`.
+
+    `index` is the position of the value in the sequence of values given
+    to :meth:`Filter.to_expression`. `model` and `fieldname` identify
+    the field on the left side of the operator, which determines whether
+    the value must be converted to a date or time.
+
+    """
+
+    __slots__ = ('index', 'model', 'fieldname')
+
+    def __init__(self, index, model, fieldname):
+        self.index = index
+        self.model = model
+        self.fieldname = fieldname
+
+    def __repr__(self):
+        return '<Literal {0}>'.format(self.index)
+
+    def resolve(self, values):
+        """Returns the value of this literal in `values`."""
+        value = values[self.index]
+        # HACK: need to deal with the special case of converting dates.
+        return string_to_datetime(self.model, self.fieldname, value)
+
+
+class LiteralList(object):
+    """A placeholder for the list of values on the right side of an
+    ``in`` operator that replaces a disjunction of equalities and ``in``
+    filters on the same field, as created by :func:`optimize`.
+
+    `items` is a list of pairs of the form ``(is_list, item)``, where
+    ``item`` is either a value or a :class:`Literal`, and ``is_list``
+    indicates whether ``item`` is the list of an ``in`` filter, as
+    opposed to the value of an equality.
+
+    """
+
+    __slots__ = ('items', )
+
+    def __init__(self, items):
+        self.items = items
+
+    def __repr__(self):
+        return '<LiteralList {0}>'.format(self.items)
+
+    def resolve(self, values):
+        """Returns the list of the distinct values of this list in
+        `values`.
+
+        This method raises :exc:`FilterCreationError` if a value is
+        missing or ``None``, or if the value of an ``in`` filter is not
+        a list, just as the original filters would.
+
+        """
+        result = []
+        for is_list, item in self.items:
+            if not isinstance(item, Literal):
+                result.append(item)
+                continue
+            value = item.resolve(values)
+            if value is None:
+                message = ('To compare a value to NULL, use the unary'
+                           ' is_null/is_not_null operators.')
+                raise FilterCreationError(message)
+            if value is NO_ARGUMENT:
+                message = ('expected an argument for this operator but none'
+                           ' was given')
+                raise FilterCreationError(message)
+            if not is_list:
+                result.append(value)
+            elif isinstance(value, (list, tuple)):
+                result.extend(value)
+            else:
+                message = 'expected a list of values for the "in" operator'
+                raise FilterCreationError(message)
+        return _distinct(result)
+
+
+class FieldPath(object):
+    """A placeholder for an attribute of a related model, named by the
+    dotted field name `fieldname`, relative to a model.
+
+    `model` is the related model of which the last name in `fieldname`
+    is an attribute, and `hops` is the number of relationships on the
+    path to that model.
+
+    """
+
+    __slots__ = ('fieldname', 'model', 'hops')
+
+    def __init__(self, fieldname, model, hops):
+        self.fieldname = fieldname
+        self.model = model
+        self.hops = hops
+
+    def __repr__(self):
+        return '<FieldPath {0}>'.format(self.fieldname)
+
+    @property
+    def name(self):
+        """The name of the attribute of :attr:`model`."""
+        return self.fieldname.rsplit('.', 1)[-1]
+
+    def resolve(self, joins):
+        """Returns the attribute named by this path, as given by the
+        :class:`~.joins.JoinPlanner` `joins`.
+
+        """
+        if joins is None:
+            message = 'dotted field name "{0}" is not allowed here'
+            raise FilterCreationError(message.format(self.fieldname))
+        return joins.attribute(self.fieldname)
+
+
+def _field(model, fieldname, nested=False):
+    """Returns the field named by `fieldname` on `model`, either an
+    attribute of `model` or a :class:`FieldPath`.
+
+    `nested` indicates whether the filter is in the argument of a
+    relationship operator, where dotted field names are not allowed.
+
+    This function raises :exc:`FilterParsingError` if there is no such
+    field or if a relationship on a dotted field name is a to-many
+    relationship, since joining it would repeat rows of `model`.
+
+    """
+    if '.' not in fieldname:
+        if not hasattr(model, fieldname):
+            message = 'no such field "{0}"'.format(fieldname)
+            raise FilterParsingError(message)
+        return getattr(model, fieldname)
+    if nested:
+        message = ('dotted field name "{0}" is not allowed in the argument'
+                   ' of a relationship operator').format(fieldname)
+        raise FilterParsingError(message)
+    names = fieldname.split('.')
+    related_model = model
+    for name in names[:-1]:
+        try:
+            to_many = is_like_list(related_model, name)
+        except (AttributeError, KeyError):
+            message = 'no such relationship "{0}"'.format(name)
+            raise FilterParsingError(message)
+        if to_many:
+            message = ('"{0}" is a to-many relationship; use the "any"'
+                       ' operator instead').format(name)
+            raise FilterParsingError(message)
+        related_model = get_related_model(related_model, name)
+    if not hasattr(related_model, names[-1]):
+        message = 'no such field "{0}"'.format(fieldname)
+        raise FilterParsingError(message)
+    return FieldPath(fieldname, related_model, len(names) - 1)
+
+
 class Filter(object):
     """Represents a filter to apply to a SQLAlchemy query object.
 
@@ -57,9 +284,19 @@ class Filter(object):
 
     """
 
-    def to_expression(self):
+    def to_expression(self, values=(), joins=None,
+                      in_list_threshold=IN_LIST_THRESHOLD):
         """Returns the SQLAlchemy expression represented by this filter.
 
+        `values` is the sequence of values for the :class:`Literal`
+        objects in this filter.
+
+        `joins` is the :class:`~.joins.JoinPlanner` that resolves the
+        :class:`FieldPath` objects in this filter.
+
+        `in_list_threshold` is as described in
+        :func:`~.operators.create_operation`.
+
         **This method is not implemented in this base class; subclasses
         must override this method.**
 
@@ -70,17 +307,19 @@ class Filter(object):
 class FieldFilter(Filter):
     """Represents a filter on a field of a model.
 
-    `field` is the field (i.e. the actual column or relationship object)
-    to be placed on the left side of the operator.
+    `field` is the field (i.e. the actual column or relationship object,
+    or a :class:`FieldPath`) to be placed on the left side of the
+    operator.
 
     `operator` is a string representing the SQLAlchemy operator to apply
     to the field named by `fieldname`. This must be one of the
     operations named in :mod:`.operators`.
 
     `argument` is the second argument to the operator, which may be a
-    value (such as a string or an integer) or another field object. This
-    may also be None in case the operator is unary (such as the "is
-    null" operator).
+    value (such as a string or an integer), a :class:`Literal`, another
+    field object or :class:`FieldPath`, or another filter. This may also
+    be None in case the operator is unary (such as the "is null"
+    operator).
 
     """
 
@@ -94,7 +333,8 @@ class FieldFilter(Filter):
         s = s.format(self.field, self.operator, self.argument)
         return s
 
-    def to_expression(self):
+    def to_expression(self, values=(), joins=None,
+                      in_list_threshold=IN_LIST_THRESHOLD):
         """Returns the SQLAlchemy expression represented by this filter.
 
         For example::
@@ -110,15 +350,31 @@ class FieldFilter(Filter):
         problem creating the operator expression.
 
         """
+        field = self.field
+        if isinstance(field, FieldPath):
+            field = field.resolve(joins)
         argument = self.argument
         # In the case of relationship operators 'has' and 'any', the
         # argument is another Filter object entirely, so we need to
         # recursively generate the expression for that Filter object as
         # well.
-        if isinstance(self.argument, Filter):
-            argument = self.argument.to_expression()
+        if isinstance(argument, Filter):
+            argument = argument.to_expression(
+                values, in_list_threshold=in_list_threshold)
+        elif isinstance(argument, (Literal, LiteralList)):
+            argument = argument.resolve(values)
+            # The list of an ``in`` filter is known only now, so an
+            # empty list is replaced by a constant here instead of by
+            # :func:`optimize`.
+            opfunc = OPERATORS.get(self.operator)
+            if opfunc in (in_, not_in) and \
+               isinstance(argument, (list, tuple)) and not argument:
+                return false() if opfunc is in_ else true()
+        elif isinstance(argument, FieldPath):
+            argument = argument.resolve(joins)
         try:
-            return create_operation(self.field, self.operator, argument)
+            return create_operation(field, self.operator, argument,
+                                    in_list_threshold)
         except OperatorCreationError as exception:
             raise FilterCreationError(str(exception))
 
@@ -145,8 +401,10 @@ class NegationFilter(BooleanFilter):
     def __repr__(self):
         return 'not_({0})'.format(repr(self.subfilter))
 
-    def to_expression(self):
-        return not_(self.subfilter.to_expression())
+    def to_expression(self, values=(), joins=None,
+                      in_list_threshold=IN_LIST_THRESHOLD):
+        return not_(self.subfilter.to_expression(values, joins,
+                                                 in_list_threshold))
 
 
 class JunctionFilter(Filter):
@@ -160,7 +418,9 @@ class JunctionFilter(Filter):
     """
 
     def __init__(self, subfilters):
-        self.subfilters = subfilters
+        # Store a list, since the filter may be converted to an
+        # expression more than once.
+        self.subfilters = list(subfilters)
 
 
 class ConjunctionFilter(JunctionFilter):
@@ -169,21 +429,44 @@ class ConjunctionFilter(JunctionFilter):
     def __repr__(self):
         return 'and_{0}'.format(tuple(map(repr, self.subfilters)))
 
-    def to_expression(self):
-        return and_(f.to_expression() for f in self.subfilters)
+    def to_expression(self, values=(), joins=None,
+                      in_list_threshold=IN_LIST_THRESHOLD):
+        return and_(f.to_expression(values, joins, in_list_threshold)
+                    for f in self.subfilters)
 
 
 class DisjunctionFilter(JunctionFilter):
     """A disjunction of other filters."""
 
     def __repr__(self):
-        return 'or_{0}'.format(tuple(map(repr, self)))
+        return 'or_{0}'.format(tuple(map(repr, self.subfilters)))
+
+    def to_expression(self, values=(), joins=None,
+                      in_list_threshold=IN_LIST_THRESHOLD):
+        return or_(f.to_expression(values, joins, in_list_threshold)
+                   for f in self.subfilters)
+
+
+class ConstantFilter(Filter):
+    """A filter that is either always true or always false, depending on
+    the Boolean `value`.
+
+    Filters of this kind are created only by :func:`optimize`.
+
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return '<ConstantFilter {0}>'.format(self.value)
 
-    def to_expression(self):
-        return or_(f.to_expression() for f in self.subfilters)
+    def to_expression(self, values=(), joins=None,
+                      in_list_threshold=IN_LIST_THRESHOLD):
+        return true() if self.value else false()
 
 
-def from_dictionary(model, dictionary):
+def from_dictionary(model, dictionary, _literals=None, _nested=False):
     """Returns a new :class:`Filter` object with arguments parsed from
     `dictionary`.
 
@@ -200,7 +483,9 @@ def from_dictionary(model, dictionary):
     operator to apply, ``dictionary['val']`` is the value on the right to
     which the operator will be applied, and ``dictionary['other']`` is the
     name of the other field of the model to which the operator will be
-    applied.
+    applied. Either name may be a dotted field name, like
+    ``'author.name'``, naming an attribute of a model related to `model`
+    by a path of to-one relationships.
 
     'dictionary' may also be an arbitrary Boolean formula consisting of
     dictionaries such as these. For example::
@@ -220,6 +505,11 @@ def from_dictionary(model, dictionary):
     This method raises :exc:`FilterParsingError` if one of several
     possible errors occurs while parsing the dictionary.
 
+    If `_literals` is not ``None``, it must be an iterator over
+    consecutive integers, and each value in the dictionary is replaced
+    by a :class:`Literal` whose index is taken from that iterator, in
+    the order in which the values are visited by :func:`_filter_key`.
+
     """
     # If there are no ANDs, ORs, and NOTs, we are in the base case
     # of the recursion.
@@ -229,10 +519,7 @@ def from_dictionary(model, dictionary):
         if 'name' not in dictionary:
             raise FilterParsingError('missing field name')
         fieldname = dictionary.get('name')
-        if not hasattr(model, fieldname):
-            message = 'no such field "{0}"'.format(fieldname)
-            raise FilterParsingError(message)
-        field = getattr(model, fieldname)
+        field = _field(model, fieldname, _nested)
         # Next, get the operator to apply to the field.
         if 'op' not in dictionary:
             raise FilterParsingError('missing operator')
@@ -240,11 +527,7 @@ def from_dictionary(model, dictionary):
         # Finally, get the second argument to the operator. The argument
         # may be another field, a simple value, or another filter.
         if 'field' in dictionary:
-            otherfield = dictionary.get('field')
-            if not hasattr(model, otherfield):
-                message = 'no such field "{0}"'.format(otherfield)
-                raise FilterParsingError(message)
-            argument = getattr(model, otherfield)
+            argument = _field(model, dictionary.get('field'), _nested)
             return FieldFilter(field, operator, argument)
         else:
             # We need to be able to distinguish the case of an argument
@@ -258,15 +541,27 @@ def from_dictionary(model, dictionary):
             # construct a filter from the argument.
             if operator in ('has', 'any'):
                 # Get the remote model of the relationship, since
-                # `field` is either an InstrumentedAttribute or an
-                # AssociationProxy.
-                related_model = get_related_model_from_attribute(field)
-                argument = from_dictionary(related_model, argument)
+                # `field` is either an InstrumentedAttribute, an
+                # AssociationProxy, or a FieldPath.
+                if isinstance(field, FieldPath):
+                    related_model = get_related_model(field.model, field.name)
+                else:
+                    related_model = get_related_model_from_attribute(field)
+                argument = from_dictionary(related_model, argument,
+                                           _literals, _nested=True)
+                return FieldFilter(field, operator, argument)
+            # The model and name of the field determine whether the
+            # value must be converted to a date or time.
+            if isinstance(field, FieldPath):
+                model, fieldname = field.model, field.name
+            if _literals is not None:
+                argument = Literal(next(_literals), model, fieldname)
                 return FieldFilter(field, operator, argument)
             # HACK: need to deal with the special case of converting dates.
             argument = string_to_datetime(model, fieldname, argument)
             return FieldFilter(field, operator, argument)
-    from_dict = partial(from_dictionary, model)
+    from_dict = partial(from_dictionary, model, _literals=_literals,
+                        _nested=_nested)
     # If there is an OR or an AND in the dictionary, recurse on the
     # provided list of filters.
     if 'or' in dictionary:
@@ -280,7 +575,524 @@ def from_dictionary(model, dictionary):
     return NegationFilter(from_dict(subfilter))
 
 
-def create_filters(model, filters):
+def _filter_key(dictionary, values):
+    """Returns a hashable object representing the shape of the filter
+    described by `dictionary`, that is, the filter without its values.
+
+    Each value in the filter is appended to the list `values`, in the
+    same order in which :func:`from_dictionary` visits them.
+
+    Two filters have equal keys if and only if :func:`from_dictionary`
+    creates equivalent :class:`Filter` objects from them, up to the
+    values of their :class:`Literal` objects.
+
+    """
+    d = dictionary
+    if 'or' not in d and 'and' not in d and 'not' not in d:
+        fieldname = d.get('name')
+        operator = d.get('op')
+        if 'field' in d:
+            return ('field', fieldname, operator, d.get('field'))
+        if operator in ('has', 'any'):
+            argument = d.get('val', NO_ARGUMENT)
+            return (operator, fieldname, _filter_key(argument, values))
+        values.append(d.get('val', NO_ARGUMENT))
+        return ('val', fieldname, operator)
+    if 'or' in d:
+        return ('or', ) + tuple(_filter_key(f, values) for f in d.get('or'))
+    if 'and' in d:
+        return ('and', ) + tuple(_filter_key(f, values) for f in d.get('and'))
+    return ('not', _filter_key(d.get('not'), values))
+
+
+def parse_filter(model, dictionary):
+    """Returns a pair whose left element is the :class:`Filter` object
+    parsed from `dictionary` and whose right element is the list of
+    values to give to :meth:`Filter.to_expression`.
+
+    The parsed filter is simplified by :func:`optimize` and cached by
+    `model` and the shape of the filter, so parsing another filter that
+    differs only in its values reuses the same :class:`Filter` object,
+    and the same SQL.
+
+    This function raises :exc:`FilterParsingError` under the same
+    conditions as :func:`from_dictionary`.
+
+    """
+    values = []
+    try:
+        key = (model, _filter_key(dictionary, values))
+        filter_ = _filter_cache.get(key)
+    except (AttributeError, TypeError):
+        # The dictionary is malformed or has unhashable elements, so let
+        # the parser report the error, if any.
+        return optimize(from_dictionary(model, dictionary)), ()
+    if filter_ is None:
+        filter_ = from_dictionary(model, dictionary, _literals=count())
+        filter_ = optimize(filter_)
+        _filter_cache[key] = filter_
+    return filter_, values
+
+
+def _is_value(argument):
+    """Returns ``True`` if and only if `argument`, the argument of a
+    :class:`FieldFilter`, is a value supplied by the client, as opposed
+    to a field, a filter, or a SQL function like ``CURRENT_DATE``.
+
+    """
+    if argument is None or argument is NO_ARGUMENT:
+        return False
+    return not isinstance(argument, (ClauseElement, FieldPath, Filter,
+                                     QueryableAttribute))
+
+
+def _field_key(field):
+    """Returns a hashable object that is equal for equal fields of a
+    :class:`FieldFilter`.
+
+    """
+    if isinstance(field, FieldPath):
+        return ('path', field.fieldname)
+    # SQLAlchemy overrides the equality operator of attributes, so
+    # compare them by identity.
+    return ('object', id(field))
+
+
+def _hashable(argument):
+    """Returns a hashable object that is equal for equal arguments of a
+    :class:`FieldFilter`.
+
+    This function raises :exc:`TypeError` if there is no such object.
+
+    """
+    if isinstance(argument, Filter):
+        return _predicate_key(argument)
+    if isinstance(argument, (Literal, LiteralList)):
+        # The values of literals are not known yet, so each literal is
+        # equal only to itself.
+        return ('literal', id(argument))
+    if isinstance(argument, (ClauseElement, FieldPath, QueryableAttribute)):
+        return _field_key(argument)
+    if isinstance(argument, list):
+        argument = tuple(argument)
+    hash(argument)
+    return ('value', type(argument), argument)
+
+
+def _predicate_key(filter_):
+    """Returns a hashable object that is equal for filters that are
+    syntactically equal.
+
+    This function raises :exc:`TypeError` if there is no such object.
+
+    """
+    if isinstance(filter_, FieldFilter):
+        # Aliases of an operator, like 'eq' and '==', map to the same
+        # function.
+        operator = OPERATORS.get(filter_.operator, filter_.operator)
+        return ('field', _field_key(filter_.field), operator,
+                _hashable(filter_.argument))
+    if isinstance(filter_, NegationFilter):
+        return ('not', _predicate_key(filter_.subfilter))
+    if isinstance(filter_, ConstantFilter):
+        return ('constant', filter_.value)
+    name = 'and' if isinstance(filter_, ConjunctionFilter) else 'or'
+    return (name, ) + tuple(map(_predicate_key, filter_.subfilters))
+
+
+def _dedupe(filters):
+    """Returns the list `filters` without its duplicate elements,
+    preserving the order of the first occurrence of each element.
+
+    """
+    seen = set()
+    result = []
+    for filter_ in filters:
+        try:
+            key = _predicate_key(filter_)
+        except TypeError:
+            result.append(filter_)
+            continue
+        if key not in seen:
+            seen.add(key)
+            result.append(filter_)
+    return result
+
+
+def _converts_values(field):
+    """Returns ``True`` unless the values compared with `field`, the
+    field of a :class:`FieldFilter`, are known to be used as given.
+
+    The values compared with a date, time, or interval column are
+    converted by :func:`~flask_restless.helpers.string_to_datetime`,
+    but only in equalities, not in the lists of ``in`` filters.
+
+    """
+    if isinstance(field, FieldPath):
+        model, fieldname = field.model, field.name
+    elif isinstance(field, QueryableAttribute):
+        model, fieldname = field.class_, field.key
+    else:
+        return True
+    field_type = get_field_type(model, fieldname)
+    return isinstance(field_type, (Date, DateTime, Interval, Time))
+
+
+def _in_items(filter_):
+    """Returns the list of ``(is_list, item)`` pairs, as described in
+    :class:`LiteralList`, whose values the equality or ``in`` filter
+    `filter_` compares with its field, or ``None`` if `filter_` cannot be
+    merged with other filters on the same field.
+
+    """
+    opfunc = OPERATORS.get(filter_.operator)
+    argument = filter_.argument
+    if opfunc is equals:
+        if isinstance(argument, Literal):
+            return [(False, argument)]
+        if _is_value(argument):
+            try:
+                hash(argument)
+            except TypeError:
+                return None
+            return [(False, argument)]
+        return None
+    if opfunc is not in_:
+        return None
+    if isinstance(argument, Literal):
+        return [(True, argument)]
+    if isinstance(argument, LiteralList):
+        return list(argument.items)
+    if not (isinstance(argument, (list, tuple))
+            and all(map(_is_value, argument))):
+        return None
+    try:
+        for value in argument:
+            hash(value)
+    except TypeError:
+        return None
+    return [(False, value) for value in argument]
+
+
+def _merge_equalities(filters):
+    """Replaces the equality and ``in`` filters on the same field in the
+    list `filters`, the disjuncts of a :class:`DisjunctionFilter`, with a
+    single ``in`` filter.
+
+    The merged filter takes the place of the first filter on that field.
+    Filters on fields whose values are converted to dates or times are
+    not merged, since the values of an ``in`` filter are not converted.
+
+    """
+    merged = {}
+    # This list contains filters and, in place of the filters that will
+    # be merged, the keys of `merged`.
+    result = []
+    for filter_ in filters:
+        if isinstance(filter_, FieldFilter) and \
+           not _converts_values(filter_.field):
+            items = _in_items(filter_)
+            if items is not None:
+                key = _field_key(filter_.field)
+                if key not in merged:
+                    merged[key] = (filter_, [])
+                    result.append(key)
+                merged[key][1].extend(items)
+                continue
+        result.append(filter_)
+    # TODO In Python 2.7+, this should be a dict comprehension.
+    merged = dict((key, _in_filter(original, items))
+                  for key, (original, items) in merged.items())
+    return [merged[f] if not isinstance(f, Filter) else f for f in result]
+
+
+def _distinct(values):
+    """Returns the list `values` without its duplicate elements,
+    preserving their order, or `values` itself if its elements are not
+    hashable.
+
+    """
+    seen = set()
+    try:
+        return [v for v in values if not (v in seen or seen.add(v))]
+    except TypeError:
+        return values
+
+
+def _in_filter(original, items):
+    """Returns a filter equivalent to the disjunction of the equalities
+    between the field of the :class:`FieldFilter` `original` and each of
+    the values of `items`, a list of pairs as described in
+    :class:`LiteralList`.
+
+    If the values are known and there is only one distinct value, the
+    returned filter is an equality instead. If some values are
+    :class:`Literal` objects, the argument of the returned filter is a
+    :class:`LiteralList`.
+
+    """
+    if any(isinstance(item, Literal) for is_list, item in items):
+        return FieldFilter(original.field, 'in', LiteralList(items))
+    values = _distinct([item for is_list, item in items])
+    if len(values) == 1:
+        return FieldFilter(original.field, 'eq', values[0])
+    return FieldFilter(original.field, 'in', values)
+
+
+def optimize(filter_):
+    """Returns a simplified :class:`Filter` equivalent to `filter_`.
+
+    The simplifications depend only on the structure of `filter_`, not
+    on the values of its :class:`Literal` objects, so the simplified
+    filter is computed once for each filter cached by
+    :func:`parse_filter`. `filter_` itself is not modified.
+
+    The simplifications are
+
+    * nested conjunctions and nested disjunctions are flattened, and
+      conjunctions or disjunctions of a single filter are replaced by
+      that filter,
+    * duplicate filters in a conjunction or disjunction are removed,
+    * a negation of a negation is replaced by the original filter,
+    * in a disjunction, equalities and ``in`` filters on the same field
+      are merged into a single ``in`` filter,
+    * an ``in`` filter with an empty list is replaced by a false
+      constant (and ``not_in`` by a true constant), and constants are
+      folded into the conjunctions, disjunctions, and negations that
+      contain them; for a list given by a :class:`Literal`, this
+      happens in :meth:`FieldFilter.to_expression` instead.
+
+    Filters that would cause an error when converted into a SQLAlchemy
+    expression, for example, equalities with ``None``, are left
+    unchanged, so that the error is raised as usual.
+
+    """
+    if isinstance(filter_, FieldFilter):
+        argument = filter_.argument
+        if isinstance(argument, Filter):
+            argument = optimize(argument)
+        opfunc = OPERATORS.get(filter_.operator)
+        if opfunc in (in_, not_in) and \
+           isinstance(argument, (list, tuple)) and not argument:
+            return ConstantFilter(opfunc is not in_)
+        return FieldFilter(filter_.field, filter_.operator, argument)
+    if isinstance(filter_, NegationFilter):
+        subfilter = optimize(filter_.subfilter)
+        if isinstance(subfilter, NegationFilter):
+            return subfilter.subfilter
+        if isinstance(subfilter, ConstantFilter):
+            return ConstantFilter(not subfilter.value)
+        return NegationFilter(subfilter)
+    if not isinstance(filter_, JunctionFilter):
+        return filter_
+    cls = type(filter_)
+    # An empty conjunction or disjunction has always been a filter that
+    # does nothing, so leave it that way.
+    if not filter_.subfilters:
+        return cls([])
+    # In a conjunction, a false filter makes the whole conjunction false
+    # and a true filter can be ignored; vice versa for a disjunction.
+    absorbing = cls is DisjunctionFilter
+    subfilters = []
+    for subfilter in filter_.subfilters:
+        subfilter = optimize(subfilter)
+        if isinstance(subfilter, cls):
+            subfilters.extend(subfilter.subfilters)
+        elif isinstance(subfilter, ConstantFilter):
+            if subfilter.value is absorbing:
+                return subfilter
+        else:
+            subfilters.append(subfilter)
+    if cls is DisjunctionFilter:
+        subfilters = _merge_equalities(subfilters)
+    subfilters = _dedupe(subfilters)
+    if not subfilters:
+        return ConstantFilter(not absorbing)
+    if len(subfilters) == 1:
+        return subfilters[0]
+    return cls(subfilters)
+
+
+class FilterCost(object):
+    """The cost of a filter, or of several filters applied together, as
+    computed by :func:`filter_cost`.
+
+    `depth` is the greatest number of nested filters, `nodes` is the
+    total number of filters, `in_list` is the length of the longest
+    list of values given to an ``in`` or ``not_in`` operator, `hops` is
+    the greatest number of relationships traversed by nested ``has`` and
+    ``any`` operators and dotted field names, and
+    `leading_wildcards` is the number of ``like``, ``ilike``, and
+    ``not_like`` operators whose pattern starts with a wildcard.
+
+    """
+
+    __slots__ = ('depth', 'nodes', 'in_list', 'hops', 'leading_wildcards')
+
+    def __init__(self, depth=0, nodes=0, in_list=0, hops=0,
+                 leading_wildcards=0):
+        self.depth = depth
+        self.nodes = nodes
+        self.in_list = in_list
+        self.hops = hops
+        self.leading_wildcards = leading_wildcards
+
+    def __repr__(self):
+        s = ('<FilterCost depth={0} nodes={1} in_list={2} hops={3}'
+             ' leading_wildcards={4}>')
+        return s.format(self.depth, self.nodes, self.in_list, self.hops,
+                        self.leading_wildcards)
+
+    def __add__(self, other):
+        """Returns the cost of applying the filters that cost `self` and
+        `other` together, as sibling filters.
+
+        """
+        return FilterCost(depth=max(self.depth, other.depth),
+                          nodes=self.nodes + other.nodes,
+                          in_list=max(self.in_list, other.in_list),
+                          hops=max(self.hops, other.hops),
+                          leading_wildcards=(self.leading_wildcards +
+                                             other.leading_wildcards))
+
+    def nested(self, hops=0):
+        """Returns the cost of a filter whose only children cost `self`.
+
+        `hops` is the number of relationships traversed by the parent
+        filter.
+
+        """
+        return FilterCost(depth=self.depth + 1, nodes=self.nodes + 1,
+                          in_list=self.in_list, hops=self.hops + hops,
+                          leading_wildcards=self.leading_wildcards)
+
+
+def _has_leading_wildcard(pattern):
+    """Returns ``True`` if and only if `pattern`, the argument of a
+    ``LIKE`` operator, starts with a wildcard, so that the database
+    cannot use an index to evaluate the operator.
+
+    """
+    try:
+        return pattern.startswith(('%', '_'))
+    except (AttributeError, TypeError):
+        return False
+
+
+def filter_cost(filter_, values=()):
+    """Returns the :class:`FilterCost` of the :class:`Filter` object
+    `filter_`, for example, a filter returned by :func:`parse_filter`.
+
+    `values` is the sequence of values for the :class:`Literal` objects
+    in `filter_`.
+
+    """
+    if isinstance(filter_, FieldFilter):
+        field, argument = filter_.field, filter_.argument
+        hops = field.hops if isinstance(field, FieldPath) else 0
+        if isinstance(argument, Filter):
+            return filter_cost(argument, values).nested(hops=hops + 1)
+        if isinstance(argument, FieldPath):
+            hops = max(hops, argument.hops)
+        cost = FilterCost(depth=1, nodes=1, hops=hops)
+        opfunc = OPERATORS.get(filter_.operator)
+        if opfunc in (in_, not_in, like, ilike, not_like) and \
+           isinstance(argument, (Literal, LiteralList)):
+            argument = argument.resolve(values)
+        if opfunc in (in_, not_in) and isinstance(argument, (list, tuple)):
+            cost.in_list = len(argument)
+        elif opfunc in (like, ilike, not_like) and \
+                _has_leading_wildcard(argument):
+            cost.leading_wildcards = 1
+        return cost
+    if isinstance(filter_, NegationFilter):
+        return filter_cost(filter_.subfilter, values).nested()
+    if isinstance(filter_, JunctionFilter):
+        costs = (filter_cost(f, values) for f in filter_.subfilters)
+        return sum(costs, FilterCost()).nested()
+    return FilterCost(depth=1, nodes=1)
+
+
+class FilterLimits(object):
+    """Limits on the cost of the filters that a client may request.
+
+    `max_depth` is the maximum number of nested filters, counting each
+    ``and``, ``or``, ``not``, ``has``, and ``any`` as one level.
+
+    `max_nodes` is the maximum total number of filters, including the
+    ones nested in other filters, in all the filter objects of a
+    request.
+
+    `max_in_list` is the maximum number of values given to an ``in`` or
+    ``not_in`` operator, including the values of equalities merged into
+    such an operator by :func:`optimize`.
+
+    `max_relationship_hops` is the maximum number of relationships
+    traversed by nested ``has`` and ``any`` operators and dotted field
+    names.
+
+    If `allow_leading_wildcard` is ``False``, ``like``, ``ilike``, and
+    ``not_like`` operators whose pattern starts with ``%`` or ``_`` are
+    not allowed, since they cannot use an index.
+
+    A limit of ``None`` means that there is no limit.
+
+    """
+
+    def __init__(self, max_depth=None, max_nodes=None, max_in_list=None,
+                 max_relationship_hops=None, allow_leading_wildcard=True):
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.max_in_list = max_in_list
+        self.max_relationship_hops = max_relationship_hops
+        self.allow_leading_wildcard = allow_leading_wildcard
+
+    def check(self, cost):
+        """Raises :exc:`FilterLimitError` if the :class:`FilterCost`
+        `cost` exceeds any of these limits.
+
+        """
+        limits = (('depth', self.max_depth, 'nesting depth'),
+                  ('nodes', self.max_nodes, 'number of filters'),
+                  ('in_list', self.max_in_list, 'number of values in a list'),
+                  ('hops', self.max_relationship_hops,
+                   'number of relationships traversed'))
+        for attribute, limit, description in limits:
+            value = getattr(cost, attribute)
+            if limit is not None and value > limit:
+                message = '{0} is {1}, but the maximum is {2}'
+                message = message.format(description, value, limit)
+                raise FilterLimitError(message)
+        if not self.allow_leading_wildcard and cost.leading_wildcards:
+            message = 'patterns starting with a wildcard are not allowed'
+            raise FilterLimitError(message)
+
+
+def create_filter_limits(limits=None):
+    """Returns an instance of :class:`FilterLimits`, or ``None`` if
+    there are no limits.
+
+    If `limits` is ``None``, this returns ``None``. If `limits` is a
+    dictionary, this returns a :class:`FilterLimits` object created with
+    the items of the dictionary as keyword arguments. If `limits` is
+    already an instance of :class:`FilterLimits`, it is returned
+    unchanged.
+
+    In any other case, this function raises :exc:`ValueError`.
+
+    """
+    if limits is None or isinstance(limits, FilterLimits):
+        return limits
+    if isinstance(limits, dict):
+        try:
+            return FilterLimits(**limits)
+        except TypeError as exception:
+            raise ValueError('invalid filter limits: {0}'.format(exception))
+    raise ValueError('invalid filter limits: {0!r}'.format(limits))
+
+
+def create_filters(model, filters, limits=None, joins=None,
+                   in_list_threshold=IN_LIST_THRESHOLD):
     """Returns an iterator over SQLAlchemy filter expressions.
 
     The objects generated by this function can be provided as the
@@ -300,14 +1112,31 @@ def create_filters(model, filters):
     :exc:`FilterCreationError` if there is a problem converting the
     intermediate representation into a SQLAlchemy expression.
 
+    If `limits` is an instance of :class:`FilterLimits`, this function
+    raises :exc:`FilterLimitError` if the total cost of the filters
+    exceeds those limits, before any SQLAlchemy expression is created.
+
+    `joins` is the :class:`~.joins.JoinPlanner` that joins the related
+    models named by dotted field names in the filters to the query. If
+    it is ``None``, dotted field names cause a
+    :exc:`FilterCreationError`.
+
+    `in_list_threshold` is the number of values in the argument of an
+    ``in`` or ``not_in`` filter above which the values are sent to the
+    database as a single parameter, as described in
+    :func:`~.operators.create_operation`.
+
     """
-    from_dict = partial(from_dictionary, model)
-    # `Filter.from_dictionary()` converts the dictionary representation
-    # of a filter object into an intermediate representation, an
-    # instance of :class:`.Filter` that facilitates the construction of
-    # the actual SQLAlchemy code in `create_filter` below.
-    filters = map(from_dict, filters)
-    # Each of these function calls may raise a FilterCreationError.
-    #
-    # TODO In Python 3.3+, this should be `yield from ...`.
-    return map(methodcaller('to_expression'), filters)
+    # `parse_filter()` converts the dictionary representation of a
+    # filter object into an intermediate representation, an instance of
+    # :class:`.Filter` that facilitates the construction of the actual
+    # SQLAlchemy code below.
+    parsed = [parse_filter(model, dictionary) for dictionary in filters or ()]
+    if limits is not None:
+        # The filter objects are applied together, so their costs add up.
+        costs = (filter_cost(filter_, values) for filter_, values in parsed)
+        limits.check(sum(costs, FilterCost()))
+    for filter_, values in parsed:
+        # This function call may raise a FilterCreationError.
+        yield filter_.to_expression(values, joins=joins,
+                                    in_list_threshold=in_list_threshold)
@@ -0,0 +1,105 @@
+# joins.py - joining related models along dotted relationship paths
+#
+# Copyright 2011 Lincoln de Sousa <lincoln@comum.org>.
+# Copyright 2012, 2013, 2014, 2015, 2016 Jeffrey Finkelstein
+#           <jeffrey.finkelstein@gmail.com> and contributors.
+#
+# This file is part of Flask-Restless.
+#
+# Flask-Restless is distributed under both the GNU Affero General Public
+# License version 3 and under the 3-clause BSD license. For more
+# information, see LICENSE.AGPL and LICENSE.BSD.
+"""Joins the related models named by dotted field names to a query.
+
+A dotted field name, like ``author.company.name``, names an attribute
+of a related model. The :class:`JoinPlanner` class resolves such names
+into attributes of aliases of the related models, joining each
+relationship path to the query at most once, so the sorting, grouping,
+and filtering of a single query all share the same joins.
+
+"""
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.interfaces import MANYTOONE
+
+from ..helpers import get_related_model
+from ..helpers import model_metadata
+
+
+class JoinPlanner(object):
+    """Plans the joins needed to access the attributes of related models
+    from a query on `model`.
+
+    Call :meth:`attribute` for each dotted field name used by the query,
+    then call :meth:`apply` to add the joins to the query.
+
+    Each relationship is joined with an inner join only if every
+    instance of the model on its left side is certain to have a related
+    instance, that is, if it is a many-to-one relationship whose foreign
+    key columns are not nullable and it is not on the right side of an
+    outer join. Otherwise it is joined with a left outer join, so that
+    joining a relationship never removes a row from the result of the
+    query.
+
+    """
+
+    def __init__(self, model):
+        self.model = model
+        #: Maps each relationship path, as a tuple of relationship
+        #: names, to a triple of the form ``(alias, model, outer)``,
+        #: where ``alias`` is the alias of ``model`` joined to the query
+        #: for that path and ``outer`` is whether it is joined with an
+        #: outer join.
+        self._aliases = {(): (model, model, False)}
+        #: The joins in the order in which they must be applied, as
+        #: triples of the form ``(relationship, alias, outer)``.
+        self._joins = []
+
+    def _join(self, path):
+        """Returns the triple ``(alias, model, outer)`` for the
+        relationship path `path`, a tuple of relationship names, planning
+        the join of each relationship on the path that has not been
+        planned already.
+
+        """
+        if path in self._aliases:
+            return self._aliases[path]
+        parent, parent_model, parent_outer = self._join(path[:-1])
+        name = path[-1]
+        related_model = get_related_model(parent_model, name)
+        prop = model_metadata(parent_model).mapper.relationships[name]
+        outer = parent_outer or not _is_required(prop)
+        alias = aliased(related_model)
+        self._aliases[path] = (alias, related_model, outer)
+        self._joins.append((getattr(parent, name), alias, outer))
+        return self._aliases[path]
+
+    def attribute(self, fieldname):
+        """Returns the attribute named by `fieldname`, which may be a
+        dotted field name, as an attribute of the model or of an alias
+        of a related model.
+
+        This function raises :exc:`AttributeError` or :exc:`KeyError`
+        if `fieldname` does not name an attribute of the model or of a
+        model related to it by a path of relationships.
+
+        """
+        names = fieldname.split('.')
+        alias, model, outer = self._join(tuple(names[:-1]))
+        return getattr(alias, names[-1])
+
+    def apply(self, query):
+        """Returns `query` with the joins planned so far."""
+        for relationship, alias, outer in self._joins:
+            join = query.outerjoin if outer else query.join
+            query = join(relationship.of_type(alias))
+        return query
+
+
+def _is_required(prop):
+    """Returns ``True`` if and only if every instance on the left side of
+    the relationship `prop` has a related instance.
+
+    """
+    if prop.direction is not MANYTOONE:
+        return False
+    return all(not column.nullable for column in prop.local_columns)
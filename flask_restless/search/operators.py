@@ -17,11 +17,65 @@ SQLAlchemy operation that can be used by the
 :exc:`.OperatorCreationError` exception is raised when there is a problem
 creating the expression.
 
+The ``in`` and ``not_in`` operators represent lists of more than
+a threshold number of values (by default, :data:`IN_LIST_THRESHOLD`)
+with a :class:`ValueList` expression, which sends the whole list as a
+single parameter on databases that support it, instead of one parameter
+for each value.
+
+The ``match`` operator (also named ``search``) is a full-text search,
+represented by a :class:`TextMatch` expression that uses the text search
+index of the database, as created by
+:func:`~flask_restless.search.textsearch.create_text_search_index`.
+
 """
+import json
+from numbers import Real
+
+from sqlalchemy import Boolean
+from sqlalchemy import Float
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import all_ as ALL
+from sqlalchemy.sql.expression import any_ as ANY
+from sqlalchemy.sql.expression import bindparam
+from sqlalchemy.sql.expression import case
+from sqlalchemy.sql.expression import and_
+from sqlalchemy.sql.expression import column
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.expression import false
+from sqlalchemy.sql.expression import func
+from sqlalchemy.sql.expression import literal_column
+from sqlalchemy.sql.expression import select
+from sqlalchemy.sql.expression import table
+
+#: The types of values that can be sent to SQLite in a JSON array.
+JSON_TYPES = (Real, str, type(u''))
+
 #: Special symbol that represents the absence of a `val` element in a
 #: dictionary representing a filter object.
 NO_ARGUMENT = object()
 
+#: The default number of values in the argument of the ``in`` and
+#: ``not_in`` operators above which the values are represented by a
+#: :class:`ValueList` instead of one bound parameter for each value.
+#:
+#: The threshold of each API is set by the ``in_list_threshold`` keyword
+#: argument to :meth:`~flask_restless.APIManager.create_api`.
+IN_LIST_THRESHOLD = 100
+
+#: The PostgreSQL text search configuration used by the ``match``
+#: operator.
+#:
+#: The text search indices must be created with the same configuration,
+#: or the database will not use them.
+TEXT_SEARCH_CONFIG = 'english'
+
+#: The escape character of the pattern matches by which the ``match``
+#: operator searches for words on databases other than PostgreSQL and
+#: SQLite.
+LIKE_ESCAPE = '/'
+
 
 class OperatorCreationError(Exception):
     """Raised when there is a problem creating an operator expression."""
@@ -102,14 +156,284 @@ def not_like(arg1, arg2):
     return ~arg1.like(arg2)
 
 
-def in_(arg1, arg2):
+class ValueList(ColumnElement):
+    """A SQL expression that is true if and only if the value of
+    `column` is in (or, if `negate` is ``True``, is not in) the list
+    `values`.
+
+    How the expression is compiled depends on the database:
+
+    * on PostgreSQL, the list is a single array parameter, as in
+      ``column = ANY (:values::INTEGER[])``,
+    * on SQLite 3.38 or later, the list is a single JSON parameter, as
+      in ``column IN (SELECT value FROM json_each(:values))``,
+    * on other databases, the list is an expanding bound parameter, so
+      the statement has one placeholder for each value, but the
+      SQLAlchemy expression is the same for lists of any length.
+
+    The expanding bound parameter is also used on PostgreSQL and SQLite
+    if the type of `column` transforms bound values before sending them
+    to the database, and on SQLite if any value is not a number or a
+    string.
+
+    """
+
+    type = Boolean()
+
+    def __init__(self, column, values, negate=False):
+        self.column = column
+        self.values = list(values)
+        self.negate = negate
+
+    def self_group(self, against=None):
+        # This expression is already a Boolean comparison, so it must
+        # not be compared to true when it appears in a WHERE clause.
+        return self
+
+    def _negate(self):
+        return ValueList(self.column, self.values, negate=not self.negate)
+
+
+def _processes_binds(column, dialect):
+    """Returns ``True`` if and only if the type of `column` transforms
+    bound values before sending them to the database described by
+    `dialect`.
+
+    """
+    column_type = column.type.dialect_impl(dialect)
+    return column_type.bind_processor(dialect) is not None
+
+
+@compiles(ValueList)
+def _compile_value_list(element, compiler, **kw):
+    values = bindparam(None, element.values, expanding=True)
+    if element.negate:
+        expression = element.column.notin_(values)
+    else:
+        expression = element.column.in_(values)
+    return compiler.process(expression, **kw)
+
+
+@compiles(ValueList, 'postgresql')
+def _compile_value_list_postgresql(element, compiler, **kw):
+    if _processes_binds(element.column, compiler.dialect):
+        return _compile_value_list(element, compiler, **kw)
+    # SQLAlchemy casts the array parameter to the array type, so its
+    # elements may be strings that represent values of some other type.
+    array_type = ARRAY(element.column.type)
+    values = bindparam(None, element.values, type_=array_type)
+    if element.negate:
+        expression = element.column != ALL(values)
+    else:
+        expression = element.column == ANY(values)
+    return compiler.process(expression, **kw)
+
+
+@compiles(ValueList, 'sqlite')
+def _compile_value_list_sqlite(element, compiler, **kw):
+    dialect = compiler.dialect
+    # The JSON functions are built in starting with SQLite 3.38.
+    if (dialect.dbapi is None or dialect.dbapi.sqlite_version_info < (3, 38)
+            or _processes_binds(element.column, dialect)
+            or not all(isinstance(v, JSON_TYPES) for v in element.values)):
+        return _compile_value_list(element, compiler, **kw)
+    values = func.json_each(bindparam(None, json.dumps(element.values)))
+    values = select([column('value')]).select_from(values)
+    if element.negate:
+        expression = element.column.notin_(values)
+    else:
+        expression = element.column.in_(values)
+    return compiler.process(expression, **kw)
+
+
+def _is_large_list(arg2, threshold):
+    """Returns ``True`` if and only if `arg2` is a list with more than
+    `threshold` values.
+
+    If `threshold` is ``None``, no list is large.
+
+    """
+    return (threshold is not None and
+            isinstance(arg2, (list, tuple)) and
+            len(arg2) > threshold)
+
+
+def in_(arg1, arg2, threshold=IN_LIST_THRESHOLD):
+    if _is_large_list(arg2, threshold) and hasattr(arg1, 'type'):
+        return ValueList(arg1, arg2)
     return arg1.in_(arg2)
 
 
-def not_in(arg1, arg2):
+def not_in(arg1, arg2, threshold=IN_LIST_THRESHOLD):
+    if _is_large_list(arg2, threshold) and hasattr(arg1, 'type'):
+        return ValueList(arg1, arg2, negate=True)
     return ~arg1.in_(arg2)
 
 
+class TextMatch(ColumnElement):
+    """A SQL expression that is true if and only if the text in `column`
+    contains each of the words in the string `terms`.
+
+    How the expression is compiled depends on the database:
+
+    * on PostgreSQL, the expression is ``to_tsvector(config, column) @@
+      plainto_tsquery(config, :terms)``, where ``config`` is
+      :data:`TEXT_SEARCH_CONFIG`, which can use a GIN index on the
+      ``to_tsvector`` expression,
+    * on SQLite, the expression selects the rows that match the words
+      in the FTS5 virtual table named ``<table>_fts``, whose row IDs
+      are the primary keys of the table of `column`,
+    * on other databases, the expression is a conjunction of
+      case-insensitive ``LIKE`` expressions, one for each word.
+
+    Both the virtual table and the index can be created by
+    :func:`~flask_restless.search.textsearch.create_text_search_index`.
+
+    """
+
+    type = Boolean()
+
+    def __init__(self, column, terms):
+        self.column = column
+        self.terms = terms
+
+    @property
+    def words(self):
+        """The list of words in the search terms."""
+        return self.terms.split()
+
+    def self_group(self, against=None):
+        # This expression is already a Boolean comparison, so it must
+        # not be compared to true when it appears in a WHERE clause.
+        return self
+
+
+class TextRank(ColumnElement):
+    """A SQL expression for the relevance of the text in the column of
+    the :class:`TextMatch` expression `match` to its search terms.
+
+    Greater values indicate more relevant text. On databases other than
+    PostgreSQL and SQLite, the relevance is the number of words in the
+    search terms that appear in the text.
+
+    """
+
+    type = Float()
+
+    def __init__(self, match):
+        self.match = match
+
+
+def _tsvector_and_query(match):
+    """Returns the pair of PostgreSQL functions ``to_tsvector()`` and
+    ``plainto_tsquery()`` for the :class:`TextMatch` expression `match`.
+
+    """
+    # The configuration must be a literal, not a bound parameter, so
+    # that the expression is the same as the expression in the index.
+    config = "'{0}'::regconfig".format(TEXT_SEARCH_CONFIG.replace("'", "''"))
+    config = literal_column(config)
+    vector = func.to_tsvector(config, match.column)
+    query = func.plainto_tsquery(config, bindparam(None, match.terms))
+    return vector, query
+
+
+def _fts5_match(match):
+    """Returns the pair ``(fts, condition)``, where ``fts`` is the FTS5
+    virtual table for the table of the column of the :class:`TextMatch`
+    expression `match` and ``condition`` is the ``MATCH`` expression on
+    that table.
+
+    """
+    column_table = match.column.table
+    name = getattr(column_table, 'original', column_table).name
+    fts = table('{0}_fts'.format(name), column('rowid'), column('rank'),
+                column(match.column.name))
+    # Quote each word, so that the terms are words to find, not FTS5
+    # query syntax, like the terms given to ``plainto_tsquery()``.
+    words = ('"{0}"'.format(word.replace('"', '""')) for word in match.words)
+    terms = bindparam(None, ' '.join(words))
+    return fts, fts.c[match.column.name].op('MATCH')(terms)
+
+
+def _row_id(match):
+    """Returns the column of the table of the column of the
+    :class:`TextMatch` expression `match` whose values are the row IDs
+    of the FTS5 virtual table.
+
+    """
+    return list(match.column.table.primary_key)[0]
+
+
+def _contains_word(column, word):
+    """Returns a case-insensitive pattern match expression that is true
+    if and only if `word` appears in the text of `column`.
+
+    The wildcard characters and the escape character in `word` are
+    escaped, so that they match only themselves.
+
+    """
+    for character in (LIKE_ESCAPE, '%', '_'):
+        word = word.replace(character, LIKE_ESCAPE + character)
+    return column.ilike(u'%{0}%'.format(word), escape=LIKE_ESCAPE)
+
+
+@compiles(TextMatch)
+def _compile_text_match(element, compiler, **kw):
+    expressions = [_contains_word(element.column, word)
+                   for word in element.words]
+    return compiler.process(and_(*expressions), **kw)
+
+
+@compiles(TextMatch, 'postgresql')
+def _compile_text_match_postgresql(element, compiler, **kw):
+    vector, query = _tsvector_and_query(element)
+    return compiler.process(vector.op('@@')(query), **kw)
+
+
+@compiles(TextMatch, 'sqlite')
+def _compile_text_match_sqlite(element, compiler, **kw):
+    fts, condition = _fts5_match(element)
+    rowids = select([fts.c.rowid]).where(condition)
+    return compiler.process(_row_id(element).in_(rowids), **kw)
+
+
+@compiles(TextRank)
+def _compile_text_rank(element, compiler, **kw):
+    match = element.match
+    counts = (case([(_contains_word(match.column, word), 1)], else_=0)
+              for word in match.words)
+    return compiler.process(sum(counts), **kw)
+
+
+@compiles(TextRank, 'postgresql')
+def _compile_text_rank_postgresql(element, compiler, **kw):
+    vector, query = _tsvector_and_query(element.match)
+    return compiler.process(func.ts_rank(vector, query), **kw)
+
+
+@compiles(TextRank, 'sqlite')
+def _compile_text_rank_sqlite(element, compiler, **kw):
+    fts, condition = _fts5_match(element.match)
+    # The FTS5 rank is smaller for more relevant rows.
+    rank = select([-fts.c.rank]).where(condition)
+    rank = rank.where(fts.c.rowid == _row_id(element.match))
+    return compiler.process(rank.as_scalar(), **kw)
+
+
+def match(arg1, arg2):
+    if not getattr(getattr(arg1, 'property', None), 'columns', None):
+        message = 'the "match" operator requires a column'
+        raise OperatorCreationError(message)
+    if not isinstance(arg2, (str, type(u''))):
+        raise OperatorCreationError('the "match" operator requires a string')
+    # Like ``plainto_tsquery()``, search terms without any words match
+    # nothing.
+    if not arg2.split():
+        return false()
+    return TextMatch(arg1.__clause_element__(), arg2)
+
+
 def has(arg1, arg2):
     return arg1.has(arg2)
 
@@ -167,10 +491,14 @@ OPERATORS = {
     # (Binary) relationship operators.
     'has': has,
     'any': any_,
+    # Full-text search operators.
+    'match': match,
+    'search': match,
 }
 
 
-def create_operation(arg1, operator, arg2):
+def create_operation(arg1, operator, arg2,
+                     in_list_threshold=IN_LIST_THRESHOLD):
     """Creates a SQLAlchemy expression for the given operation.
 
     More specifically, this translates the string representation of an
@@ -195,6 +523,11 @@ def create_operation(arg1, operator, arg2):
     two arguments but `arg2` is None, since comparisons to ``NULL``
     should use the 'is_null' or 'is_not_null' unary operators instead.
 
+    `in_list_threshold` is the number of values in the argument of the
+    'in' and 'not_in' operators above which the values are sent to the
+    database as a single :class:`ValueList`, or ``None`` if each value
+    should always be a separate bound parameter.
+
     """
     if operator not in OPERATORS:
         raise OperatorCreationError('unknown operator "{0}"'.format(operator))
@@ -222,4 +555,6 @@ def create_operation(arg1, operator, arg2):
     if arg2 is NO_ARGUMENT:
         msg = 'expected an argument for this operator but none was given'
         raise OperatorCreationError(msg)
+    if opfunc in (in_, not_in):
+        return opfunc(arg1, arg2, in_list_threshold)
     return opfunc(arg1, arg2)
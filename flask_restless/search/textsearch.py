@@ -0,0 +1,196 @@
+# textsearch.py - full-text search of the fields of a model
+#
+# Copyright 2011 Lincoln de Sousa <lincoln@comum.org>.
+# Copyright 2012, 2013, 2014, 2015, 2016 Jeffrey Finkelstein
+#           <jeffrey.finkelstein@gmail.com> and contributors.
+#
+# This file is part of Flask-Restless.
+#
+# Flask-Restless is distributed under both the GNU Affero General Public
+# License version 3 and under the 3-clause BSD license. For more
+# information, see LICENSE.AGPL and LICENSE.BSD.
+"""Declaration of the fields of a model that clients may search with
+the ``match`` operator.
+
+A :class:`TextSearch` object names the fields of a model that clients
+may search and whether search results are ordered by relevance. The
+:func:`create_text_search_index` function creates the database objects
+that make the search fast: a GIN index on PostgreSQL and an FTS5
+virtual table on SQLite.
+
+"""
+from sqlalchemy.sql import visitors
+
+from ..helpers import model_metadata
+from .filters import FilterCreationError
+from .operators import TEXT_SEARCH_CONFIG
+from .operators import TextMatch
+from .operators import TextRank
+
+
+class TextSearch(object):
+    """The fields of a model that clients may search with the ``match``
+    operator.
+
+    `fields` is an iterable of names of columns of the model.
+
+    If `order_by_relevance` is ``True``, the results of a search are
+    ordered by their relevance to the search terms, unless the client
+    specifies a sort order.
+
+    """
+
+    def __init__(self, fields, order_by_relevance=False):
+        self.fields = frozenset(fields)
+        self.order_by_relevance = order_by_relevance
+
+    def create_index(self, bind, model):
+        """Creates the database objects needed to search the fields of
+        `model` in the database to which `bind`, a SQLAlchemy engine or
+        connection, is connected.
+
+        For more information, see :func:`create_text_search_index`.
+
+        """
+        create_text_search_index(bind, model, self.fields)
+
+
+def create_text_search(text_search=None):
+    """Returns an instance of :class:`TextSearch`, or ``None`` if clients
+    may not search any field.
+
+    If `text_search` is ``None``, this returns ``None``. If it is a
+    dictionary, this returns a :class:`TextSearch` object created with
+    the items of the dictionary as keyword arguments. If it is already
+    an instance of :class:`TextSearch`, it is returned unchanged.
+    Otherwise, it must be an iterable of field names, and this returns a
+    :class:`TextSearch` object for those fields.
+
+    """
+    if text_search is None or isinstance(text_search, TextSearch):
+        return text_search
+    if isinstance(text_search, dict):
+        return TextSearch(**text_search)
+    return TextSearch(text_search)
+
+
+def text_matches(expressions):
+    """Returns the list of :class:`~.operators.TextMatch` expressions in
+    the SQLAlchemy expressions `expressions`.
+
+    """
+    return [element for expression in expressions
+            for element in visitors.iterate(expression, {})
+            if isinstance(element, TextMatch)]
+
+
+def check_text_search(model, matches, text_search):
+    """Raises :exc:`~.filters.FilterCreationError` unless each of the
+    :class:`~.operators.TextMatch` expressions `matches` searches a
+    field of `model` allowed by the :class:`TextSearch` object
+    `text_search`.
+
+    `text_search` may be ``None``, in which case no field may be
+    searched.
+
+    """
+    mapper = model_metadata(model).mapper
+    for match in matches:
+        column = match.column
+        # A column of an aliased related model has the alias as its
+        # table, so it is not a column of the table of `model`.
+        fieldname = mapper.get_property_by_column(column).key \
+            if column.table in mapper.tables else None
+        if text_search is None or fieldname not in text_search.fields:
+            message = 'full-text search of field "{0}" is not allowed'
+            raise FilterCreationError(message.format(column.name))
+
+
+def relevance(matches):
+    """Returns the list of SQLAlchemy expressions that order rows by their
+    relevance to each of the :class:`~.operators.TextMatch` expressions
+    `matches`, most relevant first.
+
+    """
+    return [TextRank(match).desc() for match in matches]
+
+
+def create_text_search_index(bind, model, fields):
+    """Creates the database objects needed to search the fields named by
+    `fields` of `model` with the ``match`` operator, in the database to
+    which `bind`, a SQLAlchemy engine or connection, is connected.
+
+    On PostgreSQL, this creates a GIN index on the ``to_tsvector()`` of
+    each column, with the text search configuration
+    :data:`~.operators.TEXT_SEARCH_CONFIG`.
+
+    On SQLite, this creates an external content FTS5 virtual table named
+    ``<table>_fts`` for each table of the columns, with triggers that
+    keep it up to date with the table, and fills it with the existing
+    rows. The table must have a single integer primary key, which is
+    used as the row ID of the virtual table.
+
+    On other databases, this function does nothing, since the ``match``
+    operator does not use an index.
+
+    Existing indices, virtual tables, and triggers are left unchanged.
+
+    """
+    mapper = model_metadata(model).mapper
+    # Group the columns by table, since the columns of a model in a
+    # joined table inheritance hierarchy may be in different tables.
+    columns_by_table = {}
+    for fieldname in sorted(fields):
+        column = mapper.columns[fieldname]
+        columns_by_table.setdefault(column.table, []).append(column)
+    dialect = bind.dialect.name
+    for table, columns in columns_by_table.items():
+        if dialect == 'postgresql':
+            statements = _postgresql_indices(table, columns)
+        elif dialect == 'sqlite':
+            statements = _sqlite_virtual_table(table, columns)
+        else:
+            statements = []
+        for statement in statements:
+            bind.execute(statement)
+
+
+def _postgresql_indices(table, columns):
+    """Returns the list of statements that create a GIN index for the
+    text search of each of `columns` of `table`.
+
+    """
+    config = TEXT_SEARCH_CONFIG.replace("'", "''")
+    statement = ('CREATE INDEX IF NOT EXISTS "ix_{0}_{1}_fts" ON "{0}"'
+                 ' USING gin (to_tsvector(\'{2}\'::regconfig, "{1}"))')
+    return [statement.format(table.name, column.name, config)
+            for column in columns]
+
+
+def _sqlite_virtual_table(table, columns):
+    """Returns the list of statements that create an FTS5 virtual table
+    for the text search of `columns` of `table`, along with the
+    triggers that keep it up to date.
+
+    """
+    fts = '{0}_fts'.format(table.name)
+    rowid = list(table.primary_key)[0].name
+    names = ', '.join('"{0}"'.format(column.name) for column in columns)
+    new = ', '.join('new."{0}"'.format(column.name) for column in columns)
+    old = ', '.join('old."{0}"'.format(column.name) for column in columns)
+    insert = ('INSERT INTO "{0}" (rowid, {1}) VALUES (new."{2}", {3});'
+              .format(fts, names, rowid, new))
+    delete = ('INSERT INTO "{0}" ("{0}", rowid, {1})'
+              ' VALUES (\'delete\', old."{2}", {3});'
+              .format(fts, names, rowid, old))
+    trigger = ('CREATE TRIGGER IF NOT EXISTS "{0}_{1}" AFTER {2} ON "{3}"'
+               ' BEGIN {4} END')
+    return [
+        ('CREATE VIRTUAL TABLE IF NOT EXISTS "{0}" USING fts5({1},'
+         ' content=\'{2}\', content_rowid=\'{3}\')'
+         .format(fts, names, table.name, rowid)),
+        trigger.format(fts, 'ai', 'INSERT', table.name, insert),
+        trigger.format(fts, 'ad', 'DELETE', table.name, delete),
+        trigger.format(fts, 'au', 'UPDATE', table.name, delete + insert),
+        'INSERT INTO "{0}" ("{0}") VALUES (\'rebuild\')'.format(fts),
+    ]
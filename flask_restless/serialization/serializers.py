@@ -20,6 +20,7 @@ The implementations here are closely coupled to the rest of the
 Flask-Restless code.
 
 """
+from collections import namedtuple
 from datetime import date
 from datetime import datetime
 from datetime import time
@@ -45,9 +46,13 @@ from ..helpers import get_related_model
 from ..helpers import get_relations
 from ..helpers import is_like_list
 from ..helpers import is_mapped_class
+from ..helpers import load_relationship
+from ..helpers import LRUCache
+from ..helpers import model_metadata
 from ..helpers import primary_key_for
 from ..helpers import primary_key_value
 from ..helpers import serializer_for
+from ..helpers import to_one_foreign_key
 from ..helpers import url_for
 
 #: Names of columns which should definitely not be considered user columns to
@@ -58,6 +63,26 @@ COLUMN_BLACKLIST = ('_sa_polymorphic_on', )
 #: Flask-Restless.
 JSONAPI_VERSION = '1.0'
 
+#: The maximum number of serialization plans cached by each instance of
+#: :class:`DefaultSerializer`.
+#:
+#: Each distinct combination of model and sparse fieldset requested by a
+#: client requires its own plan, so this bounds the memory used by a
+#: serializer that receives many different sparse fieldset requests.
+PLAN_CACHE_SIZE = 256
+
+#: The precomputed information needed to serialize instances of a model.
+#:
+#: `type` is the collection name of the model, `columns` is the list of
+#: names of attributes to serialize, `primary_key` is the name of the
+#: primary key attribute, `self_link` is a Boolean indicating whether
+#: to provide a self link, and `relations` is the list of names of
+#: relationships to serialize.
+SerializationPlan = namedtuple('SerializationPlan', ['type', 'columns',
+                                                     'primary_key',
+                                                     'self_link',
+                                                     'relations'])
+
 
 # TODO In Python 2.7 or later, we can just use `timedelta.total_seconds()`.
 if hasattr(timedelta, 'total_seconds'):
@@ -110,6 +135,33 @@ def create_relationship(model, instance, relation):
         pass
     else:
         result['links']['related'] = related_link
+    # If this is a many-to-one relationship and the related instance has
+    # not been loaded yet, the primary key of the related instance is
+    # already stored in a foreign key column of `instance`, so we can
+    # create the resource identifier object without loading the related
+    # instance from the database.
+    foreign_key = to_one_foreign_key(model, relation)
+    if foreign_key is not None and relation in inspect(instance).unloaded:
+        local_attr, remote_attr = foreign_key
+        related_model = get_related_model(model, relation)
+        # If no API has been created for the related model, fall back
+        # to loading the related instance below.
+        try:
+            related_pk = primary_key_for(related_model)
+            type_ = collection_name(related_model)
+        except ValueError:
+            related_pk = None
+        if remote_attr == related_pk:
+            related_id = getattr(instance, local_attr)
+            if related_id is None:
+                result['data'] = None
+                return result
+            try:
+                related_id = str(related_id)
+            except UnicodeEncodeError:
+                related_id = url_quote_plus(related_id.encode('utf-8'))
+            result['data'] = {'id': related_id, 'type': type_}
+            return result
     # Get the related value so we can see if it is a to-many
     # relationship or a to-one relationship.
     related_value = getattr(instance, relation)
@@ -258,19 +310,34 @@ class DefaultSerializer(Serializer):
         self.default_fields = only
         self.exclude = exclude
         self.additional_attributes = additional_attributes
+        #: Cache of :class:`SerializationPlan` objects keyed by model metadata
+        #: and sparse fieldset, as computed by :meth:`._compile`.
+        self._plans = LRUCache(maxsize=PLAN_CACHE_SIZE)
 
-    def _dump(self, instance, only=None):
-        # Always include at least the type and ID, regardless of what
-        # the user requested.
-        if only is not None:
-            # TODO In Python 2.7 or later, this should be a set literal.
-            only = set(only) | set(['type', 'id'])
-        model = type(instance)
-        try:
-            inspected_instance = inspect(model)
-        except NoInspectionAvailable:
-            message = 'failed to get columns for model {0}'.format(model)
-            raise SerializationException(instance, message=message)
+    def _compile(self, model, only=None):
+        """Returns the :class:`SerializationPlan` for instances of
+        `model` restricted to the fields named in `only`.
+
+        The plan is computed from the SQLAlchemy mapper of `model` and
+        from the settings of this serializer, so it only needs to be
+        computed once for each distinct pair of `model` and `only`, at
+        least until SQLAlchemy configures new mappers; see
+        :func:`~flask_restless.helpers.model_metadata`.
+
+        This method raises
+        :exc:`~sqlalchemy.exc.NoInspectionAvailable` if `model` is not
+        a SQLAlchemy model.
+
+        """
+        # This may raise NoInspectionAvailable.
+        metadata = model_metadata(model)
+        # The metadata object is replaced whenever the mappers change,
+        # so plans computed before then are no longer found.
+        key = (metadata, only)
+        plan = self._plans.get(key)
+        if plan is not None:
+            return plan
+        inspected_instance = metadata.mapper
         column_attrs = inspected_instance.column_attrs.keys()
         descriptors = inspected_instance.all_orm_descriptors.items()
         # hybrid_columns = [k for k, d in descriptors
@@ -301,9 +368,49 @@ class DefaultSerializer(Serializer):
         # Exclude column names that are foreign keys (unless the foreign
         # key is the primary key for the model; this can happen in the
         # joined table inheritance database configuration).
+        pk_name = primary_key_for(model)
         foreign_key_columns = foreign_keys(model)
-        columns = (c for c in columns if c not in foreign_key_columns or
-                   c == primary_key_for(model))
+        columns = [c for c in columns if c not in foreign_key_columns or
+                   c == pk_name]
+        # Decide whether to add the self link, unless it has been
+        # explicitly excluded.
+        is_self_in_default = (self.default_fields is None or
+                              'self' in self.default_fields)
+        is_self_in_only = only is None or 'self' in only
+        # If there are relations to convert to dictionary form, they
+        # will be put into a special `links` key as required by JSON
+        # API.
+        relations = get_relations(model)
+        if self.default_fields is not None:
+            relations = [r for r in relations if r in self.default_fields]
+        # Only consider those relations listed in `only`.
+        if only is not None:
+            relations = [r for r in relations if r in only]
+        # Exclude relations specified by the user during the instantiation of
+        # this object.
+        if self.exclude is not None:
+            relations = [r for r in relations if r not in self.exclude]
+        plan = SerializationPlan(type=collection_name(model),
+                                 columns=columns, primary_key=pk_name,
+                                 self_link=is_self_in_default and
+                                 is_self_in_only,
+                                 relations=relations)
+        self._plans[key] = plan
+        return plan
+
+    def _dump(self, instance, only=None):
+        # Always include at least the type and ID, regardless of what
+        # the user requested.
+        if only is not None:
+            # TODO In Python 2.7 or later, this should be a set literal.
+            only = frozenset(only) | frozenset(['type', 'id'])
+        model = type(instance)
+        try:
+            plan = self._compile(model, only=only)
+        except NoInspectionAvailable:
+            message = 'failed to get columns for model {0}'.format(model)
+            raise SerializationException(instance, message=message)
+        columns = plan.columns
 
         # Create a dictionary mapping attribute name to attribute value for
         # this particular instance.
@@ -356,16 +463,12 @@ class DefaultSerializer(Serializer):
                 attributes[key] = serialized_val['data']
         # Get the ID and type of the resource.
         id_ = attributes.pop('id', None)
-        type_ = collection_name(model)
         # Create the result dictionary and add the attributes.
-        result = dict(id=id_, type=type_)
+        result = dict(id=id_, type=plan.type)
         if attributes:
             result['attributes'] = attributes
         # Add the self link unless it has been explicitly excluded.
-        is_self_in_default = (self.default_fields is None or
-                              'self' in self.default_fields)
-        is_self_in_only = only is None or 'self' in only
-        if is_self_in_default and is_self_in_only:
+        if plan.self_link:
             instance_id = primary_key_value(instance)
             # `url_for` may raise a `BuildError` if the user has not created a
             # GET API endpoint for this model. In this case, we simply don't
@@ -379,7 +482,12 @@ class DefaultSerializer(Serializer):
             except BuildError:
                 pass
             else:
-                url = urljoin(request.url_root, path)
+                # This is equivalent to `urljoin(request.url_root, path)`
+                # for the absolute paths built by `url_for`, but cheaper.
+                if path.startswith('/'):
+                    url = request.host_url + path[1:]
+                else:
+                    url = urljoin(request.url_root, path)
                 result['links'] = dict(self=url)
         # # add any included methods
         # if include_methods is not None:
@@ -394,7 +502,7 @@ class DefaultSerializer(Serializer):
 
         # If the primary key is not named "id", we'll duplicate the
         # primary key under the "id" key.
-        pk_name = primary_key_for(model)
+        pk_name = plan.primary_key
         if pk_name != 'id':
             result['id'] = result['attributes'][pk_name]
         # TODO Same problem as above.
@@ -406,18 +514,7 @@ class DefaultSerializer(Serializer):
                 result['id'] = str(result['id'])
             except UnicodeEncodeError:
                 result['id'] = url_quote_plus(result['id'].encode('utf-8'))
-        # If there are relations to convert to dictionary form, put them into a
-        # special `links` key as required by JSON API.
-        relations = get_relations(model)
-        if self.default_fields is not None:
-            relations = [r for r in relations if r in self.default_fields]
-        # Only consider those relations listed in `only`.
-        if only is not None:
-            relations = [r for r in relations if r in only]
-        # Exclude relations specified by the user during the instantiation of
-        # this object.
-        if self.exclude is not None:
-            relations = [r for r in relations if r not in self.exclude]
+        relations = plan.relations
         if not relations:
             return result
         # For the sake of brevity, rename this function.
@@ -461,6 +558,43 @@ class DefaultSerializer(Serializer):
         result['data'] = resource
         return result
 
+    def _load_relationships(self, instances, only):
+        """Loads the to-many relationships that will be serialized for
+        each of the given instances, using one query per relationship
+        instead of one query per relationship per instance.
+
+        `instances` and `only` are as in :meth:`serialize_many`.
+
+        Errors are ignored here; they are reported when the instances
+        are actually serialized.
+
+        """
+        # TODO In Python 2.7+, this should be a `defaultdict(list)`.
+        instances_by_model = {}
+        for instance in instances:
+            model = get_model(instance)
+            instances_by_model.setdefault(model, []).append(instance)
+        for model, group in instances_by_model.items():
+            # Relationships are only known for the default serializer;
+            # a custom serializer may not serialize them at all.
+            try:
+                serializer = serializer_for(model)
+                _type = collection_name(model)
+            except ValueError:
+                continue
+            if not isinstance(serializer, DefaultSerializer):
+                continue
+            _only = only.get(_type)
+            if _only is not None:
+                _only = frozenset(_only) | frozenset(['type', 'id'])
+            try:
+                plan = serializer._compile(model, only=_only)
+            except (NoInspectionAvailable, ValueError):
+                continue
+            for relation in plan.relations:
+                if is_like_list(model, relation):
+                    load_relationship(group, relation)
+
     def serialize_many(self, instances, only=None):
         """Serializes each instance using its model-specific serializer.
 
@@ -475,6 +609,10 @@ class DefaultSerializer(Serializer):
         :meth:`DefaultSerializer.serialize` method.
 
         """
+        # Materialize the instances so that we can iterate over them
+        # twice, once for loading relationships and once for serializing.
+        instances = list(instances)
+        self._load_relationships(instances, only)
         resources = []
         failed = []
         for instance in instances:
@@ -19,14 +19,24 @@ that do most of the work.
 """
 from .base import CONTENT_TYPE
 from .base import ProcessingException
+from .caching import QueryCache
+from .caching import ResponseCache
+from .conditional import Validator
+from .counting import CountStrategy
 from .resources import API
 from .relationships import RelationshipAPI
 from .function import FunctionAPI
+from .timing import Timing
 
 __all__ = [
     'API',
     'CONTENT_TYPE',
+    'CountStrategy',
     'FunctionAPI',
     'ProcessingException',
+    'QueryCache',
     'RelationshipAPI',
+    'ResponseCache',
+    'Timing',
+    'Validator',
 ]
@@ -20,11 +20,15 @@ for JSON API requests on a SQLAlchemy backend.
 from __future__ import division
 
 from collections import defaultdict
+from decimal import Decimal
 from functools import partial
 from functools import wraps
 from itertools import chain
+from itertools import islice
 import math
 import re
+from types import GeneratorType
+from uuid import UUID
 # In Python 3...
 try:
     from urllib.parse import urlparse
@@ -38,10 +42,12 @@ from flask import current_app
 from flask import json
 from flask import jsonify
 from flask import request
+from flask import stream_with_context
 from flask.views import MethodView
 from mimerender import FlaskMimeRender
 from mimerender import register_mime
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.inspection import inspect as sqlalchemy_inspect
 from sqlalchemy.orm.exc import MultipleResultsFound
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm.query import Query
@@ -53,14 +59,23 @@ from ..helpers import get_model
 from ..helpers import get_related_model
 from ..helpers import is_like_list
 from ..helpers import is_relationship
+from ..helpers import load_relationship
 from ..helpers import primary_key_for
+from ..helpers import primary_key_names
 from ..helpers import primary_key_value
 from ..helpers import serializer_for
+from ..helpers import string_to_datetime
 from ..helpers import url_for
+from ..jsoncodecs import create_codec
+from ..jsoncodecs import FlaskJSONCodec
+from ..search import create_filter_limits
+from ..search import create_text_search
 from ..search import FilterCreationError
+from ..search import FilterLimitError
 from ..search import FilterParsingError
 from ..search import search
 from ..search import search_relationship
+from ..search.operators import IN_LIST_THRESHOLD
 from ..serialization import DeserializationException
 from ..serialization import JsonApiDocument
 from ..serialization import MultipleExceptions
@@ -68,8 +83,27 @@ from ..serialization import simple_serialize_many
 from ..serialization import simple_relationship_serialize
 from ..serialization import simple_relationship_serialize_many
 from ..serialization import SerializationException
-from .helpers import count
+from .caching import _DOCUMENT
+from .caching import create_query_cache
+from .conditional import _VALIDATOR
+from .conditional import create_validator
+from .conditional import evaluate_conditional_request
+from .conditional import not_modified
+from .counting import create_count_strategy
+from .counting import ExactCount
+from .counting import WindowCount
+from .helpers import decode_cursor
+from .helpers import encode_cursor
+from .helpers import keyset_order
+from .helpers import MissingSecretKey
+from .helpers import seek_predicate
 from .helpers import upper_keys as upper
+from .timing import _TIMER
+from .timing import create_timing
+from .timing import NULL_TIMER
+from .timing import record_timing
+from .timing import timed
+from .timing import timed_processors
 
 #: String used internally as a dictionary key for passing header information
 #: from view functions to the :func:`jsonpify` function.
@@ -79,6 +113,11 @@ _HEADERS = '__restless_headers'
 #: information from view functions to the :func:`jsonpify` function.
 _STATUS = '__restless_status_code'
 
+#: Key in the WSGI environment of a request used internally for passing
+#: the :class:`~flask_restless.jsoncodecs.JSONCodec` of an API to the
+#: :func:`jsonpify` function.
+_JSON_CODEC = 'flask_restless.json_codec'
+
 #: The Content-Type we expect for most requests to APIs.
 #:
 #: The JSON API specification requires the content type to be
@@ -125,6 +164,31 @@ PAGE_NUMBER_PARAM = 'page[number]'
 #: :http:method:`get` request.
 PAGE_SIZE_PARAM = 'page[size]'
 
+#: The query parameter key that identifies the cursor after which the
+#: requested page begins, when using cursor pagination.
+PAGE_AFTER_PARAM = 'page[after]'
+
+#: The query parameter key that identifies the cursor before which the
+#: requested page ends, when using cursor pagination.
+PAGE_BEFORE_PARAM = 'page[before]'
+
+#: The query parameter key that is a synonym for :data:`PAGE_AFTER_PARAM`.
+PAGE_CURSOR_PARAM = 'page[cursor]'
+
+#: The query parameter key with which a client can request that the total
+#: number of resources in a collection not be counted, by specifying the
+#: value ``0`` or ``false``.
+COUNT_PARAM = 'page[count]'
+
+#: The query parameter keys that determine which page of a collection is
+#: returned in a response.
+PAGINATION_PARAMS = (PAGE_NUMBER_PARAM, PAGE_SIZE_PARAM, PAGE_AFTER_PARAM,
+                     PAGE_BEFORE_PARAM, PAGE_CURSOR_PARAM)
+
+#: The number of resources loaded from the database and serialized at a
+#: time when streaming a response; see :meth:`APIBase._stream_collection`.
+STREAM_BATCH_SIZE = 100
+
 #: A regular expression for Accept headers.
 #:
 #: For an explanation of "media-range", etc., see Sections 5.3.{1,2} of
@@ -173,6 +237,24 @@ class PaginationError(Exception):
     pass
 
 
+def _cursor_value(value):
+    """Returns a representation of `value`, the value of a sort key of
+    a resource, that can be encoded in a pagination cursor.
+
+    Dates and times are represented as ISO 8601 strings, which
+    :func:`~flask_restless.helpers.string_to_datetime` converts back to
+    the original value. Other values that cannot be serialized as JSON,
+    like :class:`decimal.Decimal` and :class:`uuid.UUID` objects, are
+    represented as strings.
+
+    """
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
 class ProcessingException(HTTPException):
     """Raised when a preprocessor or postprocessor encounters a problem.
 
@@ -477,6 +559,7 @@ def is_conflict(exception):
     return any(s in exception_string for s in CONFLICT_INDICATORS)
 
 
+@timed('jsonpify')
 def jsonpify(*args, **kw):
     """Returns a JSONP response, with the specified arguments passed directly
     to :func:`flask.json.jsonify`.
@@ -498,6 +581,10 @@ def jsonpify(*args, **kw):
     its value must be an integer representing the status code of the response.
     Otherwise, the status code of the response will be :http:status:`200`.
 
+    If the view that handled the request was configured with a JSON codec
+    other than the default one, the response is encoded using that codec
+    instead of :func:`flask.json.jsonify`; see :ref:`jsoncodecs`.
+
     """
     # HACK In order to make the headers and status code available in the
     # content of the response, we need to send it from the view function to
@@ -506,7 +593,26 @@ def jsonpify(*args, **kw):
     # code known to the rendering functions.
     headers = kw['meta'].pop(_HEADERS, {}) if 'meta' in kw else {}
     status_code = kw['meta'].pop(_STATUS, 200) if 'meta' in kw else 200
-    response = jsonify(*args, **kw)
+    codec = request.environ.get(_JSON_CODEC)
+    # Make the document available to the response cache, if any, which
+    # determines the tables it was read from by the types of its
+    # resources; see `ResponseCache.cached()`.
+    if _DOCUMENT in request.environ:
+        request.environ[_DOCUMENT] = kw
+    # A response with status code 304 has no body; see
+    # `not_modified_response()`.
+    if status_code == 304:
+        response = current_app.response_class()
+    # If the primary data is a generator, the view has requested a
+    # streaming response; see `APIBase._stream_collection()`.
+    elif isinstance(kw.get('data'), GeneratorType):
+        chunks = stream_with_context(_stream_document(kw, codec))
+        response = current_app.response_class(chunks)
+    elif codec is None or type(codec) is FlaskJSONCodec:
+        response = jsonify(*args, **kw)
+    else:
+        content = codec.dumps(dict(*args, **kw))
+        response = current_app.response_class(content)
     callback = request.args.get('callback', False)
     if callback:
         # Reload the data from the constructed JSON string so we can wrap it in
@@ -544,6 +650,90 @@ def jsonpify(*args, **kw):
     return response
 
 
+def _stream_document(document, codec=None):
+    """Generates the JSON encoding of the given JSON API document in
+    chunks.
+
+    `document` is a dictionary representing a JSON API document, except
+    that the value of its ``'data'`` element must be an iterator over
+    lists of resource objects. Each list is encoded and yielded
+    separately, so only one of these lists needs to be in memory at a
+    time. The ``total`` element of the ``'meta'`` object is set to the
+    number of resource objects once they have all been generated.
+
+    `codec` is the :class:`~flask_restless.jsoncodecs.JSONCodec` used to
+    encode each chunk. If it is ``None``, :func:`flask.json.dumps` is
+    used.
+
+    """
+    dumps = json.dumps if codec is None else codec.dumps
+    batches = document.pop('data')
+    yield '{"data": ['
+    num_results = 0
+    for batch in batches:
+        if not batch:
+            continue
+        chunk = ', '.join(map(dumps, batch))
+        if num_results > 0:
+            chunk = ', ' + chunk
+        num_results += len(batch)
+        yield chunk
+    document.setdefault('meta', {})['total'] = num_results
+    # The remainder of the document is an encoded JSON object, whose
+    # opening brace we replace with the end of the primary data.
+    yield '], ' + dumps(document)[1:]
+
+
+def _eager_loads_collections(query):
+    """Returns ``True`` if and only if `query` may eagerly load a to-many
+    relationship with a join or a subquery, which SQLAlchemy does not
+    allow with :meth:`~sqlalchemy.orm.query.Query.yield_per`.
+
+    Loader options set on the query itself are not inspected, so any
+    query with options is assumed to load such a relationship.
+
+    """
+    if query._with_options:
+        return True
+    for description in query.column_descriptions:
+        entity = description['entity']
+        if entity is None:
+            continue
+        for mapper in sqlalchemy_inspect(entity).mapper.self_and_descendants:
+            for prop in mapper.relationships:
+                if prop.uselist and prop.lazy in ('joined', 'subquery', False):
+                    return True
+    return False
+
+
+def _batched_query(query, size):
+    """Generates the results of `query` by loading `size` of them at a
+    time from the database.
+
+    If the query eagerly loads a to-many relationship, each batch is
+    loaded by a separate query with a ``LIMIT`` and an ``OFFSET``,
+    ordered additionally by the primary key of the queried model so that
+    the batches are disjoint. Otherwise, the results are loaded by a
+    single query with :meth:`~sqlalchemy.orm.query.Query.yield_per`.
+
+    """
+    if not _eager_loads_collections(query):
+        for item in query.yield_per(size):
+            yield item
+        return
+    entity = query.column_descriptions[0]['entity']
+    query = query.order_by(*(getattr(entity, name)
+                             for name in primary_key_names(entity)))
+    offset = 0
+    while True:
+        batch = query.limit(size).offset(offset).all()
+        for item in batch:
+            yield item
+        if len(batch) < size:
+            return
+        offset += size
+
+
 def parse_sparse_fields(type_=None):
     """Get the sparse fields as requested by the client.
 
@@ -575,9 +765,24 @@ def parse_sparse_fields(type_=None):
     return fields.get(type_) if type_ is not None else fields
 
 
-def resources_from_path(instance, path):
-    """Returns an iterable of all resources along the given relationship
-    path for the specified instance of the model.
+def resources_from_paths(instances, paths):
+    """Returns the set of all resources along any of the given
+    relationship paths for any of the specified instances.
+
+    `instances` is a list of instances of SQLAlchemy models and `paths`
+    is an iterable of dot-separated relationship paths, as in the
+    ``include`` query parameter (for example, ``'comments.author'``).
+
+    The relationships are followed one level at a time for all the
+    instances at that level, so that each relationship is loaded with a
+    single query for all of them (see
+    :func:`~flask_restless.helpers.load_relationship`) instead of with
+    one query for each instance. Paths with a common prefix, like
+    ``'comments'`` and ``'comments.author'``, share the resources loaded
+    for that prefix.
+
+    The instances themselves are never included in the returned set,
+    even if they are reached along one of the paths.
 
     For example, if our model includes three classes, ``Article``,
     ``Person``, and ``Comment``::
@@ -593,58 +798,68 @@ def resources_from_path(instance, path):
         >>> instances = [article, comment1, comment2, person1, person2]
         >>> session.add_all(instances)
         >>>
-        >>> l = list(api.resources_from_path(article, 'comments.author'))
+        >>> l = resources_from_paths([article], ['comments.author'])
         >>> len(l)
         4
-        >>> [r.id for r in l if isinstance(r, Person)]
+        >>> sorted(r.id for r in l if isinstance(r, Person))
         [1, 2]
-        >>> [r.id for r in l if isinstance(r, Comment)]
+        >>> sorted(r.id for r in l if isinstance(r, Comment))
         [1, 2]
 
     """
-    # First, split the path to determine the sequence of relationships
-    # to follow.
-    if '.' in path:
-        path = path.split('.')
-    else:
-        path = [path]
-    # Next, do a breadth-first traversal of the resources related to
-    # `instance` via the given path.
-    seen = set()
-    # TODO In Pyhon 2.7 and later, this should be a set literal.
-    nextlevel = set([instance])
-    first_time = True
-    while nextlevel:
+    # Merge the paths into a tree of relationship names, so that the
+    # relationships in a common prefix are followed only once.
+    tree = {}
+    for path in paths:
+        node = tree
+        for relation in path.split('.'):
+            node = node.setdefault(relation, {})
+    instances = list(instances)
+    result = set()
+    # Do a breadth-first traversal of the tree, following each
+    # relationship from all the resources at the current level at once.
+    thislevel = [(instances, tree)]
+    while thislevel:
+        nextlevel = []
+        for resources, subtree in thislevel:
+            for relation, children in subtree.items():
+                related = related_resources(resources, relation)
+                result.update(related)
+                if children and related:
+                    nextlevel.append((related, children))
         thislevel = nextlevel
-        nextlevel = set()
-        # Follow the relation given in the path to get the "neighbor"
-        # resources of any resource in the curret level of the
-        # breadth-first traversal.
-        if path:
-            relation = path.pop(0)
-        else:
-            relation = None
-        for resource in thislevel:
-            if resource in seen:
-                continue
-            # Since this method is going to be used to populate the
-            # `included` section of a compound document, we don't want
-            # to yield the instance from which related resources are
-            # being included.
-            if first_time:
-                first_time = False
-            else:
-                yield resource
-            seen.add(resource)
-            # If there are still parts of the relationship path to
-            # traverse, queue up the related resources at the next
-            # level.
-            if relation is not None:
-                if is_like_list(resource, relation):
-                    update = nextlevel.update
-                else:
-                    update = nextlevel.add
-                update(getattr(resource, relation))
+    # Since this function is used to populate the `included` section of
+    # a compound document, don't include the instances from which the
+    # related resources are being included.
+    return result.difference(instances)
+
+
+def related_resources(instances, relation):
+    """Returns a list of the distinct resources related to any of the
+    given instances via the relationship named `relation`.
+
+    `instances` may contain instances of different models; the
+    relationship is loaded for the instances of each model with a
+    single query.
+
+    """
+    by_model = defaultdict(list)
+    for instance in instances:
+        by_model[get_model(instance)].append(instance)
+    result = []
+    seen = set()
+    for model, group in by_model.items():
+        load_relationship(group, relation)
+        like_list = is_like_list(model, relation)
+        for instance in group:
+            value = getattr(instance, relation)
+            if not like_list:
+                value = [] if value is None else [value]
+            for resource in value:
+                if resource not in seen:
+                    seen.add(resource)
+                    result.append(resource)
+    return result
 
 
 # TODO these need to become JSON Pointers
@@ -695,6 +910,15 @@ def error(id_=None, links=None, status=None, code=None, title=None,
             'title': title, 'detail': detail, 'source': source, 'meta': meta}
 
 
+def not_modified_response(headers):
+    """Returns a :http:status:`304` response with the validator headers
+    `headers`, as returned by the methods of
+    :class:`~flask_restless.views.conditional.Validator`.
+
+    """
+    return {'meta': {_HEADERS: headers, _STATUS: 304}}, 304, headers
+
+
 def error_response(status=400, cause=None, **kw):
     """Returns a correctly formatted error response with the specified
     parameters.
@@ -891,13 +1115,22 @@ class Paginated(object):
     large as the length of `items`.
 
     `num_results` is the total number of resources or link objects on
-    all pages, not just the page represented by `items`.
+    all pages, not just the page represented by `items`, or ``None`` if
+    that number is unknown.
 
     `first`, `last`, `prev`, and `next_` are integers representing the
     number of the first, last, previous, and next pages,
     respectively. These can also be ``None``, in the case that there is
     no such page.
 
+    If `cursors` is ``True``, the page was determined by cursor
+    pagination instead of by page number. In this case, `prev` and
+    `next_` are the cursors identifying the first and last items in
+    `items`, and the previous and next links request the page before
+    and after those cursors, respectively. `first` and `last` must be
+    the empty string, since the first and last pages can be requested
+    without a cursor.
+
     `filters`, `sort`, and `group_by` are the filtering, sorting, and
     grouping query parameters from the request that yielded the given
     items.
@@ -969,7 +1202,8 @@ class Paginated(object):
     @staticmethod
     def _url_without_pagination_params():
         """Returns the request URL including all query parameters except
-        the page size and page number query parameters.
+        the pagination query parameters listed in
+        :data:`PAGINATION_PARAMS`.
 
         The URL is returned as a string.
 
@@ -982,7 +1216,7 @@ class Paginated(object):
         #
         # TODO In Python 3, this should be a dict comprehension.
         new_query = dict((k, v) for k, v in query_params.items()
-                         if k not in (PAGE_NUMBER_PARAM, PAGE_SIZE_PARAM))
+                         if k not in PAGINATION_PARAMS)
         new_query_string = '&'.join(map('='.join, new_query.items()))
         # Join the base URL with the query parameter string.
         return '{0}?{1}'.format(base_url, new_query_string)
@@ -1010,7 +1244,7 @@ class Paginated(object):
 
     def __init__(self, items, first=None, last=None, prev=None, next_=None,
                  page_size=None, num_results=None, filters=None, sort=None,
-                 group_by=None):
+                 group_by=None, cursors=False):
         self._items = items
         self._num_results = num_results
         # Pagination links and the link header are computed by the code below.
@@ -1040,6 +1274,13 @@ class Paginated(object):
         # previous page), then that link URL will not appear in this
         # list.
         link_numbers = [first, last, prev, next_]
+        # With cursor pagination, the first page is the one without a
+        # cursor, and the last page is the one before the empty cursor.
+        if cursors:
+            link_params = [None, PAGE_BEFORE_PARAM, PAGE_BEFORE_PARAM,
+                           PAGE_AFTER_PARAM]
+        else:
+            link_params = [PAGE_NUMBER_PARAM] * len(LINK_NAMES)
         # Determine the URL as it would appear without the
         # client-requested pagination query parameters.
         #
@@ -1047,19 +1288,21 @@ class Paginated(object):
         # `flask.Request.base_url` is the URL *without* the query
         # parameters.)
         base_url = Paginated._url_without_pagination_params()
-        for rel, num in zip(LINK_NAMES, link_numbers):
+        # The page number (or cursor) is the only query parameter that
+        # differs between links, so we build the rest of the URL only
+        # once and append the page number for each link.
+        base_url = Paginated._to_url(base_url, query_params)
+        for rel, param, num in zip(LINK_NAMES, link_params, link_numbers):
             # If the link doesn't exist (for example, if there is no
             # previous page), then add ``None`` to the pagination links
             # but don't add a link URL to the headers.
             if num is None:
                 self._pagination_links[rel] = None
             else:
-                # Each time through this `for` loop we update the page
-                # number in the `query_param` dictionary, so the the
-                # `_to_url` method will give us the correct URL for that
-                # page.
-                query_params[PAGE_NUMBER_PARAM] = str(num)
-                url = Paginated._to_url(base_url, query_params)
+                if param is None:
+                    url = base_url
+                else:
+                    url = '{0}&{1}={2}'.format(base_url, param, num)
                 link_string = '<{0}>; rel="{1}"'.format(url, rel)
                 self._header_links.append(link_string)
                 self._pagination_links[rel] = url
@@ -1146,6 +1389,7 @@ class ModelView(MethodView):
         self.session = session
         self.model = model
 
+    @timed('collection_parameters')
     def collection_parameters(self, resource_id=None, relation_name=None):
         """Gets filtering, sorting, grouping, and other settings from
         the request that affect the collection of resources in a
@@ -1287,16 +1531,45 @@ class APIBase(ModelView):
     `allow_to_many_replacement` is as described in
     :ref:`allowreplacement`.
 
+    `streaming` is as described in :ref:`streaming`.
+
+    `cursor_pagination` is as described in :ref:`cursorpagination`.
+
+    `count_strategy` is as described in :ref:`countstrategies`.
+
+    `filter_limits` is as described in :ref:`filterlimits`.
+
+    `text_search` is as described in :ref:`textsearch`.
+
+    `in_list_threshold` is as described in :ref:`inlists`.
+
+    `query_cache` is as described in :ref:`querycache`.
+
+    `validator` is as described in :ref:`conditional`.
+
+    `timing` is as described in :ref:`timing`.
+
+    `json_codec` is as described in :ref:`jsoncodecs`.
+
     """
 
     #: List of decorators applied to every method of this class.
-    decorators = [catch_processing_exceptions] + ModelView.decorators
+    #:
+    #: The :func:`~.conditional.evaluate_conditional_request` and
+    #: :func:`~.timing.record_timing` decorators appear after the
+    #: :data:`mimerender` function, since they operate on the rendered
+    #: response.
+    decorators = [catch_processing_exceptions] + ModelView.decorators + \
+        [evaluate_conditional_request, record_timing]
 
     def __init__(self, session, model, preprocessors=None, postprocessors=None,
                  primary_key=None, serializer=None, deserializer=None,
                  validation_exceptions=None, includes=None, page_size=10,
-                 max_page_size=100, allow_to_many_replacement=False, *args,
-                 **kw):
+                 max_page_size=100, allow_to_many_replacement=False,
+                 streaming=False, cursor_pagination=False,
+                 count_strategy=None, filter_limits=None, text_search=None,
+                 in_list_threshold=IN_LIST_THRESHOLD, query_cache=None,
+                 validator=None, timing=None, json_codec=None, *args, **kw):
         super(APIBase, self).__init__(session, model, *args, **kw)
 
         #: The name of the collection specified by the given model class
@@ -1327,6 +1600,71 @@ class APIBase(ModelView):
         #: returned.
         self.max_page_size = max_page_size
 
+        #: Whether to stream the response to a request for all resources
+        #: in a collection (that is, a request with page size zero)
+        #: instead of building the entire response in memory.
+        self.streaming = streaming
+
+        #: Whether to paginate collections by cursors that identify the
+        #: position of a resource in the collection instead of by page
+        #: number, unless the client requests a page number.
+        self.cursor_pagination = cursor_pagination
+
+        #: The :class:`~flask_restless.views.counting.CountStrategy`
+        #: used to determine the total number of resources in a
+        #: paginated collection.
+        self.count_strategy = create_count_strategy(count_strategy)
+
+        #: The :class:`~flask_restless.search.FilterLimits` that limit
+        #: the cost of the filters requested by clients, or ``None`` if
+        #: filters are not limited.
+        self.filter_limits = create_filter_limits(filter_limits)
+
+        #: The :class:`~flask_restless.search.TextSearch` that names the
+        #: fields clients may search with the ``match`` operator, or
+        #: ``None`` if no field may be searched.
+        self.text_search = create_text_search(text_search)
+
+        #: The number of values in the argument of an ``in`` or
+        #: ``not_in`` filter above which the values are sent to the
+        #: database as a single parameter, or ``None`` if each value is
+        #: always a separate parameter.
+        self.in_list_threshold = in_list_threshold
+
+        #: The :class:`~flask_restless.views.caching.QueryCache` that
+        #: remembers the resources on each page of a collection and the
+        #: total number of resources, or ``None`` if query results are
+        #: not cached.
+        self.query_cache = create_query_cache(query_cache)
+
+        #: The :class:`~flask_restless.views.conditional.Validator` that
+        #: computes the ``ETag`` and ``Last-Modified`` headers of
+        #: responses to :http:method:`get` requests, or ``None`` if
+        #: responses have no validators.
+        self.validator = create_validator(validator)
+        # The environment of the request is only written when a feature
+        # is enabled; its readers fall back to a default otherwise.
+        if self.validator is not None:
+            request.environ[_VALIDATOR] = self.validator
+
+        #: The :class:`~flask_restless.views.timing.Timing` that
+        #: configures the measurement of the phases of each request, or
+        #: ``None`` if requests are not timed.
+        self.timing = create_timing(timing)
+
+        #: The timer that measures the phases of the current request.
+        self.timer = NULL_TIMER
+        if self.timing is not None:
+            self.timer = self.timing.timer()
+            request.environ[_TIMER] = self.timer
+
+        #: The :class:`~flask_restless.jsoncodecs.JSONCodec` used to
+        #: decode the bodies of requests and encode the bodies of
+        #: responses.
+        self.json_codec = create_codec(json_codec)
+        if type(self.json_codec) is not FlaskJSONCodec:
+            request.environ[_JSON_CODEC] = self.json_codec
+
         #: A custom serialization function for primary resources; see
         #: :ref:`serialization` for more information.
         #:
@@ -1357,6 +1695,15 @@ class APIBase(ModelView):
         #: the main functionality of that method has been executed.
         self.preprocessors = defaultdict(list, upper(preprocessors or {}))
 
+        # Measure the time spent in processors only if timing is enabled,
+        # so that they are called directly otherwise.
+        if self.timing is not None:
+            self.preprocessors = timed_processors(self.preprocessors,
+                                                  'preprocessors', self.timer)
+            self.postprocessors = timed_processors(self.postprocessors,
+                                                   'postprocessors',
+                                                   self.timer)
+
         #: The mapping from resource type name to requested sparse
         #: fields for resources of that type.
         self.sparse_fields = parse_sparse_fields()
@@ -1425,18 +1772,19 @@ class APIBase(ModelView):
         current_app.logger.exception(str(exception))
         return errors_response(400, errors)
 
+    @timed('get_all_inclusions')
     def get_all_inclusions(self, instance_or_instances):
         """Returns a list of all the requested included resources
         associated with the given instance or instances of a SQLAlchemy
         model.
 
-        ``instance_or_instances`` is either a SQLAlchemy
-        :class:`~sqlalchemy.orm.query.Query` object representing
-        multiple instances of a SQLAlchemy model, or it is simply one
-        instance of a model. These instances represent the resources
-        that will be returned as primary data in the JSON API
-        response. The resources to include will be computed based on
-        these data and the client's ``include`` query parameter.
+        ``instance_or_instances`` is either a list of instances of a
+        SQLAlchemy model, a SQLAlchemy :class:`~sqlalchemy.orm.query.Query`
+        object representing multiple instances of a SQLAlchemy model, or
+        it is simply one instance of a model. These instances represent
+        the resources that will be returned as primary data in the JSON
+        API response. The resources to include will be computed based
+        on these data and the client's ``include`` query parameter.
 
         This function raises :exc:`MultipleExceptions` if any included
         resource causes a serialization exception. If this exception is
@@ -1445,16 +1793,7 @@ class APIBase(ModelView):
         that caused it.
 
         """
-        # If `instance_or_instances` is actually just a single instance
-        # of a SQLAlchemy model, get the resources to include for that
-        # one instance. Otherwise, collect the resources to include for
-        # each instance in `instances`.
-        if isinstance(instance_or_instances, Query):
-            instances = instance_or_instances
-            to_include = set(chain(map(self.resources_to_include, instances)))
-        else:
-            instance = instance_or_instances
-            to_include = self.resources_to_include(instance)
+        to_include = self.resources_to_include(instance_or_instances)
         only = self.sparse_fields
         # HACK We only need the primary data from the JSON API document,
         # not the metadata (so really the serializer is doing more work
@@ -1512,8 +1851,15 @@ class APIBase(ModelView):
             #
             # but we can't get the length of the list of items until
             # we serialize them.
-            num_results = count(self.session, items)
+            num_results = self._count(items)
+            if self.query_cache is not None:
+                items = self._fetch_all(items)
             return Paginated(items, page_size=0, num_results=num_results)
+        # If cursor pagination is enabled, use it unless the client has
+        # explicitly requested a page number.
+        if self.cursor_pagination and PAGE_NUMBER_PARAM not in request.args:
+            return self._cursor_paginated(items, page_size, filters=filters,
+                                          sort=sort, group_by=group_by)
         # Determine the client's page number request. Raise an exception
         # if the page number is out of bounds.
         page_number = int(request.args.get(PAGE_NUMBER_PARAM, 1))
@@ -1522,12 +1868,18 @@ class APIBase(ModelView):
         # At this point, we know the page size is positive, so we
         # paginate the response.
         #
-        # If the query is really a Flask-SQLAlchemy query, we can use
-        # its built-in pagination. Otherwise, we need to manually
-        # compute the page numbers, the number of results, etc.
-        if hasattr(items, 'paginate'):
-            pagination = items.paginate(page_number, page_size,
-                                        error_out=False)
+        # If the query is really a Flask-SQLAlchemy query and the
+        # resources are to be counted exactly, we can use its built-in
+        # pagination. Otherwise, we need to manually compute the page
+        # numbers, the number of results, etc. The same is true if the
+        # page and the count are to be looked up in the query cache.
+        cached = self.query_cache is not None
+        exact = (self._count_requested() and not cached and
+                 type(self.count_strategy) is ExactCount)
+        if hasattr(items, 'paginate') and exact:
+            with self.timer.phase('search'):
+                pagination = items.paginate(page_number, page_size,
+                                            error_out=False)
             num_results = pagination.total
             first = 1
             last = pagination.pages
@@ -1535,22 +1887,50 @@ class APIBase(ModelView):
             next_ = pagination.next_num
             items = pagination.items
         else:
-            num_results = count(self.session, items)
             first = 1
-            # Handle a special case for an empty collection of items.
-            #
-            # There will be no division-by-zero error here because we
-            # have already checked that page size is not equal to zero
-            # above.
-            if num_results == 0:
-                last = 1
-            else:
-                last = int(math.ceil(num_results / page_size))
             prev = page_number - 1 if page_number > 1 else None
-            next_ = page_number + 1 if page_number < last else None
             offset = (page_number - 1) * page_size
-            # TODO Use Query.slice() instead, since it's easier to use.
-            items = items.limit(page_size).offset(offset)
+            # If possible, fetch the page and the number of results in
+            # the same query. Otherwise, `page` is ``None`` and the page
+            # is fetched after counting the results separately.
+            strategy = self.count_strategy
+            page = None
+            if (self._count_requested() and not cached and
+                    isinstance(strategy, WindowCount)):
+                with self.timer.phase('search'):
+                    page = strategy.fetch_page(self.session, items,
+                                               page_size, offset)
+            if page is not None:
+                items, num_results = page
+            else:
+                num_results = self._count(items)
+            # If the number of results is unknown, so is the number of
+            # the last page. In that case, we fetch one more resource
+            # than requested to determine whether there is a next page.
+            if num_results is None:
+                last = None
+                items = items.limit(page_size + 1).offset(offset)
+                items = self._fetch_all(items)
+                next_ = page_number + 1 if len(items) > page_size else None
+                items = items[:page_size]
+            else:
+                # Handle a special case for an empty collection of
+                # items.
+                #
+                # There will be no division-by-zero error here because
+                # we have already checked that page size is not equal
+                # to zero above.
+                if num_results == 0:
+                    last = 1
+                else:
+                    last = int(math.ceil(num_results / page_size))
+                next_ = page_number + 1 if page_number < last else None
+                if page is None:
+                    # TODO Use Query.slice() instead, since it's easier
+                    # to use.
+                    items = items.limit(page_size).offset(offset)
+                    if cached:
+                        items = self._fetch_all(items)
         # Wrap the list of results in a Paginated object, which
         # represents the result set and stores some extra information
         # about how it was determined.
@@ -1559,9 +1939,247 @@ class APIBase(ModelView):
                          page_size=page_size, filters=filters, sort=sort,
                          group_by=group_by)
 
+    def _cursor_paginated(self, items, page_size, filters=None, sort=None,
+                          group_by=None):
+        """Returns a :class:`Paginated` object representing the page of
+        resources to return to the client, determined by the cursor in
+        the current request instead of by page number.
+
+        `items`, `filters`, `sort`, and `group_by` are as in
+        :meth:`_paginated`, and `page_size` is the positive page size
+        requested by the client.
+
+        The sort keys, followed by the primary key of the model as a
+        tiebreaker, define a total order on the resources. The client
+        may provide a cursor in the :data:`PAGE_AFTER_PARAM` (or
+        :data:`PAGE_CURSOR_PARAM`) query parameter to request the
+        resources that follow the resource identified by the cursor, or
+        in the :data:`PAGE_BEFORE_PARAM` query parameter to request the
+        resources that precede it. The page is selected by comparing
+        the sort keys with the values encoded in the cursor, instead of
+        by an offset, so the cost of fetching a page does not depend on
+        its position in the collection.
+
+        This method raises :exc:`PaginationError` if the cursor is not
+        valid for this request, or if the request cannot be paginated
+        by cursor because it groups resources or sorts them by a field
+        of a related resource.
+
+        """
+        if group_by:
+            raise PaginationError('Cannot use cursor pagination when'
+                                  ' grouping resources')
+        if any('.' in fieldname for symbol, fieldname in sort):
+            raise PaginationError('Cannot use cursor pagination when sorting'
+                                  ' by fields of related resources')
+        model = items.column_descriptions[0]['entity']
+        # Append the primary key to the sort keys as a tiebreaker, so
+        # that each resource has a unique position in the ordering.
+        keys = list(sort)
+        fieldnames = [fieldname for symbol, fieldname in keys]
+        keys.extend(('+', name) for name in primary_key_names(model)
+                    if name not in fieldnames)
+        # The cursor is only valid for the ordering from which it was
+        # created.
+        order = ','.join(''.join(key) for key in keys)
+        params = [param for param in (PAGE_AFTER_PARAM, PAGE_BEFORE_PARAM,
+                                      PAGE_CURSOR_PARAM)
+                  if param in request.args]
+        if len(params) > 1:
+            msg = 'Only one of {0} may be specified'.format(', '.join(params))
+            raise PaginationError(msg)
+        before = params == [PAGE_BEFORE_PARAM]
+        cursor = request.args[params[0]] if params else ''
+        num_results = self._count(items)
+        items = items.order_by(None)
+        if cursor:
+            try:
+                cursor_order, values = decode_cursor(cursor)
+            except ValueError:
+                raise PaginationError('Invalid cursor')
+            if cursor_order != order or len(values) != len(keys):
+                raise PaginationError('Cursor does not match the sort order'
+                                      ' of the request')
+            # TODO In Python 2.7+, this should be a list comprehension.
+            values = [string_to_datetime(model, fieldname, value)
+                      for (symbol, fieldname), value in zip(keys, values)]
+            items = items.filter(seek_predicate(model, keys, values,
+                                                reverse=before))
+        # Fetch one more resource than requested to determine whether
+        # there is another page beyond this one. When requesting the
+        # page before the cursor, fetch the resources in reverse order,
+        # then restore the order of the page.
+        items = items.order_by(*keyset_order(model, keys, reverse=before))
+        items = self._fetch_all(items.limit(page_size + 1))
+        has_more = len(items) > page_size
+        items = items[:page_size]
+        if before:
+            items.reverse()
+            has_prev, has_next = has_more, bool(cursor and items)
+        else:
+            has_prev, has_next = bool(cursor and items), has_more
+
+        def make_cursor(instance):
+            values = [getattr(instance, fieldname) for s, fieldname in keys]
+            return encode_cursor([order, list(map(_cursor_value, values))])
+
+        prev = make_cursor(items[0]) if has_prev else None
+        next_ = make_cursor(items[-1]) if has_next else None
+        return Paginated(items, num_results=num_results, first='', last='',
+                         next_=next_, prev=prev, page_size=page_size,
+                         filters=filters, sort=sort, group_by=group_by,
+                         cursors=True)
+
+    def _count_requested(self):
+        """Returns ``False`` if and only if the client has requested
+        that the total number of resources in a collection not be
+        counted, by specifying the value ``0`` or ``false`` for the
+        :data:`COUNT_PARAM` query parameter.
+
+        """
+        return request.args.get(COUNT_PARAM, '').lower() not in ('0', 'false')
+
+    @timed('count')
+    def _count(self, items):
+        """Returns the total number of resources in the query `items`,
+        as determined by the count strategy of this API, or ``None`` if
+        the resources should not be counted.
+
+        """
+        if not self._count_requested():
+            return None
+        count = partial(self.count_strategy.count, self.session)
+        if self.query_cache is None:
+            return count(items)
+        return self.query_cache.fetch_count(items, count)
+
+    @timed('search')
+    def _fetch_all(self, items):
+        """Returns the list of rows in the result of the query `items`,
+        from the query cache of this API if possible.
+
+        """
+        if self.query_cache is None:
+            return items.all()
+        return self.query_cache.fetch_all(items)
+
+    def _should_stream(self, is_relation):
+        """Returns ``True`` if the response to the current request for a
+        collection of resources should be streamed, as described in
+        :meth:`_stream_collection`.
+
+        `is_relation` is as in :meth:`collection_processor_type`.
+
+        Streaming is only possible for requests for all resources in the
+        collection, that is, requests with page size zero. Since a
+        streamed response is never represented completely in memory, it
+        cannot be used if the client has requested a JSONP response or
+        included resources or if there are postprocessors that expect
+        the complete response document.
+
+        """
+        if not self.streaming:
+            return False
+        try:
+            page_size = int(request.args.get(PAGE_SIZE_PARAM,
+                                             self.page_size))
+        except ValueError:
+            return False
+        if page_size != 0:
+            return False
+        if 'callback' in request.args:
+            return False
+        if self.resources_to_include_requested():
+            return False
+        processor_type = \
+            self.collection_processor_type(is_relation=is_relation)
+        processor_type = 'GET_{0}'.format(processor_type)
+        return not self.postprocessors[processor_type]
+
+    def _stream_collection(self, items, resource=None, relation_name=None,
+                           is_relationship=False):
+        """Returns a response whose primary data is the collection of
+        resources in `items`, generated lazily so that the response can
+        be streamed to the client.
+
+        `items` is a SQLAlchemy query containing all the resources in the
+        requested collection. The resources are loaded from the database
+        and serialized :data:`STREAM_BATCH_SIZE` at a time, so the peak
+        memory usage does not depend on the size of the collection.
+
+        `resource` and `relation_name` are as in
+        :meth:`_get_collection_helper`, and `is_relationship` indicates
+        whether the primary data consists of resource identifier objects
+        instead of resource objects.
+
+        The first batch of resources is serialized before this method
+        returns, so that an error response can be returned if it fails.
+        The primary data in the returned document is a generator over
+        lists of resource objects, which is recognized by
+        :func:`jsonpify`.
+
+        """
+        if is_relationship:
+            serialize_many = simple_relationship_serialize_many
+        else:
+            serialize_many = partial(self.serializer.serialize_many,
+                                     only=self.sparse_fields)
+        if isinstance(items, Query):
+            items = _batched_query(items, STREAM_BATCH_SIZE)
+        items = iter(items)
+
+        def batches():
+            while True:
+                batch = list(islice(items, STREAM_BATCH_SIZE))
+                if not batch:
+                    return
+                # Serialization errors that occur after the response
+                # has started cannot be reported to the client, so they
+                # are simply raised.
+                yield serialize_many(batch)['data']
+
+        remaining_batches = batches()
+        try:
+            first_batch = next(remaining_batches)
+        except StopIteration:
+            first_batch = []
+        except MultipleExceptions as e:
+            return errors_from_serialization_exceptions(e.exceptions)
+        except SerializationException as exception:
+            return errors_from_serialization_exceptions([exception])
+
+        def data():
+            yield first_batch
+            for batch in remaining_batches:
+                yield batch
+
+        result = JsonApiDocument()
+        result['data'] = data()
+        linker = Linker(self.model)
+        result['links'] = linker.generate_links(resource, None, relation_name,
+                                                None, is_relationship)
+        # HACK Provide the headers directly in the result dictionary, so
+        # that the :func:`jsonpify` function has access to them. The
+        # total number of resources is computed by :func:`jsonpify` as
+        # the resources are generated. There is no Link header, since a
+        # streamed collection is never paginated.
+        headers = {}
+        status = 200
+        result['meta'].update({_HEADERS: headers, _STATUS: status})
+        return result, status, headers
+
     def _get_resource_helper(self, resource, primary_resource=None,
                              relation_name=None, related_resource=False):
         is_relationship = self.use_resource_identifiers()
+        # Compute the validators of a primary resource before serializing
+        # it, so that the serialization can be skipped if the client
+        # already has the current representation of the resource.
+        headers = {}
+        if (self.validator is not None and primary_resource is None and
+                resource is not None):
+            headers = self.validator.resource_headers(self.session, resource)
+            if not_modified(headers):
+                return not_modified_response(headers)
         # The resource to serialize may be `None`, if we are fetching a
         # to-one relation that has no value. In this case, the "data"
         # for the JSON API response is just `None`.
@@ -1638,7 +2256,7 @@ class APIBase(ModelView):
         processor_type = 'GET_{0}'.format(self.resource_processor_type(**kw))
         for postprocessor in self.postprocessors[processor_type]:
             postprocessor(result=result)
-        return result, 200
+        return result, 200, headers
 
     def _get_collection_helper(self, resource=None, relation_name=None,
                                filters=None, sort=None, group_by=None,
@@ -1654,8 +2272,16 @@ class APIBase(ModelView):
         else:
             search_ = partial(search, self.session, self.model)
         try:
-            search_items = search_(filters=filters, sort=sort,
-                                   group_by=group_by)
+            with self.timer.phase('search'):
+                threshold = self.in_list_threshold
+                search_items = search_(filters=filters, sort=sort,
+                                       group_by=group_by,
+                                       filter_limits=self.filter_limits,
+                                       text_search=self.text_search,
+                                       in_list_threshold=threshold)
+        except FilterLimitError as exception:
+            detail = 'filter too expensive: {0}'.format(str(exception))
+            return error_response(400, cause=exception, detail=detail)
         except (FilterParsingError, FilterCreationError) as exception:
             detail = 'invalid filter object: {0}'.format(str(exception))
             return error_response(400, cause=exception, detail=detail)
@@ -1664,6 +2290,20 @@ class APIBase(ModelView):
             return error_response(400, cause=exception, detail=detail)
 
         is_relationship = self.use_resource_identifiers()
+        if not single and self._should_stream(is_relation):
+            return self._stream_collection(search_items, resource,
+                                           relation_name, is_relationship)
+        # Compute the validators of a collection of primary resources
+        # before fetching the requested page, so that fetching and
+        # serializing the page can be skipped if the client already has
+        # the current representation of the collection.
+        validator_headers = {}
+        if (self.validator is not None and not is_relation and
+                not single and not group_by):
+            validator_headers = \
+                self.validator.collection_headers(self.session, search_items)
+            if not_modified(validator_headers):
+                return not_modified_response(validator_headers)
         # Add the primary data (and any necessary links) to the JSON API
         # response object.
         #
@@ -1676,6 +2316,11 @@ class APIBase(ModelView):
             except PaginationError as exception:
                 detail = exception.args[0]
                 return error_response(400, cause=exception, detail=detail)
+            # This is a mistake in the configuration of the server, not
+            # in the request.
+            except MissingSecretKey as exception:
+                detail = exception.args[0]
+                return error_response(500, cause=exception, detail=detail)
             # Serialize the found items.
             #
             # We are serializing one of three possibilities.
@@ -1685,20 +2330,28 @@ class APIBase(ModelView):
             # - a to-many relationship (as in
             #   `GET /person/1/relationships/articles`)
             #
-            items = paginated.items
-            # This covers the relationship object case...
-            if is_relationship:
-                result = simple_relationship_serialize_many(items)
-            # ...and this covers the primary resource collection and
-            # to-many relation cases.
-            else:
-                only = self.sparse_fields
-                try:
-                    result = self.serializer.serialize_many(items, only=only)
-                except MultipleExceptions as e:
-                    return errors_from_serialization_exceptions(e.exceptions)
-                except SerializationException as exception:
-                    return errors_from_serialization_exceptions([exception])
+            # The items on the page are materialized here since they are
+            # used both for the primary data and for computing the
+            # resources to include.
+            with self.timer.phase('search'):
+                items = list(paginated.items)
+            with self.timer.phase('serialize_many'):
+                # This covers the relationship object case...
+                if is_relationship:
+                    result = simple_relationship_serialize_many(items)
+                # ...and this covers the primary resource collection and
+                # to-many relation cases.
+                else:
+                    only = self.sparse_fields
+                    try:
+                        result = self.serializer.serialize_many(items,
+                                                                only=only)
+                    except MultipleExceptions as e:
+                        exceptions = e.exceptions
+                        return errors_from_serialization_exceptions(exceptions)
+                    except SerializationException as exception:
+                        exceptions = [exception]
+                        return errors_from_serialization_exceptions(exceptions)
 
             # Determine the top-level links.
             linker = Linker(self.model)
@@ -1716,6 +2369,7 @@ class APIBase(ModelView):
             pagination_header_links = pagination_linker.generate_header_links()
             link_header = ','.join(pagination_header_links)
             headers = dict(Link=link_header)
+            headers.update(validator_headers)
             num_results = paginated.num_results
 
         # Otherwise, the result of the search should be a single resource.
@@ -1760,10 +2414,13 @@ class APIBase(ModelView):
             num_results = 1
 
         # Determine the resources to include (in a compound document).
-        if self.use_resource_identifiers():
+        #
+        # For a collection, only the resources on the requested page are
+        # used, not every resource matched by the search.
+        if self.use_resource_identifiers() or single:
             instances = resource
         else:
-            instances = search_items
+            instances = items
         # Include any requested resources in a compound document.
         try:
             included = self.get_all_inclusions(instances)
@@ -1793,17 +2450,38 @@ class APIBase(ModelView):
         # for more information. They don't really need to be under the ``meta``
         # key, that's just for semantic consistency.
         status = 200
-        meta = {_HEADERS: headers, _STATUS: status, 'total': num_results}
+        meta = {_HEADERS: headers, _STATUS: status}
+        if num_results is not None:
+            meta['total'] = num_results
         if 'meta' not in result:
             result['meta'] = {}
         result['meta'].update(meta)
         return result, status, headers
 
-    def resources_to_include(self, instance):
+    def resources_to_include_requested(self):
+        """Returns ``True`` if and only if any related resources should
+        be included in a compound document response, either because the
+        client has specified the ``include`` query parameter or because
+        there are default includes specified in the constructor of this
+        class.
+
+        """
+        toinclude = request.args.get('include')
+        if toinclude is not None:
+            return bool(toinclude)
+        return bool(self.default_includes)
+
+    def resources_to_include(self, instance_or_instances):
         """Returns a set of resources to include in a compound document
         response based on the ``include`` query parameter and the default
         includes specified in the constructor of this class.
 
+        ``instance_or_instances`` is either a single instance of a
+        SQLAlchemy model or a list or query of such instances, as
+        described in :meth:`get_all_inclusions`. The resources to include
+        are loaded one level of each relationship path at a time for all
+        the instances, as described in :func:`resources_from_paths`.
+
         The ``include`` query parameter is as described in the `Inclusion of
         Related Resources`_ section of the JSON API specification. It specifies
         which resources, other than the primary resource or resources, will be
@@ -1824,5 +2502,12 @@ class APIBase(ModelView):
             toinclude = self.default_includes
         else:
             toinclude = set(toinclude.split(','))
-        return set(chain(resources_from_path(instance, path)
-                         for path in toinclude))
+        # If `instance_or_instances` is actually just a single instance
+        # of a SQLAlchemy model, get the resources to include for that
+        # one instance. Otherwise, collect the resources to include for
+        # all the instances at once.
+        if isinstance(instance_or_instances, (list, Query)):
+            instances = list(instance_or_instances)
+        else:
+            instances = [instance_or_instances]
+        return resources_from_paths(instances, toinclude)
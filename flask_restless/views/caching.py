@@ -0,0 +1,658 @@
+# caching.py - caching the results of queries for collections
+#
+# Copyright 2011 Lincoln de Sousa <lincoln@comum.org>.
+# Copyright 2012, 2013, 2014, 2015, 2016 Jeffrey Finkelstein
+#           <jeffrey.finkelstein@gmail.com> and contributors.
+#
+# This file is part of Flask-Restless.
+#
+# Flask-Restless is distributed under both the GNU Affero General Public
+# License version 3 and under the 3-clause BSD license. For more
+# information, see LICENSE.AGPL and LICENSE.BSD.
+"""Caching of the results of the queries that fetch collections of
+resources, and of the responses to :http:method:`get` requests.
+
+A :class:`QueryCache` is used by the views created by
+:class:`~flask_restless.APIManager` to remember the rows and the count
+of each query that fetches a page of a collection. Entries are keyed by
+the SQL of the query and the values of its parameters, and tagged with
+the names of the tables the query reads. When a session in which the
+cache is attached commits changes to a table, every entry tagged with
+that table is removed from the cache.
+
+:class:`InMemoryQueryCache` keeps entries in a dictionary in the memory
+of the current process. Other backends can be provided by subclassing
+:class:`QueryCache` and overriding its :meth:`~QueryCache.get`,
+:meth:`~QueryCache.set`, :meth:`~QueryCache.invalidate`, and
+:meth:`~QueryCache.clear` methods.
+
+A :class:`ResponseCache` remembers the encoded body and headers of each
+successful response to a :http:method:`get` request, keyed by the URL
+and the ``Accept`` and ``Authorization`` headers of the request, and
+tagged with the tables that store the resources that appear in the
+response.
+
+"""
+from collections import defaultdict
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+
+from flask import current_app
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm.attributes import get_history
+from sqlalchemy.orm.attributes import PASSIVE_NO_INITIALIZE
+from sqlalchemy.sql.util import find_tables
+
+from ..helpers import model_for
+
+#: The key in the WSGI environment of the request under which the
+#: :func:`~flask_restless.views.base.jsonpify` function stores the JSON
+#: API document of the response, so that a :class:`ResponseCache` can
+#: determine the tables from which it was read. The document is stored
+#: only if a :class:`ResponseCache` has set this key before calling the
+#: view.
+_DOCUMENT = 'flask_restless.document'
+
+
+def table_names(selectable):
+    """Returns the set of names of the tables in `selectable`, which may
+    be a table or a join of tables.
+
+    """
+    return set(table.fullname for table in find_tables(selectable))
+
+
+def query_tables(query):
+    """Returns the set of names of the tables read by the SQLAlchemy
+    query `query`, including the tables in joins and subqueries.
+
+    """
+    return frozenset(table_names(query.statement))
+
+
+def query_key(query, kind):
+    """Returns the key under which the result of `query` is cached.
+
+    The key consists of `kind`, which distinguishes the results of
+    different operations on the same query, the SQL of the query, and
+    the values of its parameters.
+
+    """
+    compiled = query.statement.compile()
+    params = sorted(compiled.params.items())
+    return (kind, str(compiled), repr(params))
+
+
+def changed_tables(session):
+    """Returns the set of names of the tables written by the pending
+    changes in `session`.
+
+    This includes the association tables of many-to-many relationships
+    whose value has changed, since SQLAlchemy writes the rows of those
+    tables on behalf of the instances on either side.
+
+    """
+    tables = set()
+    for instance in session.new | session.dirty | session.deleted:
+        mapper = inspect(instance).mapper
+        tables.update(table.fullname for table in mapper.tables)
+        for relationship in mapper.relationships:
+            if relationship.secondary is None:
+                continue
+            if instance in session.dirty:
+                history = get_history(instance, relationship.key,
+                                      passive=PASSIVE_NO_INITIALIZE)
+                if not history.has_changes():
+                    continue
+            tables.update(table_names(relationship.secondary))
+    return tables
+
+
+def model_tables(model):
+    """Returns the set of names of the tables that store the instances
+    of `model` and the instances related to them, including the
+    association tables of many-to-many relationships.
+
+    The tables of related instances are included since the
+    representation of a resource includes the identifiers of its
+    related resources.
+
+    """
+    mapper = inspect(model)
+    tables = set(table.fullname for table in mapper.tables)
+    for relationship in mapper.relationships:
+        tables.update(table.fullname for table in relationship.mapper.tables)
+        if relationship.secondary is not None:
+            tables.update(table_names(relationship.secondary))
+    return tables
+
+
+def reachable_tables(model):
+    """Returns the set of names of the tables that store the instances
+    of `model` and of every model reachable from it by a path of
+    relationships, as described in :func:`model_tables`.
+
+    Instances loaded by a query may carry related instances loaded after
+    the query, for example when they are included in a compound
+    document, so a change to any of those tables may change what is
+    served from the cached instances.
+
+    """
+    tables = set()
+    seen = set()
+    mappers = [inspect(model).mapper]
+    while mappers:
+        mapper = mappers.pop()
+        if mapper in seen:
+            continue
+        seen.add(mapper)
+        tables.update(model_tables(mapper))
+        mappers.extend(relationship.mapper
+                       for relationship in mapper.relationships)
+    return tables
+
+
+def result_tables(query):
+    """Returns the set of names of the tables on which the instances in
+    the result of `query` depend: the tables read by the query and the
+    tables reachable from each of its entities, as described in
+    :func:`reachable_tables`.
+
+    """
+    tables = set(query_tables(query))
+    for description in query.column_descriptions:
+        entity = description['entity']
+        if entity is not None:
+            tables.update(reachable_tables(entity))
+    return frozenset(tables)
+
+
+def document_tables(document, model):
+    """Returns the set of names of the tables that store the resources
+    in the JSON API document `document`, which represents resources of
+    `model` or resources related to them.
+
+    The tables are determined by the types of the primary and included
+    resources of the document, as described in :func:`model_tables`.
+
+    """
+    data = document.get('data')
+    resources = data if isinstance(data, list) else [data]
+    resources = resources + list(document.get('included', ()))
+    models = set([model])
+    for resource in resources:
+        if not isinstance(resource, dict) or 'type' not in resource:
+            continue
+        try:
+            models.add(model_for(resource['type']))
+        except ValueError:
+            pass
+    return frozenset().union(*map(model_tables, models))
+
+
+class ChangeListener(object):
+    """Calls `callback` with the set of names of the tables changed by
+    each transaction committed in the sessions to which this listener
+    is attached.
+
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self._targets = []
+
+    def attach(self, session):
+        """Listens for the changes committed in `session`, which may be a
+        :class:`~sqlalchemy.orm.session.Session`, a
+        :class:`~sqlalchemy.orm.session.sessionmaker`, or a
+        :class:`~sqlalchemy.orm.scoping.scoped_session`.
+
+        Attaching a listener to the same session more than once has no
+        effect.
+
+        """
+        if any(target is session for target in self._targets):
+            return
+        event.listen(session, 'after_flush', self.after_flush)
+        event.listen(session, 'after_commit', self.after_commit)
+        self._targets.append(session)
+
+    def after_flush(self, session, flush_context):
+        # The tables are recorded on each flush but reported only when
+        # the transaction is committed, since until then no other
+        # session can read the changes. The tables recorded in a
+        # transaction that is rolled back are reported with the next
+        # commit, which at worst removes some entries needlessly.
+        session.info.setdefault(self, set()).update(changed_tables(session))
+
+    def after_commit(self, session):
+        tables = session.info.pop(self, None)
+        if tables:
+            self.callback(tables)
+
+
+class QueryCache(object):
+    """Remembers the results of queries until the tables they read are
+    changed.
+
+    **This is a base class with no implementation.** Subclasses must
+    override :meth:`get`, :meth:`set`, :meth:`invalidate`, and
+    :meth:`clear`.
+
+    """
+
+    #: The :class:`ChangeListener` that invalidates the entries of this
+    #: cache, created when the cache is first attached to a session.
+    _listener = None
+
+    #: Maps each table name to the number of times changes to that table
+    #: have been reported to this cache by :meth:`changed`, with the key
+    #: ``None`` counting the times the whole cache has been cleared.
+    _generations = None
+
+    #: Guards the generations of every query cache, so that a result is
+    #: stored only if no change was reported after its query started.
+    _generation_lock = Lock()
+
+    def get(self, key):
+        """Returns the value stored under `key`, or ``None`` if there is
+        no such value.
+
+        **This method is not implemented in this base class; subclasses
+        must override this method.**
+
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, tables):
+        """Stores `value` under `key`, tagged with `tables`, a set of
+        names of tables.
+
+        **This method is not implemented in this base class; subclasses
+        must override this method.**
+
+        """
+        raise NotImplementedError
+
+    def invalidate(self, tables):
+        """Removes the values tagged with any of the table names in
+        `tables`.
+
+        **This method is not implemented in this base class; subclasses
+        must override this method.**
+
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """Removes all values.
+
+        **This method is not implemented in this base class; subclasses
+        must override this method.**
+
+        """
+        raise NotImplementedError
+
+    def attach(self, session):
+        """Invalidates the entries of this cache whenever changes to the
+        tables they read are committed in `session`.
+
+        """
+        if self._listener is None:
+            self._listener = ChangeListener(self.changed)
+        self._listener.attach(session)
+
+    def changed(self, tables=None):
+        """Removes the values tagged with any of the table names in
+        `tables`, or all values if `tables` is ``None``, by calling
+        :meth:`invalidate` or :meth:`clear`.
+
+        Results of queries that were running when this method was called
+        are not stored by :meth:`fetch_all` and :meth:`fetch_count`,
+        since they may have been read before the changes were committed.
+
+        """
+        with self._generation_lock:
+            if self._generations is None:
+                self._generations = defaultdict(int)
+            for table in (None, ) if tables is None else tables:
+                self._generations[table] += 1
+        if tables is None:
+            self.clear()
+        else:
+            self.invalidate(tables)
+
+    def _generation(self, tables):
+        """Returns an object that changes whenever :meth:`changed` is
+        called with any of the table names in `tables`.
+
+        """
+        generations = self._generations or {}
+        return tuple(generations.get(table, 0)
+                     for table in (None, ) + tuple(sorted(tables)))
+
+    def _set_unless_changed(self, key, value, tables, generation):
+        """Stores `value` under `key`, tagged with `tables`, unless the
+        generation of `tables` is no longer `generation`, as returned by
+        :meth:`_generation` before the value was computed.
+
+        """
+        with self._generation_lock:
+            if self._generation(tables) == generation:
+                self.set(key, value, tables)
+
+    def fetch_all(self, query):
+        """Returns the list of rows in the result of the SQLAlchemy query
+        `query`, from this cache if possible.
+
+        Cached instances are merged into the session of `query` without
+        loading them from the database, so they can be serialized as if
+        they had been loaded by the query itself. Since they carry the
+        related instances loaded onto them after the query, for example
+        to include them in a compound document, the result is tagged with
+        the tables of every related model, as described in
+        :func:`result_tables`.
+
+        """
+        key = query_key(query, 'all')
+        rows = self.get(key)
+        if rows is None:
+            tables = result_tables(query)
+            generation = self._generation(tables)
+            rows = query.all()
+            self._set_unless_changed(key, rows, tables, generation)
+            return rows
+        return list(query.merge_result(rows, load=False))
+
+    def fetch_count(self, query, count):
+        """Returns the number of rows in the result of the SQLAlchemy
+        query `query`, from this cache if possible.
+
+        `count` is the function that counts the rows of `query` if the
+        count is not in this cache. It may return ``None``, in which case
+        nothing is cached.
+
+        """
+        query = query.order_by(None)
+        key = query_key(query, 'count')
+        num_results = self.get(key)
+        if num_results is None:
+            tables = query_tables(query)
+            generation = self._generation(tables)
+            num_results = count(query)
+            if num_results is not None:
+                self._set_unless_changed(key, num_results, tables,
+                                         generation)
+        return num_results
+
+
+class TaggedLRUCache(object):
+    """A mapping whose entries are tagged with names of tables, with a
+    bounded number of entries that evicts the least recently used entry
+    when it is full.
+
+    `maxsize` is the maximum number of entries to keep. If `maxbytes` is
+    not ``None``, it is the maximum total size of the entries, as given
+    by the `nbytes` argument to :meth:`set`.
+
+    Instances of this class are safe to share among threads.
+
+    """
+
+    def __init__(self, maxsize=1024, maxbytes=None):
+        #: The maximum number of entries kept in this cache.
+        self.maxsize = maxsize
+
+        #: The maximum total size of the entries kept in this cache, or
+        #: ``None`` if the size is not bounded.
+        self.maxbytes = maxbytes
+
+        #: The total size of the entries in this cache.
+        self.nbytes = 0
+
+        #: The number of lookups that found an entry in this cache.
+        self.hits = 0
+
+        #: The number of lookups that did not find an entry in this
+        #: cache.
+        self.misses = 0
+
+        # Maps each key to a triple of the form ``(value, tables,
+        # nbytes)``, where ``tables`` is the set of tables with which
+        # the entry is tagged, from least to most recently used.
+        self._entries = OrderedDict()
+        # Maps each table name to the set of keys tagged with it.
+        self._keys = defaultdict(set)
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        value, tables, nbytes = self._entries.pop(key)
+        self.nbytes -= nbytes
+        for table in tables:
+            keys = self._keys[table]
+            keys.discard(key)
+            if not keys:
+                del self._keys[table]
+
+    def _full(self):
+        if len(self._entries) > self.maxsize:
+            return True
+        return self.maxbytes is not None and self.nbytes > self.maxbytes
+
+    def get(self, key):
+        """Returns the value stored under `key`, or ``None`` if there is
+        no such value.
+
+        """
+        with self._lock:
+            try:
+                entry = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, tables, nbytes=0):
+        """Stores `value` under `key`, tagged with `tables`, a set of
+        names of tables, evicting the least recently used entries if the
+        cache is full.
+
+        `nbytes` is the size of `value`, which counts toward
+        :attr:`maxbytes`. A value larger than :attr:`maxbytes` is not
+        stored.
+
+        """
+        if self.maxbytes is not None and nbytes > self.maxbytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, tables, nbytes)
+            self.nbytes += nbytes
+            for table in tables:
+                self._keys[table].add(key)
+            while self._full():
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tables):
+        """Removes the values tagged with any of the table names in
+        `tables`.
+
+        """
+        with self._lock:
+            for table in tables:
+                for key in list(self._keys.get(table, ())):
+                    self._remove(key)
+
+    def clear(self):
+        """Removes all values."""
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self.nbytes = 0
+
+
+class InMemoryQueryCache(TaggedLRUCache, QueryCache):
+    """A query cache that keeps up to `maxsize` entries in the memory of
+    the current process, evicting the least recently used entry when it
+    is full.
+
+    Instances of this class are safe to share among threads, but not
+    among processes; changes committed in other processes do not
+    invalidate the entries of this cache.
+
+    """
+
+    def __init__(self, maxsize=1024):
+        super(InMemoryQueryCache, self).__init__(maxsize=maxsize)
+
+
+class ResponseCache(TaggedLRUCache):
+    """Remembers the encoded responses to :http:method:`get` requests
+    until the tables from which they were read are changed.
+
+    Responses are keyed by the URL of the request, including its query
+    parameters, and by the values of its ``Accept`` and
+    ``Authorization`` headers, along with the values of the headers
+    named in `vary`. For example, if the response to a request depends
+    on the user making the request and the user is identified by a
+    header other than ``Authorization``, that header must be named in
+    `vary`.
+
+    A cached response is returned without calling the preprocessors of
+    the view, so :meth:`~flask_restless.APIManager.create_api` refuses
+    to cache the responses of an API with preprocessors for
+    :http:method:`get` requests unless `bypass_preprocessors` is
+    ``True``.
+
+    The cache keeps up to `maxsize` responses and, if `maxbytes` is not
+    ``None``, up to `maxbytes` bytes of response bodies, in the memory
+    of the current process, evicting the least recently used response
+    when it is full. Instances of this class are safe to share among
+    threads, but not among processes.
+
+    """
+
+    def __init__(self, maxsize=1024, maxbytes=None, vary=(),
+                 bypass_preprocessors=False):
+        super(ResponseCache, self).__init__(maxsize=maxsize,
+                                            maxbytes=maxbytes)
+
+        #: The names of the headers of the request on which the response
+        #: depends.
+        self.vary = ('Accept', 'Authorization') + tuple(vary)
+
+        #: Whether this cache may answer requests to APIs that have
+        #: preprocessors for :http:method:`get` requests, which are not
+        #: called for cached responses.
+        self.bypass_preprocessors = bypass_preprocessors
+
+        self._listener = ChangeListener(self.invalidate)
+
+    def attach(self, session):
+        """Invalidates the responses in this cache whenever changes to the
+        tables they were read from are committed in `session`.
+
+        """
+        self._listener.attach(session)
+
+    def _key(self):
+        """Returns the key of the response to the current request."""
+        headers = tuple(request.headers.get(name) for name in self.vary)
+        return (request.url, headers)
+
+    def cached(self, view, model):
+        """Returns a view function that responds to :http:method:`get`
+        requests with the responses in this cache, if possible, and
+        otherwise calls the view function `view` and stores its
+        response in this cache.
+
+        `model` is the model exposed by `view`. The tables that store its
+        instances and their related instances are always among the tags
+        of a response, even if the response has no resources.
+
+        Only successful responses that are not streamed are cached. A
+        cached response is returned without calling `view`, so without
+        calling any preprocessors or postprocessors.
+
+        """
+        @wraps(view)
+        def new_func(*args, **kw):
+            if request.method != 'GET':
+                return view(*args, **kw)
+            key = self._key()
+            entry = self.get(key)
+            if entry is not None:
+                body, status, headers = entry
+                response = current_app.response_class(body, status=status,
+                                                      headers=headers)
+                if ('ETag' in response.headers or
+                        'Last-Modified' in response.headers):
+                    response.make_conditional(request)
+                return response
+            # Ask `jsonpify()` to keep the document of the response.
+            request.environ[_DOCUMENT] = None
+            response = view(*args, **kw)
+            document = request.environ.get(_DOCUMENT)
+            if (response.status_code != 200 or response.is_streamed or
+                    document is None):
+                return response
+            body = response.get_data()
+            # The date and the timing of the response must not be reused.
+            headers = [(name, value) for name, value in response.headers
+                       if name not in ('Date', 'Server-Timing')]
+            tables = document_tables(document, model)
+            self.set(key, (body, response.status_code, headers), tables,
+                     nbytes=len(body))
+            return response
+        return new_func
+
+
+def create_query_cache(query_cache=None):
+    """Returns an instance of :class:`QueryCache`, or ``None`` if query
+    results should not be cached.
+
+    If `query_cache` is ``None`` or ``False``, this returns ``None``. If
+    it is ``True``, this returns an :class:`InMemoryQueryCache` with the
+    default settings. If it is a dictionary, this returns an
+    :class:`InMemoryQueryCache` created with the items of the dictionary
+    as keyword arguments. If it is already an instance of
+    :class:`QueryCache`, it is returned unchanged.
+
+    """
+    if query_cache is None or query_cache is False:
+        return None
+    if query_cache is True:
+        return InMemoryQueryCache()
+    if isinstance(query_cache, dict):
+        return InMemoryQueryCache(**query_cache)
+    return query_cache
+
+
+def create_response_cache(response_cache=None):
+    """Returns an instance of :class:`ResponseCache`, or ``None`` if
+    responses should not be cached.
+
+    If `response_cache` is ``None`` or ``False``, this returns ``None``.
+    If it is ``True``, this returns a :class:`ResponseCache` with the
+    default settings. If it is a dictionary, this returns a
+    :class:`ResponseCache` created with the items of the dictionary as
+    keyword arguments. If it is already an instance of
+    :class:`ResponseCache`, it is returned unchanged.
+
+    """
+    if response_cache is None or response_cache is False:
+        return None
+    if response_cache is True:
+        return ResponseCache()
+    if isinstance(response_cache, dict):
+        return ResponseCache(**response_cache)
+    return response_cache
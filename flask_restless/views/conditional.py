@@ -0,0 +1,228 @@
+# conditional.py - validators for conditional requests
+#
+# Copyright 2011 Lincoln de Sousa <lincoln@comum.org>.
+# Copyright 2012, 2013, 2014, 2015, 2016 Jeffrey Finkelstein
+#           <jeffrey.finkelstein@gmail.com> and contributors.
+#
+# This file is part of Flask-Restless.
+#
+# Flask-Restless is distributed under both the GNU Affero General Public
+# License version 3 and under the 3-clause BSD license. For more
+# information, see LICENSE.AGPL and LICENSE.BSD.
+"""Validators that allow clients to make conditional requests.
+
+A :class:`Validator` is used by the views created by
+:class:`~flask_restless.APIManager` to set the ``ETag`` and
+``Last-Modified`` headers on responses to :http:method:`get` requests,
+and to respond with :http:status:`304` when the client already has the
+current representation of a resource or collection, as indicated by the
+``If-None-Match`` or ``If-Modified-Since`` headers of the request.
+
+:class:`ColumnValidator` computes validators from a version or
+modification time column of the model, before the resources are
+serialized. :class:`BodyHashValidator` computes the entity tag from the
+encoded body of each response.
+
+The :func:`create_validator` function returns an instance of a
+validator given its name.
+
+"""
+from datetime import date
+from functools import wraps
+from hashlib import sha1
+
+from flask import request
+from sqlalchemy import Date
+from sqlalchemy import DateTime
+from sqlalchemy import Integer
+from sqlalchemy.sql.expression import func
+from werkzeug.http import http_date
+from werkzeug.http import is_resource_modified
+from werkzeug.http import quote_etag
+
+from ..helpers import primary_key_names
+
+#: The key in the WSGI environment of the request under which a view
+#: stores its :class:`Validator`, so that the
+#: :func:`evaluate_conditional_request` decorator can read it.
+_VALIDATOR = 'flask_restless.validator'
+
+
+def _entity_tag(*parts):
+    """Returns a weak entity tag computed from the URL of the current
+    request and the given values.
+
+    The URL is part of the entity tag since the representation of a
+    resource depends on query parameters like ``include`` and
+    ``fields``.
+
+    """
+    parts = (request.full_path, ) + parts
+    digest = sha1(repr(parts).encode('utf-8')).hexdigest()
+    return quote_etag(digest, weak=True)
+
+
+class Validator(object):
+    """Computes the validators for the representations of resources and
+    collections of resources.
+
+    The methods of this class return a dictionary mapping header name to
+    value, with the ``ETag`` and ``Last-Modified`` headers to set on the
+    response. This base class returns no headers.
+
+    """
+
+    #: Whether the entity tag of a response is computed from its body,
+    #: after the response has been encoded.
+    hash_body = False
+
+    def resource_headers(self, session, resource):
+        """Returns the validator headers for the representation of
+        `resource`, an instance of a model, in the response to the
+        current request.
+
+        """
+        return {}
+
+    def collection_headers(self, session, query):
+        """Returns the validator headers for the representation of the
+        collection of resources in the result of the SQLAlchemy query
+        `query` in the response to the current request.
+
+        """
+        return {}
+
+
+class BodyHashValidator(Validator):
+    """Computes a strong entity tag from a hash of the encoded body of
+    each response.
+
+    This validator saves the client from downloading an unchanged
+    response, but the server still fetches, serializes, and encodes the
+    resources for each request.
+
+    """
+
+    hash_body = True
+
+
+class ColumnValidator(Validator):
+    """Computes validators from the column named `column` of the model.
+
+    The column should be either an integer version number that is
+    incremented each time a row is updated, as with the
+    ``version_id_col`` option of a SQLAlchemy mapper, or the date and
+    time at which the row was last modified.
+
+    The entity tag of a resource is computed from the value of its
+    column, and the entity tag of a collection is computed from the
+    number of resources in the collection, from the maximum (for a
+    date and time) or the sum (for a version number) of the values of
+    the column, and from the maximum (and, for an integer, the sum) of
+    the primary key, with a single aggregate query. If the column is a
+    date and time, the representation of a resource also has a
+    ``Last-Modified`` header. These entity tags are weak, since changes
+    to related resources are reflected in them only if those changes
+    update the column as well.
+
+    """
+
+    def __init__(self, column):
+        self.column = column
+
+    def resource_headers(self, session, resource):
+        value = getattr(resource, self.column, None)
+        if value is None:
+            return {}
+        headers = dict(ETag=_entity_tag(value))
+        if isinstance(value, date):
+            headers['Last-Modified'] = http_date(value)
+        return headers
+
+    def collection_headers(self, session, query):
+        entity = query.column_descriptions[0]['entity']
+        column = getattr(entity, self.column, None)
+        if column is None:
+            return {}
+        # A deleted resource may not change the latest modification
+        # time, so the number of resources is part of the entity tag.
+        if isinstance(column.type, (Date, DateTime)):
+            aggregates = [func.count(), func.max(column)]
+        else:
+            aggregates = [func.count(), func.sum(column)]
+        # Replacing a resource with a new one with the same version or
+        # modification time changes neither of those, so the primary
+        # keys are part of the entity tag as well.
+        for name in primary_key_names(entity):
+            key = getattr(entity, name)
+            if isinstance(key.type, Integer):
+                aggregates.append(func.sum(key))
+            aggregates.append(func.max(key))
+        query = query.order_by(None).with_entities(*aggregates)
+        return dict(ETag=_entity_tag(*query.one()))
+
+
+def not_modified(headers):
+    """Returns ``True`` if and only if the validators in `headers`, a
+    dictionary as returned by :meth:`Validator.resource_headers`, match
+    the preconditions of the current request, so that the server should
+    respond with :http:status:`304`.
+
+    """
+    if not headers:
+        return False
+    etag = headers.get('ETag')
+    last_modified = headers.get('Last-Modified')
+    return not is_resource_modified(request.environ, etag=etag,
+                                    last_modified=last_modified)
+
+
+def evaluate_conditional_request(view):
+    """Decorator that makes the response returned by `view` conditional
+    on the ``If-None-Match`` and ``If-Modified-Since`` headers of the
+    request.
+
+    If the view that handled the request has a
+    :class:`BodyHashValidator`, this decorator sets the ``ETag`` header
+    of a successful response from a hash of its body. Then, if the
+    response has validators that match the preconditions of the
+    request, its status code is set to :http:status:`304`, so that its
+    body is not sent.
+
+    This decorator must be applied to a function that returns a
+    :class:`~flask.Response` object, so it must appear after the
+    ``mimerender`` decorator in the list of decorators of a view.
+
+    """
+    @wraps(view)
+    def new_func(*args, **kw):
+        response = view(*args, **kw)
+        if request.method not in ('GET', 'HEAD') or response.is_streamed:
+            return response
+        if response.status_code != 200:
+            return response
+        validator = request.environ.get(_VALIDATOR)
+        if validator is not None and validator.hash_body:
+            response.add_etag()
+        if 'ETag' in response.headers or 'Last-Modified' in response.headers:
+            response.make_conditional(request)
+        return response
+    return new_func
+
+
+def create_validator(validator=None):
+    """Returns an instance of :class:`Validator`, or ``None`` if
+    responses should not have validators.
+
+    If `validator` is ``None``, this returns ``None``. If it is the
+    string ``'hash'``, this returns a :class:`BodyHashValidator`. If it
+    is any other string, this returns a :class:`ColumnValidator` for
+    the column with that name. If `validator` is already an instance of
+    :class:`Validator`, it is returned unchanged.
+
+    """
+    if validator is None or isinstance(validator, Validator):
+        return validator
+    if validator == 'hash':
+        return BodyHashValidator()
+    return ColumnValidator(validator)
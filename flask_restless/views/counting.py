@@ -0,0 +1,246 @@
+# counting.py - strategies for counting the resources in a collection
+#
+# Copyright 2011 Lincoln de Sousa <lincoln@comum.org>.
+# Copyright 2012, 2013, 2014, 2015, 2016 Jeffrey Finkelstein
+#           <jeffrey.finkelstein@gmail.com> and contributors.
+#
+# This file is part of Flask-Restless.
+#
+# Flask-Restless is distributed under both the GNU Affero General Public
+# License version 3 and under the 3-clause BSD license. For more
+# information, see LICENSE.AGPL and LICENSE.BSD.
+"""Strategies for determining the total number of resources in a
+collection.
+
+A :class:`CountStrategy` is used by the views created by
+:class:`~flask_restless.APIManager` to determine the total number of
+resources in a paginated collection, which appears as the ``total``
+element of the ``meta`` object and determines the ``last`` pagination
+link. The default, :class:`ExactCount`, issues a ``COUNT`` query for
+each request. The other strategies avoid that query, either by not
+counting at all, by asking the database for an estimate, or by reusing
+a recent count.
+
+The :func:`create_count_strategy` function returns an instance of a
+strategy given its name.
+
+"""
+import json
+import time
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement
+from sqlalchemy.sql.expression import Executable
+from sqlalchemy.sql.expression import func
+
+from ..helpers import LRUCache
+from .helpers import count
+
+
+class CountStrategy(object):
+    """Determines the number of resources in a collection.
+
+    **This is a base class with no implementation.**
+
+    """
+
+    def count(self, session, query):
+        """Returns the number of rows in the result of `query`, a
+        SQLAlchemy query executed in `session`, or ``None`` if the
+        number should not be reported to the client.
+
+        **This method is not implemented in this base class; subclasses
+        must override this method.**
+
+        """
+        raise NotImplementedError
+
+
+class ExactCount(CountStrategy):
+    """A strategy that counts the rows of the query exactly, with one
+    ``COUNT`` query for each request.
+
+    """
+
+    def count(self, session, query):
+        return count(session, query)
+
+
+def supports_window_functions(dialect):
+    """Returns ``True`` if and only if the database described by the
+    SQLAlchemy `dialect` supports window functions, as in ``COUNT(*)
+    OVER ()``.
+
+    """
+    if dialect.name == 'sqlite':
+        return dialect.dbapi.sqlite_version_info >= (3, 25)
+    if dialect.name == 'mysql':
+        version = dialect.server_version_info or ()
+        if getattr(dialect, '_is_mariadb', False):
+            return version >= (10, 2)
+        return version >= (8, )
+    return dialect.name in ('mssql', 'oracle', 'postgresql')
+
+
+class WindowCount(ExactCount):
+    """A strategy that counts the rows of the query exactly in the same
+    query that fetches a page of rows, by selecting ``COUNT(*) OVER ()``
+    alongside each row.
+
+    This saves a round trip to the database for each request for a page
+    of a collection. If the database does not support window functions
+    or if the requested page is empty (for example, if the page number
+    is beyond the last page), the rows are counted with a separate
+    ``COUNT`` query, as in :class:`ExactCount`.
+
+    """
+
+    def fetch_page(self, session, query, limit, offset):
+        """Returns a pair whose left element is the list of rows of
+        `query` in the page defined by `limit` and `offset` and whose
+        right element is the number of rows in the complete result of
+        `query`.
+
+        If the database does not support window functions, this method
+        returns ``None`` instead, and the caller must fetch the page and
+        count the rows separately.
+
+        """
+        if not supports_window_functions(session.get_bind().dialect):
+            return None
+        total = func.count().over()
+        rows = query.add_columns(total).limit(limit).offset(offset).all()
+        # If the page is empty, there is no row from which to read the
+        # count.
+        if not rows:
+            return [], self.count(session, query)
+        return [row[0] for row in rows], rows[0][-1]
+
+
+class NoCount(CountStrategy):
+    """A strategy that does not count the resources in a collection.
+
+    With this strategy, responses have no ``total`` element in the
+    ``meta`` object and no ``last`` pagination link.
+
+    """
+
+    def count(self, session, query):
+        return None
+
+
+class Explain(Executable, ClauseElement):
+    """A SQL ``EXPLAIN`` statement for the given SELECT statement.
+
+    On PostgreSQL, the statement requests the query plan in JSON format.
+
+    """
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return 'EXPLAIN {0}'.format(compiler.process(element.statement, **kw))
+
+
+@compiles(Explain, 'postgresql')
+def _compile_explain_postgresql(element, compiler, **kw):
+    statement = compiler.process(element.statement, **kw)
+    return 'EXPLAIN (FORMAT JSON) {0}'.format(statement)
+
+
+class EstimatedCount(CountStrategy):
+    """A strategy that uses the estimate of the number of rows made by
+    the query planner of the database.
+
+    The estimate is read from the output of ``EXPLAIN`` on PostgreSQL
+    and MySQL. The estimate may be far from the actual number of rows,
+    especially if the statistics of the database are out of date. On
+    other databases, like SQLite, which provide no such estimate, this
+    strategy counts the rows exactly.
+
+    """
+
+    def count(self, session, query):
+        statement = query.order_by(None).statement
+        dialect = session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            plan = session.execute(Explain(statement)).scalar()
+            # Depending on the driver, the plan may not have been
+            # decoded from JSON.
+            if not isinstance(plan, list):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+        if dialect == 'mysql':
+            row = session.execute(Explain(statement)).first()
+            if row is not None and row['rows'] is not None:
+                return int(row['rows'])
+        return count(session, query)
+
+
+class CachedCount(CountStrategy):
+    """A strategy that remembers the number of rows of each query for
+    `timeout` seconds.
+
+    Counts are keyed by the SQL of the query and the values of its
+    parameters, so requests with equivalent filters share a count
+    regardless of how the filters were written in the request. The
+    count may therefore be out of date by up to `timeout` seconds.
+
+    `strategy` is the :class:`CountStrategy` used to count the rows of
+    queries that are not in the cache; by default, this is
+    :class:`ExactCount`. `maxsize` is the maximum number of counts kept
+    in the cache.
+
+    """
+
+    def __init__(self, timeout=60, strategy=None, maxsize=1024):
+        self.timeout = timeout
+        self.strategy = ExactCount() if strategy is None else strategy
+        self._cache = LRUCache(maxsize=maxsize)
+
+    def count(self, session, query):
+        compiled = query.order_by(None).statement.compile()
+        params = sorted(compiled.params.items())
+        key = (str(compiled), repr(params))
+        now = time.time()
+        cached = self._cache.get(key)
+        if cached is not None and now - cached[1] < self.timeout:
+            return cached[0]
+        num_results = self.strategy.count(session, query)
+        self._cache[key] = (num_results, now)
+        return num_results
+
+
+#: Count strategy classes keyed by name, as accepted by
+#: :func:`create_count_strategy`.
+COUNT_STRATEGIES = {
+    'cached': CachedCount,
+    'estimated': EstimatedCount,
+    'exact': ExactCount,
+    'none': NoCount,
+    'window': WindowCount,
+}
+
+
+def create_count_strategy(strategy=None):
+    """Returns an instance of :class:`CountStrategy`.
+
+    If `strategy` is ``None`` or ``'exact'``, this returns an instance
+    of :class:`ExactCount`. If `strategy` is a string naming one of the
+    :data:`COUNT_STRATEGIES`, this returns an instance of that strategy
+    with its default settings. If `strategy` is already an instance of
+    :class:`CountStrategy`, it is returned unchanged.
+
+    In any other case, this function raises :exc:`ValueError`.
+
+    """
+    if strategy is None:
+        return ExactCount()
+    if isinstance(strategy, CountStrategy):
+        return strategy
+    if strategy not in COUNT_STRATEGIES:
+        raise ValueError('unknown count strategy "{0}"'.format(strategy))
+    return COUNT_STRATEGIES[strategy]()
@@ -10,9 +10,27 @@
 # License version 3 and under the 3-clause BSD license. For more
 # information, see LICENSE.AGPL and LICENSE.BSD.
 """Helper functions for view classes."""
+from flask import current_app
+from itsdangerous import BadSignature
+from itsdangerous import URLSafeSerializer
+from sqlalchemy import and_
+from sqlalchemy import or_
 from sqlalchemy.inspection import inspect as sqlalchemy_inspect
 from sqlalchemy.sql import func
 
+#: The salt used to sign pagination cursors, so that signatures created
+#: with the secret key of the application for other purposes are not
+#: valid cursors.
+CURSOR_SALT = 'flask-restless-cursor'
+
+
+class MissingSecretKey(RuntimeError):
+    """Raised when a pagination cursor is signed or verified in a Flask
+    application that does not have a secret key.
+
+    """
+    pass
+
 
 def upper_keys(dictionary):
     """Returns a new dictionary with the keys of ``dictionary``
@@ -41,6 +59,131 @@ def count(session, query):
     return num_results
 
 
+def _cursor_serializer():
+    """Returns the serializer used to sign and verify pagination
+    cursors with the secret key of the current Flask application.
+
+    This function raises :exc:`MissingSecretKey` if the application
+    does not have a secret key.
+
+    """
+    secret_key = current_app.secret_key
+    if not secret_key:
+        raise MissingSecretKey('cursor pagination requires the secret key'
+                               ' of the Flask application to be set')
+    return URLSafeSerializer(secret_key, salt=CURSOR_SALT)
+
+
+def encode_cursor(data):
+    """Returns an opaque, signed, URL-safe string representing `data`.
+
+    `data` must be serializable as JSON. The original data can be
+    recovered from the returned string with :func:`decode_cursor`.
+
+    """
+    return _cursor_serializer().dumps(data)
+
+
+def decode_cursor(cursor):
+    """Returns the data represented by a string returned by
+    :func:`encode_cursor`.
+
+    This function raises :exc:`ValueError` if `cursor` was not created
+    by :func:`encode_cursor` with the secret key of the current
+    application (for example, if a client has modified it).
+
+    """
+    try:
+        return _cursor_serializer().loads(cursor)
+    except BadSignature:
+        raise ValueError('invalid cursor')
+
+
+def _is_nullable(field):
+    """Returns ``False`` if and only if the attribute `field` of a model
+    is certain never to be ``NULL``.
+
+    """
+    columns = getattr(getattr(field, 'property', None), 'columns', None)
+    if not columns:
+        return True
+    return any(getattr(column, 'nullable', True) for column in columns)
+
+
+def keyset_order(model, keys, reverse=False):
+    """Returns a list of SQLAlchemy ordering expressions for the sort
+    keys `keys` on `model`.
+
+    `keys` is a list of pairs of the form ``(direction, fieldname)``, as
+    the `sort` argument to :func:`~flask_restless.search.search`, except
+    that each field must be an attribute of `model` itself.
+
+    If `reverse` is ``True``, the direction of each sort key is
+    reversed.
+
+    ``NULL`` is ordered after every other value of a field in ascending
+    order, and before every other value in descending order, on every
+    database, as expected by :func:`seek_predicate`.
+
+    """
+    result = []
+    for symbol, fieldname in keys:
+        field = getattr(model, fieldname)
+        ascending = (symbol == '+') != reverse
+        # Databases disagree on where NULL goes, and not all of them
+        # support NULLS FIRST and NULLS LAST, so order by whether the
+        # field is NULL first.
+        if _is_nullable(field):
+            isnull = field.is_(None)
+            result.append(isnull.asc() if ascending else isnull.desc())
+        result.append(field.asc() if ascending else field.desc())
+    return result
+
+
+def seek_predicate(model, keys, values, reverse=False):
+    """Returns a SQLAlchemy expression that selects only the rows that
+    come strictly after a given row in the order defined by the sort
+    keys `keys`.
+
+    `keys` is as in :func:`keyset_order` and `values` is the list of
+    values of those sort keys for the given row. If `reverse` is
+    ``True``, the expression selects the rows that come strictly before
+    the given row instead.
+
+    For example, if `keys` is ``[('+', 'name'), ('-', 'id')]`` and
+    `values` is ``['Jo', 5]``, the expression is equivalent to::
+
+        (name > 'Jo') OR (name = 'Jo' AND id < 5)
+
+    Using this expression instead of an offset allows the database to
+    seek directly to the requested page by way of an index on the sort
+    keys.
+
+    ``NULL`` is treated as greater than every other value of a field, as
+    in the order returned by :func:`keyset_order`.
+
+    """
+    clauses = []
+    equalities = []
+    for (symbol, fieldname), value in zip(keys, values):
+        field = getattr(model, fieldname)
+        ascending = (symbol == '+') != reverse
+        if value is None:
+            # No value comes after NULL in ascending order, and every
+            # value that is not NULL comes after it in descending order.
+            comparison = None if ascending else field.isnot(None)
+            equality = field.is_(None)
+        else:
+            comparison = field > value if ascending else field < value
+            if ascending and _is_nullable(field):
+                comparison = or_(comparison, field.is_(None))
+            equality = field == value
+        if comparison is not None:
+            clauses.append(and_(*(equalities + [comparison])))
+        equalities.append(equality)
+    return or_(*clauses)
+
+
 def changes_on_update(model):
     """Returns a best guess at whether the specified SQLAlchemy model class is
     modified on updates.
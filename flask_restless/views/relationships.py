@@ -16,7 +16,6 @@ The main class in this module, :class:`RelationshipAPI`, is a
 relationships according to the JSON API specification.
 
 """
-from flask import json
 from flask import request
 from werkzeug.exceptions import BadRequest
 
@@ -122,7 +121,7 @@ class RelationshipAPI(APIBase):
         """
         # try to load the fields/values to update from the body of the request
         try:
-            data = json.loads(request.get_data()) or {}
+            data = self.json_codec.loads(request.get_data()) or {}
         except (BadRequest, TypeError, ValueError, OverflowError) as exception:
             # this also happens when request.data is empty
             detail = 'Unable to decode data'
@@ -200,7 +199,7 @@ class RelationshipAPI(APIBase):
         """
         # try to load the fields/values to update from the body of the request
         try:
-            data = json.loads(request.get_data()) or {}
+            data = self.json_codec.loads(request.get_data()) or {}
         except (BadRequest, TypeError, ValueError, OverflowError) as exception:
             # this also happens when request.data is empty
             detail = 'Unable to decode data'
@@ -327,7 +326,7 @@ class RelationshipAPI(APIBase):
             return error_response(403, detail=detail)
         # try to load the fields/values to update from the body of the request
         try:
-            data = json.loads(request.get_data()) or {}
+            data = self.json_codec.loads(request.get_data()) or {}
         except (BadRequest, TypeError, ValueError, OverflowError) as exception:
             # this also happens when request.data is empty
             detail = 'Unable to decode data'
@@ -0,0 +1,251 @@
+# timing.py - measuring the time spent in each phase of a request
+#
+# Copyright 2011 Lincoln de Sousa <lincoln@comum.org>.
+# Copyright 2012, 2013, 2014, 2015, 2016 Jeffrey Finkelstein
+#           <jeffrey.finkelstein@gmail.com> and contributors.
+#
+# This file is part of Flask-Restless.
+#
+# Flask-Restless is distributed under both the GNU Affero General Public
+# License version 3 and under the 3-clause BSD license. For more
+# information, see LICENSE.AGPL and LICENSE.BSD.
+"""Measuring the time spent in each phase of handling a request.
+
+A :class:`Timing` object is used by the views created by
+:class:`~flask_restless.APIManager` to create a :class:`Timer` for each
+request, which accumulates the time spent in each phase of handling the
+request, like building the search query, counting the resources,
+serializing them, and encoding the response. When the response is
+ready, the durations are reported in the ``Server-Timing`` header of
+the response and passed to the callbacks of the :class:`Timing` object.
+
+When timing is disabled, each phase is measured by the shared
+:data:`NULL_TIMER`, which does nothing.
+
+The :func:`create_timing` function returns an instance of
+:class:`Timing` given the value of the ``timing`` keyword argument to
+:meth:`~flask_restless.APIManager.create_api`.
+
+"""
+from collections import OrderedDict
+from functools import wraps
+from timeit import default_timer
+
+from flask import request
+
+#: The key in the WSGI environment of the request under which a view
+#: stores the :class:`Timer` of the request, so that the functions and
+#: decorators outside of the view can read it.
+_TIMER = 'flask_restless.timer'
+
+
+class _Phase(object):
+    """Context manager that adds the time spent in its block to the
+    duration of the phase named `name` of `timer`.
+
+    """
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = default_timer()
+
+    def __exit__(self, *exc_info):
+        durations = self.timer.durations
+        elapsed = default_timer() - self.start
+        durations[self.name] = durations.get(self.name, 0) + elapsed
+
+
+class _NullPhase(object):
+    """Context manager that does nothing."""
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class NullTimer(object):
+    """A timer that measures nothing, used when timing is disabled."""
+
+    _phase = _NullPhase()
+
+    def phase(self, name):
+        """Returns a context manager that does nothing."""
+        return self._phase
+
+    def finish(self, response):
+        """Does nothing."""
+        pass
+
+
+#: The timer used by every request when timing is disabled.
+NULL_TIMER = NullTimer()
+
+
+class Timer(object):
+    """Accumulates the time spent in each phase of handling the current
+    request, as configured by `timing`, an instance of :class:`Timing`.
+
+    The timer starts when it is created.
+
+    """
+
+    def __init__(self, timing):
+        self.timing = timing
+
+        #: Maps the name of each phase to the total number of seconds
+        #: spent in that phase so far, in the order in which the phases
+        #: began.
+        self.durations = OrderedDict()
+
+        self.start = default_timer()
+
+    def phase(self, name):
+        """Returns a context manager that adds the time spent in its
+        block to the duration of the phase named `name`.
+
+        A phase may be entered more than once, in which case its
+        durations are summed.
+
+        """
+        return _Phase(self, name)
+
+    def finish(self, response):
+        """Records the total duration of the request and reports the
+        durations of its phases for `response`, the
+        :class:`~flask.Response` to the request.
+
+        """
+        durations = self.durations
+        durations['total'] = default_timer() - self.start
+        if self.timing.header:
+            response.headers['Server-Timing'] = server_timing(durations)
+        for callback in self.timing.callbacks:
+            callback(durations)
+
+
+def server_timing(durations):
+    """Returns the value of the ``Server-Timing`` header that reports
+    `durations`, a mapping from the name of a phase to its duration in
+    seconds.
+
+    """
+    return ', '.join('{0};dur={1:.3f}'.format(name, seconds * 1000)
+                     for name, seconds in durations.items())
+
+
+class Timing(object):
+    """Configures the measurement of the time spent in each phase of
+    handling a request.
+
+    If `header` is ``True``, the durations of the phases are reported in
+    the ``Server-Timing`` header of each response, in milliseconds.
+
+    `callbacks` is an iterable of functions, each of which is called
+    after each request with a single positional argument, an ordered
+    dictionary mapping the name of each phase of the request to the
+    number of seconds spent in it. The request is still available as
+    :data:`flask.request` when the callbacks are called.
+
+    """
+
+    def __init__(self, header=True, callbacks=None):
+        #: Whether responses have a ``Server-Timing`` header.
+        self.header = header
+
+        #: The list of functions called with the durations of the phases
+        #: of each request.
+        self.callbacks = list(callbacks or ())
+
+    def connect(self, callback):
+        """Calls `callback` with the durations of the phases of each
+        request, as described in the documentation of this class.
+
+        """
+        self.callbacks.append(callback)
+
+    def timer(self):
+        """Returns a new :class:`Timer` for the current request."""
+        return Timer(self)
+
+
+def current_timer():
+    """Returns the timer of the current request."""
+    return request.environ.get(_TIMER, NULL_TIMER)
+
+
+def timed(name):
+    """Decorator that adds the time spent in the decorated function to
+    the duration of the phase named `name` of the timer of the current
+    request.
+
+    """
+    def decorator(func):
+        @wraps(func)
+        def new_func(*args, **kw):
+            with current_timer().phase(name):
+                return func(*args, **kw)
+        return new_func
+    return decorator
+
+
+def timed_processors(processors, name, timer):
+    """Returns a copy of `processors`, a mapping from processor type to
+    list of preprocessors or postprocessors, in which the time spent in
+    each processor is added to the duration of the phase named `name` of
+    `timer`.
+
+    """
+    def wrap(processor):
+        @wraps(processor)
+        def new_processor(*args, **kw):
+            with timer.phase(name):
+                return processor(*args, **kw)
+        return new_processor
+
+    result = processors.copy()
+    for key, value in processors.items():
+        result[key] = [wrap(processor) for processor in value]
+    return result
+
+
+def record_timing(view):
+    """Decorator that reports the durations of the phases of the request
+    handled by `view` once its response is ready.
+
+    This decorator must be applied to a function that returns a
+    :class:`~flask.Response` object, so it must appear after the
+    ``mimerender`` decorator in the list of decorators of a view.
+
+    """
+    @wraps(view)
+    def new_func(*args, **kw):
+        response = view(*args, **kw)
+        current_timer().finish(response)
+        return response
+    return new_func
+
+
+def create_timing(timing=None):
+    """Returns an instance of :class:`Timing`, or ``None`` if requests
+    should not be timed.
+
+    If `timing` is ``None`` or ``False``, this returns ``None``. If it is
+    ``True``, this returns a :class:`Timing` with the default settings.
+    If it is a dictionary, this returns a :class:`Timing` created with
+    the items of the dictionary as keyword arguments. If it is already
+    an instance of :class:`Timing`, it is returned unchanged.
+
+    """
+    if timing is None or timing is False:
+        return None
+    if timing is True:
+        return Timing()
+    if isinstance(timing, dict):
+        return Timing(**timing)
+    return timing
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    benchmark-finders
+    ~~~~~~~~~~~~~~~~~
+
+    Measures the time taken by the helper functions that find the API
+    created for a model, :func:`flask_restless.collection_name`,
+    :func:`flask_restless.model_for`,
+    :func:`flask_restless.serializer_for`, and
+    :func:`flask_restless.url_for`, with one
+    :class:`flask_restless.APIManager` and with several, each of which
+    has created an API for one model.
+
+    Run it from the root of the repository::
+
+        PYTHONPATH=. python scripts/benchmark-finders.py
+
+    :copyright: 2016 Jeffrey Finkelstein and contributors.
+    :license: GNU AGPLv3+ or BSD
+"""
+from timeit import repeat
+
+from flask import Flask
+from sqlalchemy import Column
+from sqlalchemy import create_engine
+from sqlalchemy import Integer
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import scoped_session
+from sqlalchemy.orm import sessionmaker
+
+from flask_restless import APIManager
+from flask_restless import collection_name
+from flask_restless import model_for
+from flask_restless import serializer_for
+from flask_restless import url_for
+
+#: The numbers of managers, each with an API for one model.
+NUM_MANAGERS = (1, 10)
+
+#: The number of calls to each function in each measurement.
+NUMBER = 20000
+
+#: The number of measurements; the best one is reported.
+REPEAT = 3
+
+
+def create_apis(num_managers):
+    """Returns a Flask application and the list of models for which
+    `num_managers` managers, one per model, have created APIs.
+
+    """
+    app = Flask(__name__)
+    engine = create_engine('sqlite://')
+    session = scoped_session(sessionmaker(bind=engine))
+    Base = declarative_base()
+    models = []
+    for i in range(num_managers):
+        name = 'model{0}'.format(i)
+        attrs = dict(__tablename__=name, id=Column(Integer, primary_key=True))
+        model = type(name, (Base, ), attrs)
+        manager = APIManager(app, session=session)
+        manager.create_api(model, url_prefix='/api{0}'.format(i))
+        models.append(model)
+    return app, models
+
+
+def best_time(func, *args):
+    """Returns the least number of microseconds taken by a call to
+    ``func(*args)`` in :data:`REPEAT` measurements.
+
+    """
+    times = repeat(lambda: func(*args), number=NUMBER, repeat=REPEAT)
+    return min(times) / NUMBER * 1e6
+
+
+def main():
+    results = {}
+    for num_managers in NUM_MANAGERS:
+        app, models = create_apis(num_managers)
+        model = models[0]
+        with app.test_request_context():
+            results[num_managers] = [
+                ('collection_name', best_time(collection_name, model)),
+                ('model_for', best_time(model_for, 'model0')),
+                ('serializer_for', best_time(serializer_for, model)),
+                ('url_for', best_time(url_for, model)),
+            ]
+    print('microseconds per call, best of {0}'.format(REPEAT))
+    header = ['finder'] + ['{0} manager(s)'.format(n) for n in NUM_MANAGERS]
+    print('{0:<16}'.format(header[0]) +
+          ''.join('{0:>16}'.format(h) for h in header[1:]))
+    for i, (name, _) in enumerate(results[NUM_MANAGERS[0]]):
+        times = (results[n][i][1] for n in NUM_MANAGERS)
+        print('{0:<16}'.format(name) +
+              ''.join('{0:>16.2f}'.format(t) for t in times))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    benchmark-in-list
+    ~~~~~~~~~~~~~~~~~
+
+    Measures the time taken by a query with an ``in`` filter on the
+    primary key of a table, with each value of the list sent as a
+    separate parameter and with the whole list sent as a single
+    parameter, as chosen by the ``in_list_threshold`` keyword argument
+    to :meth:`flask_restless.APIManager.create_api`.
+
+    Run it from the root of the repository with the URL of an empty
+    database, which defaults to an in-memory SQLite database::
+
+        export PYTHONPATH=.
+        python scripts/benchmark-in-list.py
+        python scripts/benchmark-in-list.py postgresql://localhost/bench
+
+    The script creates and drops a table named ``benchmark_in_list``.
+
+    :copyright: 2016 Jeffrey Finkelstein and contributors.
+    :license: GNU AGPLv3+ or BSD
+"""
+import sys
+from timeit import default_timer
+
+from sqlalchemy import Column
+from sqlalchemy import create_engine
+from sqlalchemy import Integer
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from flask_restless.search import create_filters
+
+#: The number of rows in the table.
+NUM_ROWS = 50000
+
+#: The numbers of values in the lists of the ``in`` filters.
+LIST_SIZES = (100, 1000, 5000, 20000)
+
+#: The number of times each query is run; the best time is reported.
+REPEAT = 5
+
+Base = declarative_base()
+
+
+class Row(Base):
+    __tablename__ = 'benchmark_in_list'
+    id = Column(Integer, primary_key=True)
+
+
+def best_time(session, filters, threshold):
+    """Returns the least number of seconds taken to run the query with
+    the given filters in :data:`REPEAT` attempts.
+
+    """
+    times = []
+    for i in range(REPEAT):
+        start = default_timer()
+        expressions = create_filters(Row, filters,
+                                     in_list_threshold=threshold)
+        session.query(Row).filter(*expressions).all()
+        times.append(default_timer() - start)
+    return min(times)
+
+
+def main(url):
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        session.bulk_insert_mappings(Row, [dict(id=i)
+                                           for i in range(1, NUM_ROWS + 1)])
+        session.commit()
+        print('{0} ({1} rows, best of {2})'.format(engine.dialect.name,
+                                                   NUM_ROWS, REPEAT))
+        print('{0:>8} {1:>14} {2:>14}'.format('values', 'per-value ms',
+                                              'single ms'))
+        for size in LIST_SIZES:
+            # The values are strings, as in the ``filter[id]`` parameter.
+            ids = [str(i) for i in range(2, 2 * size + 2, 2)]
+            filters = [dict(name='id', op='in', val=ids)]
+            per_value = best_time(session, filters, None)
+            single = best_time(session, filters, 0)
+            print('{0:>8} {1:>14.1f} {2:>14.1f}'.format(size,
+                                                        per_value * 1000,
+                                                        single * 1000))
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'sqlite://')
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    benchmark-include
+    ~~~~~~~~~~~~~~~~~
+
+    Measures the time taken by a request for one page of a collection,
+    with and without included resources, as the number of rows in the
+    table grows.
+
+    Since the resources to include are computed from the page being
+    returned, not from the whole collection, the cost of the ``include``
+    query parameter should not grow with the size of the table.
+
+    Run it from the root of the repository::
+
+        PYTHONPATH=. python scripts/benchmark-include.py
+
+    :copyright: 2016 Jeffrey Finkelstein and contributors.
+    :license: GNU AGPLv3+ or BSD
+"""
+from timeit import default_timer
+
+from flask import Flask
+from sqlalchemy import Column
+from sqlalchemy import create_engine
+from sqlalchemy import ForeignKey
+from sqlalchemy import Integer
+from sqlalchemy import Unicode
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
+from sqlalchemy.orm import scoped_session
+from sqlalchemy.orm import sessionmaker
+
+from flask_restless import APIManager
+
+#: The numbers of rows in the table of articles.
+TABLE_SIZES = (100, 1000, 10000, 50000)
+
+#: The number of articles on the requested page.
+PAGE_SIZE = 10
+
+#: The number of times each request is made; the best time is reported.
+REPEAT = 10
+
+Base = declarative_base()
+
+
+class Person(Base):
+    __tablename__ = 'person'
+    id = Column(Integer, primary_key=True)
+    name = Column(Unicode)
+
+
+class Article(Base):
+    __tablename__ = 'article'
+    id = Column(Integer, primary_key=True)
+    title = Column(Unicode)
+    author_id = Column(Integer, ForeignKey('person.id'))
+    author = relationship(Person)
+
+
+def add_rows(session, start, stop):
+    """Adds the articles with primary keys from `start` up to but not
+    including `stop`, each by a different person.
+
+    """
+    rows = range(start, stop)
+    session.bulk_insert_mappings(Person, [dict(id=i, name=u'person')
+                                          for i in rows])
+    session.bulk_insert_mappings(Article, [dict(id=i, title=u'article',
+                                                author_id=i)
+                                           for i in rows])
+    session.commit()
+
+
+def best_time(client, query_string):
+    """Returns the least number of milliseconds taken by a request for
+    the collection of articles in :data:`REPEAT` attempts.
+
+    """
+    times = []
+    for i in range(REPEAT):
+        start = default_timer()
+        response = client.get('/api/article', query_string=query_string)
+        times.append(default_timer() - start)
+        assert response.status_code == 200
+    return min(times) * 1000
+
+
+def main():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = scoped_session(sessionmaker(bind=engine))
+    app = Flask(__name__)
+    manager = APIManager(app, session=session)
+    manager.create_api(Person)
+    manager.create_api(Article)
+    client = app.test_client()
+    page = {'page[size]': PAGE_SIZE}
+    print('milliseconds per request for a page of {0}, best of {1}'.format(
+        PAGE_SIZE, REPEAT))
+    print('{0:>8} {1:>12} {2:>12} {3:>12}'.format('rows', 'no include',
+                                                  'include', 'difference'))
+    num_rows = 0
+    for size in TABLE_SIZES:
+        add_rows(session, num_rows + 1, size + 1)
+        num_rows = size
+        without = best_time(client, page)
+        with_include = best_time(client, dict(page, include='author'))
+        print('{0:>8} {1:>12.2f} {2:>12.2f} {3:>12.2f}'.format(
+            num_rows, without, with_include, with_include - without))
+    session.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    benchmark-serialization
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    Measures the time taken by
+    :meth:`flask_restless.DefaultSerializer.serialize_many` to serialize
+    a page of instances, with the serialization plans computed by
+    :meth:`flask_restless.DefaultSerializer._compile` cached, and with
+    the plan computed again for each instance, as before the plans were
+    cached.
+
+    Run it from the root of the repository::
+
+        PYTHONPATH=. python scripts/benchmark-serialization.py
+
+    :copyright: 2016 Jeffrey Finkelstein and contributors.
+    :license: GNU AGPLv3+ or BSD
+"""
+from datetime import datetime
+from timeit import repeat
+
+from flask import Flask
+from sqlalchemy import Column
+from sqlalchemy import create_engine
+from sqlalchemy import DateTime
+from sqlalchemy import ForeignKey
+from sqlalchemy import Integer
+from sqlalchemy import Unicode
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import relationship
+from sqlalchemy.orm import scoped_session
+from sqlalchemy.orm import sessionmaker
+
+from flask_restless import APIManager
+from flask_restless import serializer_for
+from flask_restless.helpers import LRUCache
+
+#: The numbers of instances serialized in each measurement.
+PAGE_SIZES = (10, 100, 1000)
+
+#: The number of serializations in each measurement.
+NUMBER = 20
+
+#: The number of measurements; the best one is reported.
+REPEAT = 3
+
+Base = declarative_base()
+
+
+class Person(Base):
+    __tablename__ = 'person'
+    id = Column(Integer, primary_key=True)
+    name = Column(Unicode)
+    email = Column(Unicode)
+    age = Column(Integer)
+    created = Column(DateTime)
+
+    @hybrid_property
+    def is_adult(self):
+        return self.age >= 18
+
+
+class Article(Base):
+    __tablename__ = 'article'
+    id = Column(Integer, primary_key=True)
+    title = Column(Unicode)
+    author_id = Column(Integer, ForeignKey('person.id'))
+    author = relationship(Person)
+
+
+def create_app(session):
+    """Returns a Flask application with APIs for the models."""
+    app = Flask(__name__)
+    manager = APIManager(app, session=session)
+    manager.create_api(Person)
+    manager.create_api(Article)
+    return app
+
+
+def best_time(serializer, instances):
+    """Returns the least number of milliseconds taken to serialize
+    `instances` in :data:`REPEAT` measurements.
+
+    """
+    # The views pass the sparse fieldsets requested by the client, if
+    # any, as a dictionary.
+    times = repeat(lambda: serializer.serialize_many(instances, only={}),
+                   number=NUMBER, repeat=REPEAT)
+    return min(times) / NUMBER * 1000
+
+
+def main():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = scoped_session(sessionmaker(bind=engine))
+    size = max(PAGE_SIZES)
+    now = datetime.now()
+    people = [Person(id=i, name=u'person{0}'.format(i),
+                     email=u'person{0}@example.com'.format(i), age=i % 90,
+                     created=now)
+              for i in range(1, size + 1)]
+    articles = [Article(id=i, title=u'article{0}'.format(i), author=person)
+                for i, person in enumerate(people, 1)]
+    session.add_all(people + articles)
+    session.commit()
+    app = create_app(session)
+    print('milliseconds per page, best of {0}'.format(REPEAT))
+    print('{0:<10} {1:>8} {2:>14} {3:>14}'.format('model', 'page',
+                                                  'plan per row',
+                                                  'cached plan'))
+    with app.test_request_context():
+        for model in (Person, Article):
+            serializer = serializer_for(model)
+            plans = serializer._plans
+            instances = session.query(model).order_by(model.id).all()
+            for page_size in PAGE_SIZES:
+                page = instances[:page_size]
+                # A cache that keeps no entries computes the plan again
+                # for each instance, as the serializer did before.
+                serializer._plans = LRUCache(maxsize=0)
+                uncached = best_time(serializer, page)
+                serializer._plans = plans
+                cached = best_time(serializer, page)
+                print('{0:<10} {1:>8} {2:>14.2f} {3:>14.2f}'.format(
+                    model.__name__, page_size, uncached, cached))
+    session.remove()
+
+
+if __name__ == '__main__':
+    main()
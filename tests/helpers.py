@@ -10,6 +10,7 @@
 # License version 3 and under the 3-clause BSD license. For more
 # information, see LICENSE.AGPL and LICENSE.BSD.
 """Helper functions for unit tests."""
+from contextlib import contextmanager
 from datetime import date
 from datetime import datetime
 from datetime import time
@@ -190,6 +191,31 @@ def check_sole_error(response, status, strings):
     assert all(s in error['detail'] for s in strings)
 
 
+@contextmanager
+def count_queries(engine):
+    """Context manager that records the SQL statements executed by
+    `engine` within the body of the ``with`` statement.
+
+    The context manager yields a list, to which each SQL statement is
+    appended as it is executed::
+
+        with count_queries(engine) as statements:
+            session.query(Person).all()
+        assert len(statements) == 1
+
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
 def force_content_type_jsonapi(test_client):
     """Ensures that all requests made by the specified Flask test client
     that include data have the correct :http:header:`Content-Type`
@@ -373,6 +399,7 @@ class SQLAlchemyTestBase(FlaskTestBase, DatabaseMixin):
         """
         super(SQLAlchemyTestBase, self).setUp()
         engine = create_engine(self.database_uri(), convert_unicode=True)
+        self.engine = engine
         self.Session = sessionmaker(autocommit=False, autoflush=False,
                                     bind=engine)
         self.session = scoped_session(self.Session)
@@ -42,6 +42,7 @@ from flask_restless import CONTENT_TYPE
 from flask_restless import DefaultDeserializer
 from flask_restless import DefaultSerializer
 from flask_restless import ProcessingException
+from flask_restless.helpers import model_metadata
 
 from .helpers import BetterJSONEncoder as JSONEncoder
 from .helpers import check_sole_error
@@ -303,6 +304,19 @@ class TestCreating(ManagerTestBase):
         assert response.status_code == 400
         # TODO check error message here
 
+    def test_nonexistent_attribute_not_remembered(self):
+        """Tests that the names of nonexistent attributes provided by
+        clients are not remembered in the metadata of the model.
+
+        """
+        for i in range(10):
+            attributes = {'bogus{0}'.format(i): 0}
+            data = dict(data=dict(type='person', attributes=attributes))
+            response = self.app.post('/api/person', data=dumps(data))
+            assert response.status_code == 400
+        fields = model_metadata(self.Person).fields
+        assert not any(name.startswith('bogus') for name in fields)
+
     def test_nonexistent_relationship(self):
         """Tests that the server rejects an attempt to create a resource
         with a relationship that does not exist in the resource.
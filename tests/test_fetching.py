@@ -18,23 +18,42 @@ Flask-Restless meets the minimum requirements of the JSON API
 specification.
 
 """
+from datetime import datetime
+from datetime import timedelta
 from itertools import product
 from operator import itemgetter
 from unittest2 import skip
 
+from flask import request
 from sqlalchemy import Column
+from sqlalchemy import DateTime
 from sqlalchemy import ForeignKey
 from sqlalchemy import Integer
+from sqlalchemy import Table
 from sqlalchemy import Unicode
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import backref
+from sqlalchemy.orm import Query
 from sqlalchemy.orm import relationship
 
 from flask_restless import APIManager
+from flask_restless import CONTENT_TYPE
+from flask_restless import CountStrategy
 from flask_restless import DefaultSerializer
+from flask_restless import IllegalArgumentError
 from flask_restless import ProcessingException
+from flask_restless import QueryCache
+from flask_restless import ResponseCache
+from flask_restless import Timing
+from flask_restless.views.base import _JSON_CODEC
+from flask_restless.views.caching import _DOCUMENT
+from flask_restless.views.caching import InMemoryQueryCache
+from flask_restless.views.conditional import _VALIDATOR
+from flask_restless.views.counting import CachedCount
+from flask_restless.views.timing import _TIMER
 
 from .helpers import check_sole_error
+from .helpers import count_queries
 from .helpers import dumps
 from .helpers import FlaskSQLAlchemyTestBase
 from .helpers import loads
@@ -280,6 +299,42 @@ class TestFetchCollection(ManagerTestBase):
         assert base_url in pagination['last']
         assert 'foo=bar' in pagination['last']
 
+    def test_include_only_page(self):
+        """Tests that only resources related to the primary resources on
+        the requested page are included in a compound document, and
+        that computing them does not depend on the number of resources
+        in the collection.
+
+        """
+        query_string = {'include': 'author', 'page[size]': 2, 'sort': 'id'}
+
+        def add_articles(start, stop):
+            for i in range(start, stop):
+                person = self.Person(id=i)
+                article = self.Article(id=i, author=person)
+                self.session.add_all([person, article])
+            self.session.commit()
+            self.session.expunge_all()
+
+        def fetch():
+            with count_queries(self.engine) as statements:
+                response = self.app.get('/api/article',
+                                        query_string=query_string)
+            return loads(response.data), statements
+
+        add_articles(1, 5)
+        document, statements1 = fetch()
+        self.assertEqual(['1', '2'], [a['id'] for a in document['data']])
+        included = document['included']
+        self.assertEqual(['1', '2'], sorted(p['id'] for p in included))
+        self.assertTrue(all(p['type'] == 'person' for p in included))
+        add_articles(5, 101)
+        document, statements2 = fetch()
+        self.assertEqual(['1', '2'], [a['id'] for a in document['data']])
+        included = document['included']
+        self.assertEqual(['1', '2'], sorted(p['id'] for p in included))
+        self.assertEqual(len(statements1), len(statements2))
+
     def test_sorting_null_field(self):
         """Tests that sorting by a nullable field causes resources with
         a null attribute value to appear first.
@@ -496,6 +551,34 @@ class TestFetchRelation(ManagerTestBase):
         assert base_url in pagination['next']
         assert 'page[number]=4' in pagination['next']
 
+    def test_to_many_not_loaded(self):
+        """Tests that fetching a page of a to-many relation selects the
+        related resources by their foreign key in the database, instead of
+        loading the whole relationship.
+
+        """
+        person = self.Person(id=1)
+        articles = [self.Article(id=i) for i in range(10)]
+        person.articles = articles
+        self.session.add(person)
+        self.session.add_all(articles)
+        self.session.commit()
+        params = {'page[number]': 2, 'page[size]': 3}
+        with count_queries(self.engine) as statements:
+            response = self.app.get('/api/person/1/articles',
+                                    query_string=params)
+        document = loads(response.data)
+        assert ['3', '4', '5'] == [article['id']
+                                   for article in document['data']]
+        assert document['meta']['total'] == 10
+        statements = [' '.join(s.split()) for s in statements]
+        article_queries = [s for s in statements if 'FROM article' in s]
+        # There should be one query for the page and one for the count,
+        # both restricted by the foreign key to the person.
+        assert len(article_queries) == 2
+        assert all('article.author_id' in s for s in article_queries)
+        assert not any(' IN (' in s for s in article_queries)
+
     def test_to_many_sorting(self):
         """Tests for sorting a to-many relation."""
         person = self.Person(id=1)
@@ -1546,6 +1629,1276 @@ class TestDynamicRelationships(ManagerTestBase):
         assert all(article['type'] == 'article' for article in articles)
 
 
+class TestStreaming(ManagerTestBase):
+    """Tests for streaming responses to requests for all resources in a
+    collection.
+
+    """
+
+    def setUp(self):
+        super(TestStreaming, self).setUp()
+
+        class Article(self.Base):
+            __tablename__ = 'article'
+            id = Column(Integer, primary_key=True)
+            title = Column(Unicode)
+            author_id = Column(Integer, ForeignKey('person.id'))
+            author = relationship('Person', backref=backref('articles'))
+
+        class Person(self.Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+
+        self.Article = Article
+        self.Person = Person
+        self.Base.metadata.create_all()
+        self.manager.create_api(Article, streaming=True)
+        self.manager.create_api(Person, streaming=True)
+
+    def test_streaming(self):
+        """Tests that all resources are streamed when the client
+        requests a page size of zero.
+
+        """
+        people = [self.Person(id=i, name=u'{0}'.format(i))
+                  for i in range(1, 251)]
+        self.session.add_all(people)
+        self.session.commit()
+        query_string = {'page[size]': 0, 'fields[person]': 'name'}
+        response = self.app.get('/api/person', query_string=query_string)
+        self.assertEqual(response.status_code, 200)
+        # A streamed response has no predetermined length.
+        self.assertNotIn('Content-Length', response.headers)
+        self.assertNotIn('Link', response.headers)
+        document = loads(response.data)
+        people = document['data']
+        self.assertEqual(len(people), 250)
+        self.assertEqual([p['id'] for p in people],
+                         [str(i) for i in range(1, 251)])
+        self.assertTrue(all(p['attributes'] == {'name': p['id']}
+                            for p in people))
+        self.assertEqual(document['meta']['total'], 250)
+        self.assertEqual(document['links']['self'], '/api/person')
+        self.assertEqual(document['included'], [])
+
+    def test_empty_collection(self):
+        """Tests for streaming an empty collection."""
+        query_string = {'page[size]': 0}
+        response = self.app.get('/api/person', query_string=query_string)
+        self.assertEqual(response.status_code, 200)
+        document = loads(response.data)
+        self.assertEqual(document['data'], [])
+        self.assertEqual(document['meta']['total'], 0)
+
+    def test_to_many_relation(self):
+        """Tests for streaming the resources in a to-many relation."""
+        person = self.Person(id=1)
+        articles = [self.Article(id=i, author=person) for i in range(1, 151)]
+        self.session.add_all([person] + articles)
+        self.session.commit()
+        query_string = {'page[size]': 0}
+        response = self.app.get('/api/person/1/articles',
+                                query_string=query_string)
+        self.assertNotIn('Content-Length', response.headers)
+        document = loads(response.data)
+        articles = document['data']
+        self.assertEqual(len(articles), 150)
+        self.assertTrue(all(a['type'] == 'article' for a in articles))
+        self.assertEqual(document['meta']['total'], 150)
+
+    def test_joined_collection(self):
+        """Tests for streaming resources whose to-many relationship is
+        eagerly loaded with a join, which prevents loading the resources
+        from a single query in batches.
+
+        """
+
+        class Comment(self.Base):
+            __tablename__ = 'comment'
+            id = Column(Integer, primary_key=True)
+            author_id = Column(Integer, ForeignKey('person.id'))
+            author = relationship('Person',
+                                  backref=backref('comments', lazy='joined'))
+
+        self.Base.metadata.create_all()
+        self.manager.create_api(Comment)
+        people = [self.Person(id=i) for i in range(1, 251)]
+        comments = [Comment(id=i, author=people[i // 2])
+                    for i in range(1, 301)]
+        self.session.add_all(people + comments)
+        self.session.commit()
+        query_string = {'page[size]': 0, 'sort': '-id'}
+        response = self.app.get('/api/person', query_string=query_string)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Length', response.headers)
+        document = loads(response.data)
+        people = document['data']
+        self.assertEqual([p['id'] for p in people],
+                         [str(i) for i in range(250, 0, -1)])
+        comments = [len(p['relationships']['comments']['data'])
+                    for p in people]
+        self.assertEqual(sum(comments), 300)
+        self.assertEqual(document['meta']['total'], 250)
+
+    def test_paginated_not_streamed(self):
+        """Tests that a response to a request for a single page of
+        resources is not streamed.
+
+        """
+        self.session.add_all([self.Person(id=i) for i in range(1, 4)])
+        self.session.commit()
+        response = self.app.get('/api/person')
+        self.assertIn('Content-Length', response.headers)
+        document = loads(response.data)
+        self.assertEqual(len(document['data']), 3)
+
+    def test_include_not_streamed(self):
+        """Tests that a response including related resources is not
+        streamed.
+
+        """
+        person = self.Person(id=1)
+        article = self.Article(id=1, author=person)
+        self.session.add_all([person, article])
+        self.session.commit()
+        query_string = {'page[size]': 0, 'include': 'author'}
+        response = self.app.get('/api/article', query_string=query_string)
+        self.assertIn('Content-Length', response.headers)
+        document = loads(response.data)
+        self.assertEqual(len(document['data']), 1)
+        self.assertEqual(document['included'][0]['id'], '1')
+
+
+class TestCursorPagination(ManagerTestBase):
+    """Tests for paginating collections by cursor instead of by page
+    number.
+
+    """
+
+    def setUp(self):
+        super(TestCursorPagination, self).setUp()
+
+        class Person(self.Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+            birthday = Column(DateTime)
+
+        self.Person = Person
+        self.Base.metadata.create_all()
+        self.flaskapp.secret_key = 'secret'
+        self.manager.create_api(Person, page_size=3, cursor_pagination=True)
+
+    def walk(self, url, rel='next'):
+        """Follows the pagination links of type `rel` starting from
+        `url` and returns the list of the IDs of the resources on each
+        page.
+
+        """
+        pages = []
+        while url is not None:
+            response = self.app.get(url)
+            self.assertEqual(response.status_code, 200)
+            document = loads(response.data)
+            pages.append([person['id'] for person in document['data']])
+            url = document['links'][rel]
+        return pages
+
+    def test_next_links(self):
+        """Tests that following the next links visits each resource
+        exactly once, in order.
+
+        """
+        self.session.add_all([self.Person(id=i) for i in range(1, 8)])
+        self.session.commit()
+        response = self.app.get('/api/person')
+        document = loads(response.data)
+        links = document['links']
+        self.assertIsNone(links['prev'])
+        self.assertIn('page[after]=', links['next'])
+        self.assertEqual(document['meta']['total'], 7)
+        pages = self.walk('/api/person')
+        self.assertEqual(pages, [['1', '2', '3'], ['4', '5', '6'], ['7']])
+
+    def test_prev_links(self):
+        """Tests that following the prev links from the last page
+        visits each resource exactly once, in order.
+
+        """
+        self.session.add_all([self.Person(id=i) for i in range(1, 8)])
+        self.session.commit()
+        response = self.app.get('/api/person')
+        document = loads(response.data)
+        last = document['links']['last']
+        pages = self.walk(last, rel='prev')
+        self.assertEqual(pages, [['5', '6', '7'], ['2', '3', '4'], ['1']])
+        # The last page has no next page.
+        response = self.app.get(last)
+        document = loads(response.data)
+        self.assertIsNone(document['links']['next'])
+
+    def test_sort_tiebreaker(self):
+        """Tests that the primary key breaks ties between resources with
+        equal values of the sort fields.
+
+        """
+        names = [u'b', u'a', u'b', u'b', u'a', u'c', u'b']
+        people = [self.Person(id=i, name=name)
+                  for i, name in enumerate(names, start=1)]
+        self.session.add_all(people)
+        self.session.commit()
+        pages = self.walk('/api/person?sort=-name')
+        self.assertEqual(pages, [['6', '1', '3'], ['4', '7', '2'], ['5']])
+
+    def test_null_sort(self):
+        """Tests that walking the pages of a collection sorted by a
+        nullable field visits every resource, with the resources whose
+        field is ``NULL`` last in ascending order and first in
+        descending order.
+
+        """
+        names = [u'a', None, u'b', None, u'c', u'd']
+        people = [self.Person(id=i, name=name)
+                  for i, name in enumerate(names, start=1)]
+        self.session.add_all(people)
+        self.session.commit()
+        pages = self.walk('/api/person?sort=name&page[size]=2')
+        self.assertEqual(pages, [['1', '3'], ['5', '6'], ['2', '4']])
+        pages = self.walk('/api/person?sort=-name&page[size]=2')
+        self.assertEqual(pages, [['2', '4'], ['6', '5'], ['3', '1']])
+        # The same pages are visited backward from the last page.
+        response = self.app.get('/api/person?sort=name&page[size]=2')
+        last = loads(response.data)['links']['last']
+        pages = self.walk(last, rel='prev')
+        self.assertEqual(pages, [['2', '4'], ['5', '6'], ['1', '3']])
+
+    def test_datetime_sort(self):
+        """Tests for cursors on a date and time sort field."""
+        start = datetime(1900, 1, 1)
+        people = [self.Person(id=i, birthday=start + timedelta(days=i % 4))
+                  for i in range(1, 8)]
+        self.session.add_all(people)
+        self.session.commit()
+        pages = self.walk('/api/person?sort=birthday')
+        self.assertEqual(pages, [['4', '1', '5'], ['2', '6', '3'], ['7']])
+
+    def test_seek_instead_of_offset(self):
+        """Tests that a page after a cursor is selected by comparing the
+        sort fields with the values in the cursor.
+
+        """
+        self.session.add_all([self.Person(id=i) for i in range(1, 8)])
+        self.session.commit()
+        response = self.app.get('/api/person')
+        next_ = loads(response.data)['links']['next']
+        with count_queries(self.engine) as statements:
+            response = self.app.get(next_)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('person.id > ?' in s for s in statements))
+
+    def test_page_number(self):
+        """Tests that a client can still request a page by number."""
+        self.session.add_all([self.Person(id=i) for i in range(1, 8)])
+        self.session.commit()
+        query_string = {'page[number]': 2}
+        response = self.app.get('/api/person', query_string=query_string)
+        document = loads(response.data)
+        self.assertEqual(['4', '5', '6'], [p['id'] for p in document['data']])
+        self.assertIn('page[number]=3', document['links']['next'])
+
+    def test_modified_cursor(self):
+        """Tests that a cursor modified by the client is rejected."""
+        self.session.add_all([self.Person(id=i) for i in range(1, 8)])
+        self.session.commit()
+        response = self.app.get('/api/person')
+        next_ = loads(response.data)['links']['next']
+        response = self.app.get(next_ + 'x')
+        check_sole_error(response, 400, ['Invalid cursor'])
+
+    def test_cursor_other_sort(self):
+        """Tests that a cursor is rejected if the client changes the
+        sort order.
+
+        """
+        self.session.add_all([self.Person(id=i) for i in range(1, 8)])
+        self.session.commit()
+        response = self.app.get('/api/person')
+        next_ = loads(response.data)['links']['next']
+        response = self.app.get(next_ + '&sort=name')
+        check_sole_error(response, 400, ['Cursor', 'sort order'])
+
+    def test_missing_secret_key(self):
+        """Tests that cursor pagination cannot be enabled on an
+        application without a secret key, and that a secret key removed
+        later causes an error response instead of an exception.
+
+        """
+        self.flaskapp.secret_key = None
+        with self.assertRaises(IllegalArgumentError):
+            self.manager.create_api(self.Person, collection_name='people',
+                                    cursor_pagination=True)
+        self.session.add_all([self.Person(id=i) for i in range(1, 8)])
+        self.session.commit()
+        response = self.app.get('/api/person')
+        check_sole_error(response, 500, ['secret key'])
+
+    def test_group_by(self):
+        """Tests that grouping cannot be used with cursor pagination."""
+        query_string = {'group': 'name'}
+        response = self.app.get('/api/person', query_string=query_string)
+        check_sole_error(response, 400, ['cursor', 'grouping'])
+
+
+class TestCountStrategies(ManagerTestBase):
+    """Tests for strategies that determine the total number of resources
+    in a collection.
+
+    """
+
+    def setUp(self):
+        super(TestCountStrategies, self).setUp()
+
+        class Person(self.Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            age = Column(Integer)
+
+        self.Person = Person
+        self.Base.metadata.create_all()
+        self.session.add_all([Person(id=i, age=i % 2) for i in range(1, 6)])
+        self.session.commit()
+
+    def fetch(self, **query_string):
+        """Fetches the collection of people and returns the response
+        document along with the list of SQL statements executed.
+
+        """
+        with count_queries(self.engine) as statements:
+            response = self.app.get('/api/person', query_string=query_string)
+        self.assertEqual(response.status_code, 200)
+        count_statements = [s for s in statements if 'count(' in s]
+        return loads(response.data), count_statements
+
+    def test_exact(self):
+        """Tests that resources are counted exactly by default."""
+        self.manager.create_api(self.Person, page_size=2)
+        document, count_statements = self.fetch()
+        self.assertEqual(document['meta']['total'], 5)
+        self.assertIn('page[number]=3', document['links']['last'])
+        self.assertEqual(len(count_statements), 1)
+
+    def test_none(self):
+        """Tests that resources are not counted with the ``'none'``
+        strategy.
+
+        """
+        self.manager.create_api(self.Person, page_size=2,
+                                count_strategy='none')
+        document, count_statements = self.fetch()
+        self.assertEqual(count_statements, [])
+        self.assertNotIn('total', document['meta'])
+        links = document['links']
+        self.assertIsNone(links['last'])
+        self.assertIn('page[number]=2', links['next'])
+        self.assertEqual(['1', '2'], [p['id'] for p in document['data']])
+        document, count_statements = self.fetch(**{'page[number]': 3})
+        self.assertEqual(['5'], [p['id'] for p in document['data']])
+        self.assertIsNone(document['links']['next'])
+        self.assertIn('page[number]=2', document['links']['prev'])
+
+    def test_client_opt_out(self):
+        """Tests that a client can request that the resources not be
+        counted.
+
+        """
+        self.manager.create_api(self.Person, page_size=2)
+        document, count_statements = self.fetch(**{'page[count]': 'false'})
+        self.assertEqual(count_statements, [])
+        self.assertNotIn('total', document['meta'])
+        # The request to not count resources is preserved in the links.
+        self.assertIn('page[count]=false', document['links']['next'])
+
+    def test_estimated(self):
+        """Tests that the estimated count falls back to an exact count
+        on SQLite.
+
+        """
+        self.manager.create_api(self.Person, count_strategy='estimated')
+        document, count_statements = self.fetch()
+        self.assertEqual(document['meta']['total'], 5)
+
+    def test_window(self):
+        """Tests that the resources are counted in the same query that
+        fetches the page with the ``'window'`` strategy.
+
+        """
+        self.manager.create_api(self.Person, page_size=2,
+                                count_strategy='window')
+        document, count_statements = self.fetch(**{'page[number]': 2})
+        self.assertEqual(len(count_statements), 1)
+        self.assertIn('OVER ()', count_statements[0])
+        self.assertIn('LIMIT', count_statements[0])
+        self.assertEqual(document['meta']['total'], 5)
+        self.assertEqual(['3', '4'], [p['id'] for p in document['data']])
+        self.assertIn('page[number]=3', document['links']['last'])
+        # An empty page has no row from which to read the count, so the
+        # resources are counted separately.
+        document, count_statements = self.fetch(**{'page[number]': 4})
+        self.assertEqual(len(count_statements), 2)
+        self.assertEqual(document['meta']['total'], 5)
+        self.assertEqual(document['data'], [])
+
+    def test_cached(self):
+        """Tests that counts are reused for equivalent filters until
+        they expire.
+
+        """
+        strategy = CachedCount(timeout=60)
+        self.manager.create_api(self.Person, count_strategy=strategy)
+        filters = dumps([{'name': 'age', 'op': 'eq', 'val': 1}])
+        document, count_statements = self.fetch(**{'filter[objects]': filters})
+        self.assertEqual(document['meta']['total'], 3)
+        self.assertEqual(len(count_statements), 1)
+        self.session.add(self.Person(id=6, age=1))
+        self.session.commit()
+        # The same filters, written differently, reuse the cached count.
+        filters2 = dumps([{'name': 'age', 'op': '==', 'val': 1}])
+        query_string = {'filter[objects]': filters2}
+        document, count_statements = self.fetch(**query_string)
+        self.assertEqual(document['meta']['total'], 3)
+        self.assertEqual(count_statements, [])
+        # Different filters are counted separately.
+        document, count_statements = self.fetch()
+        self.assertEqual(document['meta']['total'], 6)
+        self.assertEqual(len(count_statements), 1)
+        # Once the cached count expires, it is recomputed.
+        strategy.timeout = 0
+        document, count_statements = self.fetch(**{'filter[objects]': filters})
+        self.assertEqual(document['meta']['total'], 4)
+        self.assertEqual(len(count_statements), 1)
+
+    def test_custom(self):
+        """Tests for a user-defined count strategy."""
+
+        class FortyTwo(CountStrategy):
+            def count(self, session, query):
+                return 42
+
+        self.manager.create_api(self.Person, count_strategy=FortyTwo())
+        document, count_statements = self.fetch()
+        self.assertEqual(document['meta']['total'], 42)
+
+    def test_unknown(self):
+        """Tests that an unknown count strategy raises an exception."""
+        with self.assertRaises(ValueError):
+            self.manager.create_api(self.Person, count_strategy='bogus')
+
+
+class TestRelatedFields(ManagerTestBase):
+    """Tests for sorting and grouping by fields of related resources
+    named by dotted field names.
+
+    """
+
+    def setUp(self):
+        super(TestRelatedFields, self).setUp()
+
+        class Company(self.Base):
+            __tablename__ = 'company'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+
+        class Person(self.Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+            company_id = Column(Integer, ForeignKey('company.id'))
+            company = relationship(Company)
+
+        class Article(self.Base):
+            __tablename__ = 'article'
+            id = Column(Integer, primary_key=True)
+            author_id = Column(Integer, ForeignKey('person.id'))
+            author = relationship(Person)
+
+        class Comment(self.Base):
+            __tablename__ = 'comment'
+            id = Column(Integer, primary_key=True)
+            article_id = Column(Integer, ForeignKey('article.id'),
+                                nullable=False)
+            article = relationship(Article)
+
+        self.Article = Article
+        self.Comment = Comment
+        self.Company = Company
+        self.Person = Person
+        self.Base.metadata.create_all()
+        self.manager.create_api(Article)
+        self.manager.create_api(Comment)
+        self.manager.create_api(Company)
+        self.manager.create_api(Person)
+
+    def fetch(self, url, **query_string):
+        """Fetches `url` and returns the response document along with the
+        SQL statement that selected the primary data.
+
+        """
+        with count_queries(self.engine) as statements:
+            response = self.app.get(url, query_string=query_string)
+        assert response.status_code == 200
+        statements = [' '.join(s.split()) for s in statements
+                      if 'count(' not in s]
+        return loads(response.data), statements[0]
+
+    def test_sort_multiple_hops(self):
+        """Tests for sorting by a field of a resource related by two
+        relationships, keeping the resources whose relationships are
+        empty.
+
+        """
+        company1 = self.Company(id=1, name=u'b')
+        company2 = self.Company(id=2, name=u'a')
+        person1 = self.Person(id=1, company=company1)
+        person2 = self.Person(id=2, company=company2)
+        person3 = self.Person(id=3)
+        self.session.add_all([company1, company2, person1, person2, person3])
+        self.session.add_all([self.Article(id=1, author=person1),
+                              self.Article(id=2, author=person2),
+                              self.Article(id=3, author=person3),
+                              self.Article(id=4)])
+        self.session.commit()
+        document, statement = self.fetch('/api/article',
+                                         sort='-author.company.name,id')
+        articles = [article['id'] for article in document['data']]
+        assert articles == ['1', '2', '3', '4']
+        assert statement.count('LEFT OUTER JOIN') == 2
+
+    def test_one_join_per_path(self):
+        """Tests that a relationship used by several sort fields, grouping
+        fields, and filters is joined only once.
+
+        """
+        person = self.Person(id=1, name=u'foo')
+        self.session.add_all([person, self.Article(id=1, author=person)])
+        self.session.commit()
+        filters = [{'name': 'author.name', 'op': 'eq', 'val': 'foo'}]
+        document, statement = self.fetch('/api/article',
+                                         sort='author.name,author.id',
+                                         group='author.name,author.id',
+                                         **{'filter[objects]': dumps(filters)})
+        assert ['1'] == [article['id'] for article in document['data']]
+        assert statement.count('JOIN person') == 1
+
+    def test_inner_join(self):
+        """Tests that a many-to-one relationship with a non-nullable foreign
+        key is joined with an inner join, and that the relationships after
+        an outer join are joined with outer joins too.
+
+        """
+        article = self.Article(id=1)
+        self.session.add_all([article, self.Comment(id=1, article=article)])
+        self.session.commit()
+        document, statement = self.fetch('/api/comment', sort='article.id')
+        assert ['1'] == [comment['id'] for comment in document['data']]
+        assert 'JOIN article' in statement
+        assert 'OUTER' not in statement
+        document, statement = self.fetch('/api/comment',
+                                         sort='article.author.company.name')
+        assert ['1'] == [comment['id'] for comment in document['data']]
+        assert 'LEFT OUTER JOIN article' not in statement
+        assert statement.count('LEFT OUTER JOIN') == 2
+
+
+class TestQueryCache(ManagerTestBase):
+    """Tests for caching the results of the queries that fetch
+    collections of resources.
+
+    """
+
+    def setUp(self):
+        super(TestQueryCache, self).setUp()
+
+        person_tag = Table('person_tag', self.Base.metadata,
+                           Column('person_id', Integer,
+                                  ForeignKey('person.id')),
+                           Column('tag_id', Integer, ForeignKey('tag.id')))
+
+        class Tag(self.Base):
+            __tablename__ = 'tag'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+
+        class Person(self.Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+            tags = relationship(Tag, secondary=person_tag)
+
+        class Article(self.Base):
+            __tablename__ = 'article'
+            id = Column(Integer, primary_key=True)
+            title = Column(Unicode)
+            author_id = Column(Integer, ForeignKey('person.id'))
+            author = relationship(Person, backref=backref('articles'))
+
+        self.Article = Article
+        self.Person = Person
+        self.Tag = Tag
+        self.Base.metadata.create_all()
+        self.session.add_all([Article(id=i, title=u'{0}'.format(i))
+                              for i in range(1, 4)])
+        self.session.commit()
+
+    def fetch(self, url, **query_string):
+        """Fetches `url` and returns the response document along with the
+        list of SQL statements executed.
+
+        """
+        with count_queries(self.engine) as statements:
+            response = self.app.get(url, query_string=query_string)
+        self.assertEqual(response.status_code, 200)
+        return loads(response.data), statements
+
+    def test_repeated_request(self):
+        """Tests that a repeated request for a page of a collection is
+        answered without querying the database.
+
+        """
+        self.manager.create_api(self.Article, page_size=2, query_cache=True)
+        document, statements = self.fetch('/api/article')
+        self.assertEqual(len(statements), 2)
+        # The cached instances are merged into the new session.
+        self.session.remove()
+        document, statements = self.fetch('/api/article')
+        self.assertEqual(statements, [])
+        self.assertEqual(['1', '2'], [a['id'] for a in document['data']])
+        self.assertEqual(document['meta']['total'], 3)
+        self.assertEqual(document['data'][0]['attributes']['title'], u'1')
+        # A different page is a different query.
+        document, statements = self.fetch('/api/article',
+                                          **{'page[number]': 2})
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(['3'], [a['id'] for a in document['data']])
+
+    def test_invalidated_by_write(self):
+        """Tests that changes committed to a table invalidate the cached
+        results of queries that read that table.
+
+        """
+        self.manager.create_api(self.Article, methods=['GET', 'POST'],
+                                query_cache=True)
+        self.manager.create_api(self.Tag, query_cache=True)
+        self.fetch('/api/article')
+        self.fetch('/api/tag')
+        data = dict(data=dict(type='article', attributes=dict(title=u'4')))
+        response = self.app.post('/api/article', data=dumps(data))
+        self.assertEqual(response.status_code, 201)
+        document, statements = self.fetch('/api/article')
+        self.assertEqual(len(document['data']), 4)
+        # Queries on unrelated tables are still cached.
+        document, statements = self.fetch('/api/tag')
+        self.assertEqual(statements, [])
+        # Writes made directly in the session invalidate the cache too.
+        article = self.session.query(self.Article).get(1)
+        article.title = u'foo'
+        self.session.commit()
+        document, statements = self.fetch('/api/article')
+        self.assertEqual(document['data'][0]['attributes']['title'], u'foo')
+
+    def test_invalidated_by_included(self):
+        """Tests that changes committed to the table of an included
+        resource invalidate the cached results, since the relationships
+        loaded onto the cached instances would otherwise be served again.
+
+        """
+        self.manager.create_api(self.Article, query_cache=True)
+        self.manager.create_api(self.Person, methods=['GET', 'PATCH'])
+        person = self.Person(id=1, name=u'a')
+        person.articles = [self.session.query(self.Article).get(1)]
+        self.session.add(person)
+        self.session.commit()
+        document, statements = self.fetch('/api/article', include='author')
+        self.assertEqual(document['included'][0]['attributes']['name'], u'a')
+        # End the session of each request, as Flask-SQLAlchemy does, so
+        # that the cached instances are not updated by the next request.
+        self.session.remove()
+        data = dict(data=dict(type='person', id='1',
+                              attributes=dict(name=u'b')))
+        response = self.app.patch('/api/person/1', data=dumps(data))
+        self.assertEqual(response.status_code, 204)
+        self.session.remove()
+        document, statements = self.fetch('/api/article', include='author')
+        self.assertEqual(document['included'][0]['attributes']['name'], u'b')
+
+    def test_to_many_relation(self):
+        """Tests that requests for a to-many relation are cached and
+        invalidated by changes to the related table.
+
+        """
+        self.manager.create_api(self.Person, query_cache=True)
+        self.manager.create_api(self.Article)
+        person = self.Person(id=1)
+        person.articles = [self.session.query(self.Article).get(1)]
+        self.session.add(person)
+        self.session.commit()
+        document, statements = self.fetch('/api/person/1/articles')
+        self.assertEqual(['1'], [a['id'] for a in document['data']])
+        document, statements = self.fetch('/api/person/1/articles')
+        self.assertFalse(any('FROM article' in s for s in statements))
+        self.session.query(self.Article).get(2).author = person
+        self.session.commit()
+        document, statements = self.fetch('/api/person/1/articles')
+        self.assertEqual(['1', '2'], sorted(a['id'] for a in document['data']))
+
+    def test_custom_backend(self):
+        """Tests for a user-defined cache backend, and that changes to a
+        many-to-many relationship invalidate its association table.
+
+        """
+
+        class DictCache(QueryCache):
+
+            def __init__(self):
+                self.data = {}
+                self.invalidated = []
+
+            def get(self, key):
+                return self.data.get(key)
+
+            def set(self, key, value, tables):
+                self.data[key] = value
+
+            def invalidate(self, tables):
+                self.invalidated.append(tables)
+
+            def clear(self):
+                self.data.clear()
+
+        cache = DictCache()
+        self.manager.create_api(self.Person, query_cache=cache)
+        self.session.add_all([self.Person(id=1), self.Tag(id=1)])
+        self.session.commit()
+        self.fetch('/api/person')
+        self.assertEqual(len(cache.data), 2)
+        person = self.session.query(self.Person).get(1)
+        person.tags.append(self.session.query(self.Tag).get(1))
+        self.session.commit()
+        self.assertIn('person_tag', cache.invalidated[-1])
+
+    def test_write_during_query(self):
+        """Tests that the result of a query is not cached if changes to
+        the tables it reads are committed while the query runs, since the
+        result may have been read before the changes.
+
+        """
+        cache = InMemoryQueryCache()
+        cache.attach(self.session)
+
+        def write(article_id):
+            # This simulates a commit made by another thread.
+            self.session.add(self.Article(id=article_id))
+            self.session.commit()
+
+        class InterleavedQuery(Query):
+
+            def all(self):
+                rows = super(InterleavedQuery, self).all()
+                write(4)
+                return rows
+
+        query = InterleavedQuery(self.Article, session=self.session())
+        self.assertEqual(len(cache.fetch_all(query)), 3)
+        self.assertEqual(len(cache), 0)
+        query = self.session.query(self.Article)
+        self.assertEqual(len(cache.fetch_all(query)), 4)
+        self.assertEqual(len(cache), 1)
+
+        def interleaved_count(query):
+            num_results = query.count()
+            write(5)
+            return num_results
+
+        self.assertEqual(cache.fetch_count(query, interleaved_count), 4)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.fetch_count(query, Query.count), 5)
+        self.assertEqual(cache.fetch_count(query, interleaved_count), 5)
+
+
+class TestConditionalRequests(ManagerTestBase):
+    """Tests for validators that allow clients to make conditional
+    requests.
+
+    """
+
+    def setUp(self):
+        super(TestConditionalRequests, self).setUp()
+
+        class Person(self.Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+            updated_at = Column(DateTime)
+
+        class Article(self.Base):
+            __tablename__ = 'article'
+            id = Column(Integer, primary_key=True)
+            version = Column(Integer)
+
+        self.Article = Article
+        self.Person = Person
+        self.Base.metadata.create_all()
+        self.updated_at = datetime(2016, 1, 2, 3, 4, 5)
+        self.session.add_all([Person(id=i, updated_at=self.updated_at)
+                              for i in range(1, 4)])
+        self.session.add_all([Article(id=i, version=1) for i in range(1, 4)])
+        self.session.commit()
+
+    def fetch(self, url, headers=None, **query_string):
+        """Fetches `url` with the given request headers and returns the
+        response along with the list of SQL statements executed.
+
+        """
+        with count_queries(self.engine) as statements:
+            response = self.app.get(url, headers=headers,
+                                    query_string=query_string)
+        return response, statements
+
+    def test_no_validator(self):
+        """Tests that responses have no validators by default."""
+        self.manager.create_api(self.Person)
+        response, statements = self.fetch('/api/person/1')
+        self.assertNotIn('ETag', response.headers)
+        self.assertNotIn('Last-Modified', response.headers)
+
+    def test_environ_only_when_enabled(self):
+        """Tests that the validator, the timer, and the JSON codec are
+        stored in the WSGI environment of a request only for APIs that
+        use them.
+
+        """
+        environs = []
+
+        @self.flaskapp.after_request
+        def record_environ(response):
+            environs.append(dict(request.environ))
+            return response
+
+        self.manager.create_api(self.Person)
+        self.manager.create_api(self.Article, validator='hash', timing=True)
+        self.fetch('/api/person')
+        self.fetch('/api/article')
+        person_environ, article_environ = environs
+        for key in (_VALIDATOR, _TIMER, _JSON_CODEC):
+            self.assertNotIn(key, person_environ)
+        self.assertIn(_VALIDATOR, article_environ)
+        self.assertIn(_TIMER, article_environ)
+
+    def test_body_hash(self):
+        """Tests that the entity tag can be computed from the body of the
+        response.
+
+        """
+        self.manager.create_api(self.Person, validator='hash')
+        response, statements = self.fetch('/api/person')
+        etag = response.headers['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        headers = {'If-None-Match': etag}
+        response, statements = self.fetch('/api/person', headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['ETag'], etag)
+        self.session.query(self.Person).get(1).name = u'foo'
+        self.session.commit()
+        response, statements = self.fetch('/api/person', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_resource_column(self):
+        """Tests that the validators of a resource are computed from the
+        modification time column before the resource is serialized.
+
+        """
+        self.manager.create_api(self.Person, validator='updated_at')
+        response, statements = self.fetch('/api/person/1')
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        last_modified = response.headers['Last-Modified']
+        self.assertEqual(last_modified, 'Sat, 02 Jan 2016 03:04:05 GMT')
+        # The representation depends on the query parameters.
+        response, statements = self.fetch('/api/person/1',
+                                          **{'fields[person]': 'name'})
+        self.assertNotEqual(response.headers['ETag'], etag)
+        headers = {'If-None-Match': etag}
+        response, statements = self.fetch('/api/person/1', headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        headers = {'If-Modified-Since': last_modified}
+        response, statements = self.fetch('/api/person/1', headers=headers)
+        self.assertEqual(response.status_code, 304)
+        person = self.session.query(self.Person).get(1)
+        person.updated_at = self.updated_at + timedelta(seconds=1)
+        self.session.commit()
+        response, statements = self.fetch('/api/person/1', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        headers = {'If-None-Match': etag}
+        response, statements = self.fetch('/api/person/1', headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_collection_column(self):
+        """Tests that the validators of a collection are computed with an
+        aggregate query instead of by fetching the page.
+
+        """
+        self.manager.create_api(self.Person, validator='updated_at')
+        response, statements = self.fetch('/api/person')
+        etag = response.headers['ETag']
+        headers = {'If-None-Match': etag}
+        response, statements = self.fetch('/api/person', headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(statements), 1)
+        self.assertIn('max(', statements[0])
+        # Deleting a resource changes the entity tag, even though it does
+        # not change the latest modification time.
+        self.session.delete(self.session.query(self.Person).get(3))
+        self.session.commit()
+        response, statements = self.fetch('/api/person', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(loads(response.data)['data']), 2)
+
+    def test_version_column(self):
+        """Tests that the entity tag of a collection reflects changes to
+        a version column.
+
+        """
+        self.manager.create_api(self.Article, validator='version')
+        response, statements = self.fetch('/api/article')
+        headers = {'If-None-Match': response.headers['ETag']}
+        self.assertNotIn('Last-Modified', response.headers)
+        response, statements = self.fetch('/api/article', headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.session.query(self.Article).get(2).version = 2
+        self.session.commit()
+        response, statements = self.fetch('/api/article', headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_replaced_resource(self):
+        """Tests that the entity tag of a collection changes when a
+        resource is deleted and another is created with the same version
+        or modification time.
+
+        """
+        self.manager.create_api(self.Article, validator='version')
+        self.manager.create_api(self.Person, validator='updated_at')
+        response, statements = self.fetch('/api/article')
+        article_headers = {'If-None-Match': response.headers['ETag']}
+        response, statements = self.fetch('/api/person')
+        person_headers = {'If-None-Match': response.headers['ETag']}
+        self.session.delete(self.session.query(self.Article).get(3))
+        self.session.delete(self.session.query(self.Person).get(3))
+        self.session.add(self.Article(id=4, version=1))
+        self.session.add(self.Person(id=4, updated_at=self.updated_at))
+        self.session.commit()
+        response, statements = self.fetch('/api/article',
+                                          headers=article_headers)
+        self.assertEqual(response.status_code, 200)
+        response, statements = self.fetch('/api/person',
+                                          headers=person_headers)
+        self.assertEqual(response.status_code, 200)
+
+
+class TestResponseCache(ManagerTestBase):
+    """Tests for caching the encoded responses to :http:method:`get`
+    requests.
+
+    """
+
+    def setUp(self):
+        super(TestResponseCache, self).setUp()
+
+        class Person(self.Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+
+        class Article(self.Base):
+            __tablename__ = 'article'
+            id = Column(Integer, primary_key=True)
+            title = Column(Unicode)
+            author_id = Column(Integer, ForeignKey('person.id'))
+            author = relationship(Person, backref=backref('articles'))
+
+        class Tag(self.Base):
+            __tablename__ = 'tag'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+
+        self.Article = Article
+        self.Person = Person
+        self.Tag = Tag
+        self.Base.metadata.create_all()
+        person = Person(id=1)
+        person.articles = [Article(id=1, title=u'foo')]
+        self.session.add_all([person, Tag(id=1)])
+        self.session.commit()
+
+    def fetch(self, url, headers=None, **query_string):
+        """Fetches `url` and returns the response along with the list of
+        SQL statements executed.
+
+        """
+        with count_queries(self.engine) as statements:
+            response = self.app.get(url, headers=headers,
+                                    query_string=query_string)
+        return response, statements
+
+    def test_hit(self):
+        """Tests that a repeated request is answered from the cache
+        without querying the database.
+
+        """
+        cache = ResponseCache()
+        self.manager.create_api(self.Person, response_cache=cache)
+        self.manager.create_api(self.Article)
+        response, statements = self.fetch('/api/person')
+        self.assertTrue(statements)
+        body = response.data
+        response, statements = self.fetch('/api/person')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(statements, [])
+        self.assertEqual(response.data, body)
+        self.assertEqual(response.mimetype, CONTENT_TYPE)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        # The query parameters and the Accept and Authorization headers
+        # are part of the key.
+        self.fetch('/api/person', **{'fields[person]': 'name'})
+        self.fetch('/api/person', headers={'Accept': CONTENT_TYPE})
+        self.fetch('/api/person', headers={'Authorization': 'Basic Zm9v'})
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+
+    def test_vary(self):
+        """Tests that responses can be keyed by additional headers."""
+        cache = ResponseCache(vary=['X-User'])
+        self.manager.create_api(self.Person, response_cache=cache)
+        self.manager.create_api(self.Article)
+        self.fetch('/api/person', headers={'X-User': 'foo'})
+        self.fetch('/api/person', headers={'X-User': 'bar'})
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_preprocessors(self):
+        """Tests that responses of an API with preprocessors for
+        :http:method:`get` requests are cached only if the cache allows
+        bypassing them.
+
+        """
+
+        def forbid(**kw):
+            raise ProcessingException(status=403)
+
+        preprocessors = dict(GET_COLLECTION=[forbid])
+        self.assertRaises(IllegalArgumentError, self.manager.create_api,
+                          self.Person, preprocessors=preprocessors,
+                          response_cache=True)
+        # Preprocessors for other methods do not matter.
+        self.manager.create_api(self.Tag, response_cache=True,
+                                preprocessors=dict(POST_RESOURCE=[forbid]))
+        # Preprocessors that do not authorize requests may be bypassed.
+        preprocessors = dict(GET_RESOURCE=[lambda **kw: None])
+        cache = ResponseCache(bypass_preprocessors=True)
+        self.manager.create_api(self.Person, preprocessors=preprocessors,
+                                response_cache=cache)
+        self.manager.create_api(self.Article)
+        self.fetch('/api/person/1')
+        response, statements = self.fetch('/api/person/1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(cache.hits, 1)
+
+    def test_document_stored_only_with_cache(self):
+        """Tests that the response document is kept in the WSGI
+        environment only for requests to APIs with a response cache.
+
+        """
+        environs = []
+
+        @self.flaskapp.after_request
+        def record_environ(response):
+            environs.append(dict(request.environ))
+            return response
+
+        self.manager.create_api(self.Person, response_cache=True)
+        self.manager.create_api(self.Article)
+        self.fetch('/api/person')
+        self.fetch('/api/article')
+        person_environ, article_environ = environs
+        self.assertIn(_DOCUMENT, person_environ)
+        self.assertNotIn(_DOCUMENT, article_environ)
+
+    def test_invalidated_by_included(self):
+        """Tests that a change to an included resource invalidates the
+        response, but a change to an unrelated table does not.
+
+        """
+        cache = ResponseCache()
+        self.manager.create_api(self.Person, response_cache=cache)
+        self.manager.create_api(self.Article, methods=['PATCH'])
+        self.manager.create_api(self.Tag, methods=['PATCH'])
+        self.fetch('/api/person/1', include='articles')
+        data = dict(data=dict(type='tag', id='1',
+                              attributes=dict(name=u'bar')))
+        response = self.app.patch('/api/tag/1', data=dumps(data))
+        self.assertEqual(response.status_code, 204)
+        response, statements = self.fetch('/api/person/1', include='articles')
+        self.assertEqual(statements, [])
+        data = dict(data=dict(type='article', id='1',
+                              attributes=dict(title=u'bar')))
+        response = self.app.patch('/api/article/1', data=dumps(data))
+        self.assertEqual(response.status_code, 204)
+        response, statements = self.fetch('/api/person/1', include='articles')
+        self.assertTrue(statements)
+        document = loads(response.data)
+        self.assertEqual(document['included'][0]['attributes']['title'],
+                         u'bar')
+
+    def test_invalidated_by_relationship(self):
+        """Tests that a change to a related table invalidates the cached
+        response for an empty collection.
+
+        """
+        cache = ResponseCache()
+        self.manager.create_api(self.Person, response_cache=cache)
+        self.manager.create_api(self.Article)
+        self.session.add(self.Person(id=2))
+        self.session.commit()
+        response, statements = self.fetch('/api/person/2/articles')
+        self.assertEqual(loads(response.data)['data'], [])
+        self.session.query(self.Article).get(1).author_id = 2
+        self.session.commit()
+        response, statements = self.fetch('/api/person/2/articles')
+        self.assertEqual(len(loads(response.data)['data']), 1)
+
+    def test_eviction(self):
+        """Tests that the cache is bounded by the number of responses and
+        by their total size.
+
+        """
+        cache = ResponseCache(maxsize=1)
+        small_cache = ResponseCache(maxbytes=10)
+        self.manager.create_api(self.Person, response_cache=cache)
+        self.manager.create_api(self.Article)
+        self.manager.create_api(self.Tag, response_cache=small_cache)
+        self.fetch('/api/person')
+        self.fetch('/api/person/1')
+        self.assertEqual(len(cache), 1)
+        self.fetch('/api/person')
+        self.assertEqual((cache.hits, cache.misses), (0, 3))
+        self.fetch('/api/tag')
+        self.assertEqual(len(small_cache), 0)
+        self.assertEqual(small_cache.nbytes, 0)
+
+    def test_conditional(self):
+        """Tests that a cached response is still conditional on the
+        request headers.
+
+        """
+        self.manager.create_api(self.Person, response_cache=True,
+                                validator='hash')
+        self.manager.create_api(self.Article)
+        response, statements = self.fetch('/api/person')
+        headers = {'If-None-Match': response.headers['ETag']}
+        response, statements = self.fetch('/api/person', headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(statements, [])
+
+
+class TestTiming(ManagerTestBase):
+    """Tests for measuring the time spent in each phase of a request."""
+
+    def setUp(self):
+        super(TestTiming, self).setUp()
+
+        class Person(self.Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+
+        self.Person = Person
+        self.Base.metadata.create_all()
+        self.session.add_all([Person(id=1), Person(id=2)])
+        self.session.commit()
+
+    @staticmethod
+    def phases(response):
+        """Returns the list of names of the phases in the
+        ``Server-Timing`` header of `response`.
+
+        """
+        header = response.headers['Server-Timing']
+        return [metric.split(';')[0] for metric in header.split(', ')]
+
+    def test_server_timing(self):
+        """Tests that the phases of a request for a collection are
+        reported in the ``Server-Timing`` header.
+
+        """
+        self.manager.create_api(self.Person, timing=True)
+        response = self.app.get('/api/person')
+        self.assertEqual(response.status_code, 200)
+        phases = self.phases(response)
+        for phase in ('collection_parameters', 'search', 'count',
+                      'serialize_many', 'get_all_inclusions', 'jsonpify',
+                      'total'):
+            self.assertIn(phase, phases)
+        # Each phase is reported once, even if it was entered more than
+        # once.
+        self.assertEqual(len(phases), len(set(phases)))
+
+    def test_callbacks(self):
+        """Tests that the durations of the phases, including the
+        processors, are passed to the callbacks.
+
+        """
+        def noop(**kw):
+            pass
+
+        reports = []
+        timing = Timing(header=False)
+        timing.connect(reports.append)
+        self.manager.create_api(self.Person, timing=timing,
+                                preprocessors=dict(GET_RESOURCE=[noop]),
+                                postprocessors=dict(GET_RESOURCE=[noop]))
+        response = self.app.get('/api/person/1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response.headers)
+        self.assertEqual(len(reports), 1)
+        durations = reports[0]
+        for phase in ('preprocessors', 'postprocessors', 'get_all_inclusions',
+                      'jsonpify', 'total'):
+            self.assertGreaterEqual(durations[phase], 0)
+        self.assertGreaterEqual(durations['total'], durations['jsonpify'])
+
+    def test_disabled(self):
+        """Tests that responses have no ``Server-Timing`` header by
+        default.
+
+        """
+        self.manager.create_api(self.Person)
+        response = self.app.get('/api/person')
+        self.assertNotIn('Server-Timing', response.headers)
+
+    def test_response_cache(self):
+        """Tests that the timing of a response is not repeated in the
+        responses from the response cache.
+
+        """
+        self.manager.create_api(self.Person, timing=True,
+                                response_cache=True)
+        response = self.app.get('/api/person')
+        self.assertIn('Server-Timing', response.headers)
+        response = self.app.get('/api/person')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response.headers)
+
+
 class TestAssociationProxy(ManagerTestBase):
     """Tests for getting an object with a relationship using an association
     proxy.
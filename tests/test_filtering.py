@@ -29,13 +29,26 @@ from sqlalchemy import ForeignKey
 from sqlalchemy import Integer
 from sqlalchemy import Time
 from sqlalchemy import Unicode
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.dialects.postgresql import INET
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import backref
 from sqlalchemy.orm import relationship
 from testing.postgresql import PostgresqlFactory as PGFactory
 
+from flask_restless import IllegalArgumentError
+from flask_restless.search import search_relationship
+from flask_restless.search.filters import FieldFilter
+from flask_restless.search.filters import from_dictionary
+from flask_restless.search.filters import optimize
+from flask_restless.search.filters import parse_filter
+from flask_restless import TextSearch
+from flask_restless.search.operators import IN_LIST_THRESHOLD
+
 from .helpers import check_sole_error
+from .helpers import count_queries
 from .helpers import dumps
 from .helpers import loads
 from .helpers import ManagerTestBase
@@ -532,6 +545,58 @@ class TestFiltering(SearchTestBase):
         people = document['data']
         assert ['1', '3'] == sorted(person['id'] for person in people)
 
+    def test_related_field(self):
+        """Tests for filtering by a field of a related resource named by a
+        dotted field name.
+
+        """
+        person1 = self.Person(id=1, name=u'foo', age=10)
+        person2 = self.Person(id=2, name=u'bar', age=20)
+        article1 = self.Article(id=1, author=person1)
+        article2 = self.Article(id=2, author=person2)
+        article3 = self.Article(id=3)
+        comment1 = self.Comment(id=1, article=article1, author=person2)
+        comment2 = self.Comment(id=2, article=article2, author=person2)
+        self.session.add_all([person1, person2, article1, article2, article3,
+                              comment1, comment2])
+        self.session.commit()
+        filters = [dict(name='author.name', op='eq', val='foo')]
+        response = self.search('/api/article', filters)
+        document = loads(response.data)
+        assert ['1'] == [article['id'] for article in document['data']]
+        # A resource whose relationship is empty is not removed by the
+        # join, so it matches a filter satisfied by null values.
+        filters = [dict(name='author.name', op='is_null')]
+        response = self.search('/api/article', filters)
+        document = loads(response.data)
+        assert ['3'] == [article['id'] for article in document['data']]
+        # Dotted field names may have more than one relationship and may
+        # appear on both sides of the operator.
+        filters = [dict(name='article.author.age', op='lt',
+                        field='author.age')]
+        response = self.search('/api/comment', filters)
+        document = loads(response.data)
+        assert ['1'] == [comment['id'] for comment in document['data']]
+
+    def test_related_field_to_many(self):
+        """Tests that a dotted field name with a to-many relationship causes
+        an error.
+
+        """
+        filters = [dict(name='articles.id', op='eq', val=1)]
+        response = self.search('/api/person', filters)
+        check_sole_error(response, 400, ['articles', 'to-many', 'any'])
+
+    def test_related_field_in_relationship_operator(self):
+        """Tests that a dotted field name in the argument of a relationship
+        operator causes an error.
+
+        """
+        filters = [dict(name='article', op='has',
+                        val=dict(name='author.age', op='eq', val=1))]
+        response = self.search('/api/comment', filters)
+        check_sole_error(response, 400, ['author.age', 'not allowed'])
+
     def test_date_yyyy_mm_dd(self):
         """Test for date parsing in filter objects with dates of the form
         ``1969-07-20``.
@@ -701,6 +766,46 @@ class TestFiltering(SearchTestBase):
         assert len(people) == 2
         assert ['2', '3'] == sorted(person['id'] for person in people)
 
+    def test_same_shape_different_values(self):
+        """Tests that filters that differ only in their values, including
+        date values and values in nested filters, share a parsed filter but
+        are evaluated with their own values.
+
+        """
+        person1 = self.Person(id=1, birthday=date(1990, 1, 1))
+        person2 = self.Person(id=2, birthday=date(1991, 1, 1))
+        person3 = self.Person(id=3, birthday=date(1992, 1, 1))
+        article1 = self.Article(id=1, author=person1)
+        article2 = self.Article(id=2, author=person3)
+        self.session.add_all([person1, person2, person3, article1, article2])
+        self.session.commit()
+
+        def make_filter(after, author_id):
+            return {
+                'or': [
+                    {'name': 'birthday', 'op': '>', 'val': after},
+                    {'name': 'articles', 'op': 'any',
+                     'val': {'name': 'author_id', 'op': '==',
+                             'val': author_id}}
+                ]
+            }
+
+        filter1 = make_filter('1991-6-1', 1)
+        filter2 = make_filter('1990-6-1', 3)
+        parsed1, values1 = parse_filter(self.Person, filter1)
+        parsed2, values2 = parse_filter(self.Person, filter2)
+        assert parsed1 is parsed2
+        assert values1 == ['1991-6-1', 1]
+        assert values2 == ['1990-6-1', 3]
+        response = self.search('/api/person', [filter1])
+        document = loads(response.data)
+        assert ['1', '3'] == sorted(person['id']
+                                    for person in document['data'])
+        response = self.search('/api/person', [filter2])
+        document = loads(response.data)
+        assert ['2', '3'] == sorted(person['id']
+                                    for person in document['data'])
+
     @skip("I'm not certain in what situations an invalid value should cause"
           " a SQLAlchemy error")
     def test_invalid_value(self):
@@ -781,6 +886,542 @@ class TestFiltering(SearchTestBase):
         assert ['3', '4'] == sorted(article['id'] for article in articles)
 
 
+class TestFilterOptimizer(SearchTestBase):
+    """Tests for the simplification of filters before they are converted
+    into SQL expressions.
+
+    Each test compares the SQL for a filter as written by the client with
+    the SQL for the simplified filter.
+
+    """
+
+    def setUp(self):
+        """Creates the database, the :class:`~flask.Flask` object, the
+        :class:`~flask_restless.manager.APIManager` for that application,
+        and creates the ReSTful API endpoints for the models used in the test
+        methods.
+
+        """
+        super(TestFilterOptimizer, self).setUp()
+
+        class Article(self.Base):
+            __tablename__ = 'article'
+            id = Column(Integer, primary_key=True)
+            author_id = Column(Integer, ForeignKey('person.id'))
+            author = relationship('Person', backref=backref('articles'))
+
+        class Person(self.Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+            age = Column(Integer)
+            birthday = Column(Date)
+
+        self.Article = Article
+        self.Person = Person
+        self.Base.metadata.create_all()
+        self.manager.create_api(Person)
+        self.manager.create_api(Article)
+
+    def sql(self, dictionary, model=None):
+        """Returns a pair whose left element is the SQL for the filter
+        object `dictionary` on `model` as written and whose right element
+        is the SQL for the simplified filter.
+
+        If `model` is not specified, the filter applies to the
+        ``Person`` model.
+
+        """
+        model = self.Person if model is None else model
+        filter_ = from_dictionary(model, dictionary)
+        before = filter_.to_expression()
+        after = optimize(filter_).to_expression()
+        compile_kwargs = {'literal_binds': True}
+        return (str(before.compile(compile_kwargs=compile_kwargs)),
+                str(after.compile(compile_kwargs=compile_kwargs)))
+
+    def test_flatten(self):
+        """Tests that nested conjunctions and singleton disjunctions are
+        flattened.
+
+        """
+        filter_ = {
+            'and': [
+                {'and': [{'name': 'age', 'op': '>', 'val': 1},
+                         {'name': 'age', 'op': '<', 'val': 5}]},
+                {'or': [{'name': 'name', 'op': 'like', 'val': 'x%'}]}
+            ]
+        }
+        before, after = self.sql(filter_)
+        assert before == ('person.age > 1 AND person.age < 5'
+                          ' AND person.name LIKE \'x%\'')
+        assert after == before
+        filter_ = from_dictionary(self.Person, filter_)
+        optimized = optimize(filter_)
+        assert len(optimized.subfilters) == 3
+        assert all(isinstance(f, FieldFilter) for f in optimized.subfilters)
+
+    def test_equalities_to_in(self):
+        """Tests that a disjunction of equalities on the same field becomes a
+        single ``in`` filter.
+
+        """
+        filter_ = {
+            'or': [
+                {'name': 'age', 'op': 'eq', 'val': 1},
+                {'name': 'name', 'op': 'eq', 'val': 'foo'},
+                {'or': [{'name': 'age', 'op': '==', 'val': 2},
+                        {'name': 'age', 'op': 'in', 'val': [3, 1]}]}
+            ]
+        }
+        before, after = self.sql(filter_)
+        assert before == ('person.age = 1 OR person.name = \'foo\''
+                          ' OR person.age = 2 OR person.age IN (3, 1)')
+        assert after == 'person.age IN (1, 2, 3) OR person.name = \'foo\''
+
+    def test_duplicates(self):
+        """Tests that duplicate filters are removed, including filters that use
+        different names for the same operator.
+
+        """
+        filter_ = {
+            'and': [
+                {'name': 'age', 'op': 'ge', 'val': 10},
+                {'name': 'name', 'op': 'is_null'},
+                {'name': 'age', 'op': '>=', 'val': 10}
+            ]
+        }
+        before, after = self.sql(filter_)
+        assert before == ('person.age >= 10 AND person.name IS NULL'
+                          ' AND person.age >= 10')
+        assert after == 'person.age >= 10 AND person.name IS NULL'
+
+    def test_double_negation(self):
+        """Tests that a negation of a negation is removed."""
+        filter_ = {'not': {'not': {'name': 'age', 'op': 'lt', 'val': 10}}}
+        before, after = self.sql(filter_)
+        # SQLAlchemy already removes the double negation from the SQL.
+        assert before == after == 'person.age < 10'
+        filter_ = from_dictionary(self.Person, filter_)
+        assert isinstance(optimize(filter_), FieldFilter)
+
+    def test_constants(self):
+        """Tests that ``in`` filters with empty lists are folded into the
+        enclosing filters.
+
+        """
+        filter_ = {
+            'or': [
+                {'name': 'age', 'op': 'in', 'val': []},
+                {'and': [{'name': 'age', 'op': 'not_in', 'val': []},
+                         {'name': 'name', 'op': 'eq', 'val': 'foo'}]}
+            ]
+        }
+        before, after = self.sql(filter_)
+        assert before == ('1 != 1 OR 1 = 1'
+                          ' AND person.name = \'foo\'')
+        assert after == 'person.name = \'foo\''
+        filter_ = {
+            'and': [
+                {'name': 'age', 'op': 'in', 'val': []},
+                {'name': 'name', 'op': 'eq', 'val': 'foo'}
+            ]
+        }
+        before, after = self.sql(filter_)
+        assert after == 'false'
+
+    def test_relationship_operator(self):
+        """Tests that the filter that is the argument of a relationship
+        operator is simplified too.
+
+        """
+        filter_ = {
+            'name': 'author',
+            'op': 'has',
+            'val': {'or': [{'name': 'id', 'op': 'eq', 'val': 1},
+                           {'name': 'id', 'op': 'eq', 'val': 2}]}
+        }
+        before, after = self.sql(filter_, model=self.Article)
+        assert 'person.id = 1 OR person.id = 2' in before
+        assert 'person.id IN (1, 2)' in after
+
+    def test_request(self):
+        """Tests that filters in a request are simplified before the query is
+        executed.
+
+        """
+        people = [self.Person(id=i, age=i) for i in range(5)]
+        self.session.add_all(people)
+        self.session.commit()
+        filters = [{'or': [{'name': 'age', 'op': 'eq', 'val': i}
+                           for i in (1, 3, 1)]}]
+        with count_queries(self.engine) as statements:
+            response = self.search('/api/person', filters)
+        document = loads(response.data)
+        assert ['1', '3'] == sorted(person['id']
+                                    for person in document['data'])
+        statements = [' '.join(s.split()) for s in statements]
+        assert any('person.age IN (?, ?)' in s for s in statements)
+        assert not any('person.age = ?' in s for s in statements)
+
+    def test_cached_tree(self):
+        """Tests that the filter cached for filters that differ only in
+        their values is simplified once, before the values are known.
+
+        """
+        people = [self.Person(id=i, age=i) for i in range(5)]
+        self.session.add_all(people)
+        self.session.commit()
+
+        def make_filter(*values):
+            return {'or': [{'name': 'age', 'op': 'eq', 'val': values[0]},
+                           {'name': 'age', 'op': 'in', 'val': values[1:]}]}
+
+        filter1 = make_filter(1, 3, 1)
+        filter2 = make_filter(2, 4)
+        parsed1, values1 = parse_filter(self.Person, filter1)
+        parsed2, values2 = parse_filter(self.Person, filter2)
+        assert parsed1 is parsed2
+        assert isinstance(parsed1, FieldFilter)
+        assert parsed1.operator == 'in'
+        response = self.search('/api/person', [filter1])
+        document = loads(response.data)
+        assert ['1', '3'] == sorted(person['id']
+                                    for person in document['data'])
+        response = self.search('/api/person', [filter2])
+        document = loads(response.data)
+        assert ['2', '4'] == sorted(person['id']
+                                    for person in document['data'])
+        # An empty list given by the client is folded when it is known.
+        filters = [{'and': [{'name': 'age', 'op': 'in', 'val': []},
+                            {'name': 'age', 'op': 'eq', 'val': 1}]}]
+        response = self.search('/api/person', filters)
+        document = loads(response.data)
+        assert [] == document['data']
+
+    def test_converted_values(self):
+        """Tests that equalities and ``in`` filters on a date column are
+        not merged, since only the values of the equalities are converted
+        to dates.
+
+        """
+        person1 = self.Person(id=1, birthday=date(1990, 1, 1))
+        person2 = self.Person(id=2, birthday=date(1991, 1, 1))
+        person3 = self.Person(id=3, birthday=date(1992, 1, 1))
+        self.session.add_all([person1, person2, person3])
+        self.session.commit()
+        filter_ = {
+            'or': [
+                {'name': 'birthday', 'op': 'eq', 'val': '1990-01-01'},
+                {'name': 'birthday', 'op': 'eq', 'val': '1992-01-01'}
+            ]
+        }
+        parsed, values = parse_filter(self.Person, filter_)
+        assert len(parsed.subfilters) == 2
+        response = self.search('/api/person', [filter_])
+        document = loads(response.data)
+        assert ['1', '3'] == sorted(person['id']
+                                    for person in document['data'])
+
+    def test_error_preserved(self):
+        """Tests that a filter that is invalid is not hidden by the
+        simplification.
+
+        """
+        filters = [{'or': [{'name': 'age', 'op': 'eq', 'val': 1},
+                           {'name': 'age', 'op': 'eq', 'val': None}]}]
+        response = self.search('/api/person', filters)
+        check_sole_error(response, 400, ['compare', 'NULL'])
+
+
+class TestFilterLimits(SearchTestBase):
+    """Tests for limiting the cost of the filters that clients may
+    request.
+
+    """
+
+    def setUp(self):
+        """Creates the database, the :class:`~flask.Flask` object, the
+        :class:`~flask_restless.manager.APIManager` for that application,
+        and creates the ReSTful API endpoints for the models used in the test
+        methods.
+
+        """
+        super(TestFilterLimits, self).setUp()
+
+        class Article(self.Base):
+            __tablename__ = 'article'
+            id = Column(Integer, primary_key=True)
+            author_id = Column(Integer, ForeignKey('person.id'))
+            author = relationship('Person', backref=backref('articles'))
+
+        class Person(self.Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+            age = Column(Integer)
+
+        self.Article = Article
+        self.Person = Person
+        self.Base.metadata.create_all()
+        limits = dict(max_depth=3, max_nodes=5, max_in_list=3,
+                      max_relationship_hops=1, allow_leading_wildcard=False)
+        self.manager.create_api(Person, filter_limits=limits)
+        self.manager.create_api(Article, filter_limits=limits)
+
+    def check_rejected(self, url, filters, strings):
+        """Checks that a request for `url` with the given filters is
+        rejected before any query is executed.
+
+        """
+        with count_queries(self.engine) as statements:
+            response = self.search(url, filters)
+        check_sole_error(response, 400, strings)
+        assert not statements
+
+    def test_depth(self):
+        """Tests that filters nested too deeply are rejected."""
+        age = {'name': 'age', 'op': 'gt', 'val': 1}
+        name = {'name': 'name', 'op': 'eq', 'val': 'foo'}
+        filters = [{'or': [{'and': [{'not': age}, name]}, name]}]
+        self.check_rejected('/api/person', filters, ['depth', '4', '3'])
+        filters = [{'or': [{'not': age}, name]}]
+        response = self.search('/api/person', filters)
+        assert response.status_code == 200
+
+    def test_nodes(self):
+        """Tests that requests with too many filters are rejected."""
+        filters = [{'name': 'age', 'op': 'gt', 'val': i} for i in range(6)]
+        self.check_rejected('/api/person', filters,
+                            ['number of filters', '6', '5'])
+
+    def test_in_list(self):
+        """Tests that ``in`` filters with too many values are rejected,
+        including disjunctions of equalities that become an ``in`` filter.
+
+        """
+        filters = [{'name': 'id', 'op': 'in', 'val': [1, 2, 3, 4]}]
+        self.check_rejected('/api/person', filters, ['list', '4', '3'])
+        filters = [{'or': [{'name': 'id', 'op': 'eq', 'val': i}
+                           for i in range(4)]}]
+        self.check_rejected('/api/person', filters, ['list', '4', '3'])
+        filters = [{'name': 'id', 'op': 'in', 'val': [1, 2, 3]}]
+        response = self.search('/api/person', filters)
+        assert response.status_code == 200
+
+    def test_relationship_hops(self):
+        """Tests that nested relationship operators are rejected."""
+        filters = [{'name': 'author', 'op': 'has',
+                    'val': {'name': 'articles', 'op': 'any',
+                            'val': {'name': 'id', 'op': 'eq', 'val': 1}}}]
+        self.check_rejected('/api/article', filters, ['relationships', '2'])
+        filters = [{'name': 'author', 'op': 'has',
+                    'val': {'name': 'id', 'op': 'eq', 'val': 1}}]
+        response = self.search('/api/article', filters)
+        assert response.status_code == 200
+
+    def test_leading_wildcard(self):
+        """Tests that ``like`` patterns starting with a wildcard are
+        rejected, but other patterns are allowed.
+
+        """
+        filters = [{'name': 'name', 'op': 'like', 'val': '%foo'}]
+        self.check_rejected('/api/person', filters, ['wildcard'])
+        filters = [{'name': 'name', 'op': 'like', 'val': 'foo%'}]
+        response = self.search('/api/person', filters)
+        assert response.status_code == 200
+
+    def test_simple_filters(self):
+        """Tests that simple filters count toward the limits."""
+        query_string = {'filter[id]': '1,2,3,4'}
+        response = self.app.get('/api/person', query_string=query_string)
+        check_sole_error(response, 400, ['list', '4', '3'])
+
+    def test_relationship_url(self):
+        """Tests that the limits apply to requests for a to-many relation."""
+        self.session.add(self.Person(id=1))
+        self.session.commit()
+        filters = [{'name': 'id', 'op': 'in', 'val': [1, 2, 3, 4]}]
+        response = self.search('/api/person/1/articles', filters)
+        check_sole_error(response, 400, ['list', '4', '3'])
+
+
+class TestTextSearch(SearchTestBase):
+    """Tests for the full-text search ``match`` operator."""
+
+    def setUp(self):
+        """Creates the database, the :class:`~flask.Flask` object, the
+        :class:`~flask_restless.manager.APIManager` for that application,
+        and creates the ReSTful API endpoints for the models used in the test
+        methods.
+
+        """
+        super(TestTextSearch, self).setUp()
+
+        class Article(self.Base):
+            __tablename__ = 'article'
+            id = Column(Integer, primary_key=True)
+            title = Column(Unicode)
+            body = Column(Unicode)
+
+        class Person(self.Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+
+        self.Article = Article
+        self.Person = Person
+        self.Base.metadata.create_all()
+        text_search = TextSearch(['title', 'body'], order_by_relevance=True)
+        text_search.create_index(self.engine, Article)
+        self.manager.create_api(Article, text_search=text_search)
+        self.manager.create_api(Person)
+
+    def test_match(self):
+        """Tests that the ``match`` operator selects the resources whose
+        field contains each of the words in its argument.
+
+        """
+        article1 = self.Article(id=1, body=u'Flask is a web framework')
+        article2 = self.Article(id=2, body=u'Restless is a Flask extension')
+        article3 = self.Article(id=3, body=u'Django is a web framework')
+        self.session.add_all([article1, article2, article3])
+        self.session.commit()
+        filters = [dict(name='body', op='match', val='web framework')]
+        response = self.search('/api/article', filters)
+        document = loads(response.data)
+        articles = document['data']
+        assert ['1', '3'] == sorted(article['id'] for article in articles)
+        filters = [dict(name='body', op='search', val='flask restless')]
+        response = self.search('/api/article', filters)
+        document = loads(response.data)
+        articles = document['data']
+        assert ['2'] == [article['id'] for article in articles]
+
+    def test_index_updated(self):
+        """Tests that the search index reflects resources created,
+        updated, and deleted after the index was created.
+
+        """
+        article1 = self.Article(id=1, title=u'foo')
+        article2 = self.Article(id=2, title=u'bar')
+        self.session.add_all([article1, article2])
+        self.session.commit()
+        article1.title = u'baz'
+        self.session.delete(article2)
+        self.session.add(self.Article(id=3, title=u'foo'))
+        self.session.commit()
+        filters = [dict(name='title', op='match', val='foo')]
+        response = self.search('/api/article', filters)
+        document = loads(response.data)
+        articles = document['data']
+        assert ['3'] == [article['id'] for article in articles]
+
+    def test_no_words(self):
+        """Tests that a search for no words matches no resources."""
+        self.session.add(self.Article(id=1, title=u'foo'))
+        self.session.commit()
+        filters = [dict(name='title', op='match', val='  ')]
+        response = self.search('/api/article', filters)
+        document = loads(response.data)
+        assert document['data'] == []
+
+    def test_order_by_relevance(self):
+        """Tests that search results are ordered by relevance unless the
+        client requests a sort order.
+
+        """
+        article1 = self.Article(id=1, body=u'foo bar baz')
+        article2 = self.Article(id=2, body=u'foo bar baz foo foo foo')
+        article3 = self.Article(id=3, body=u'foo foo bar baz')
+        self.session.add_all([article1, article2, article3])
+        self.session.commit()
+        filters = [dict(name='body', op='match', val='foo')]
+        response = self.search('/api/article', filters)
+        document = loads(response.data)
+        articles = document['data']
+        assert ['2', '3', '1'] == [article['id'] for article in articles]
+        query_string = {'filter[objects]': dumps(filters), 'sort': 'id'}
+        response = self.app.get('/api/article', query_string=query_string)
+        document = loads(response.data)
+        articles = document['data']
+        assert ['1', '2', '3'] == [article['id'] for article in articles]
+
+    def test_field_not_allowed(self):
+        """Tests that searching a field not declared in the ``text_search``
+        keyword argument yields an error response.
+
+        """
+        self.session.add(self.Article(id=1))
+        self.session.commit()
+        filters = [dict(name='id', op='match', val='1')]
+        response = self.search('/api/article', filters)
+        check_sole_error(response, 400, ['search', 'id', 'not allowed'])
+
+    def test_no_text_search(self):
+        """Tests that no field may be searched on an API created without
+        the ``text_search`` keyword argument.
+
+        """
+        filters = [dict(name='name', op='match', val='foo')]
+        response = self.search('/api/person', filters)
+        check_sole_error(response, 400, ['search', 'name', 'not allowed'])
+
+    def test_not_a_string(self):
+        """Tests that the argument to the ``match`` operator must be a
+        string.
+
+        """
+        filters = [dict(name='title', op='match', val=1)]
+        response = self.search('/api/article', filters)
+        assert response.status_code == 400
+
+    def test_compiled_sql(self):
+        """Tests the SQL generated by the ``match`` operator for each
+        database.
+
+        """
+        filter_ = from_dictionary(self.Article, dict(name='body', op='match',
+                                                     val='foo bar'))
+        expression = filter_.to_expression()
+        sql = str(expression.compile(dialect=postgresql.dialect()))
+        assert "to_tsvector('english'::regconfig, article.body)" in sql
+        assert "@@ plainto_tsquery('english'::regconfig" in sql
+        sql = str(expression.compile(dialect=sqlite.dialect()))
+        assert 'article_fts.body MATCH' in sql
+        # Other databases fall back to a case-insensitive pattern match
+        # for each word.
+        sql = str(expression.compile())
+        assert sql.count('LIKE') == 2
+
+    def test_fallback_wildcards(self):
+        """Tests that wildcard characters in the search terms match only
+        themselves on databases that fall back to a pattern match.
+
+        """
+        article1 = self.Article(id=1, body=u'100% cotton')
+        article2 = self.Article(id=2, body=u'1000 cotton')
+        article3 = self.Article(id=3, body=u'a_b a/b')
+        article4 = self.Article(id=4, body=u'axb a//b')
+        self.session.add_all([article1, article2, article3, article4])
+        self.session.commit()
+
+        def fallback_search(terms):
+            filter_ = from_dictionary(self.Article, dict(name='body',
+                                                         op='match',
+                                                         val=terms))
+            expression = filter_.to_expression()
+            # Compile the expression for a generic database instead of
+            # SQLite, which has its own full-text search.
+            sql = expression.compile(compile_kwargs={'literal_binds': True})
+            query = self.session.query(self.Article).filter(text(str(sql)))
+            return sorted(article.id for article in query)
+
+        assert fallback_search(u'100%') == [1]
+        assert fallback_search(u'a_b') == [3]
+        assert fallback_search(u'a/b') == [3]
+
+
 class TestSimpleFiltering(ManagerTestBase):
     """Unit tests for "simple" filter query parameters.
 
@@ -1150,6 +1791,65 @@ class TestOperators(SearchTestBase):
         people = document['data']
         assert ['2'] == sorted(person['id'] for person in people)
 
+    def test_in_large_list(self):
+        """Tests for the ``in`` and ``not_in`` operators with lists longer
+        than :data:`~flask_restless.search.operators.IN_LIST_THRESHOLD`.
+
+        """
+        people = [self.Person(id=i) for i in range(1, 11)]
+        self.session.add_all(people)
+        self.session.commit()
+        # The values may be strings, as in the ``filter[id]`` parameter.
+        ids = [str(i) for i in range(2, 2 * IN_LIST_THRESHOLD + 4, 2)]
+        filters = [dict(name='id', op='in', val=ids)]
+        with count_queries(self.engine) as statements:
+            response = self.search('/api/person', filters)
+        document = loads(response.data)
+        people = document['data']
+        assert ['10', '2', '4', '6', '8'] == sorted(person['id']
+                                                    for person in people)
+        # The statement should not have one placeholder for each value.
+        assert all(s.count('?') < len(ids) for s in statements)
+        filters = [dict(name='id', op='not_in', val=ids)]
+        response = self.search('/api/person', filters)
+        document = loads(response.data)
+        people = document['data']
+        assert ['1', '3', '5', '7', '9'] == sorted(person['id']
+                                                   for person in people)
+
+    def test_in_list_threshold(self):
+        """Tests that the number of values above which the list of an
+        ``in`` filter is a single parameter can be set for each API.
+
+        """
+        self.manager.create_api(self.Person, collection_name='people1',
+                                in_list_threshold=2)
+        self.manager.create_api(self.Person, collection_name='people2',
+                                in_list_threshold=None)
+        people = [self.Person(id=i) for i in range(1, 11)]
+        self.session.add_all(people)
+        self.session.commit()
+        ids = list(range(1, 7))
+        filters = [dict(name='id', op='in', val=ids)]
+        with count_queries(self.engine) as statements:
+            response = self.search('/api/people1', filters)
+        document = loads(response.data)
+        assert len(document['data']) == 6
+        assert all(s.count('?') < len(ids) for s in statements)
+        ids = list(range(1, 2 * IN_LIST_THRESHOLD + 1))
+        filters = [dict(name='id', op='in', val=ids)]
+        with count_queries(self.engine) as statements:
+            response = self.search('/api/people2', filters)
+        document = loads(response.data)
+        assert len(document['data']) == 10
+        assert any(s.count('?') >= len(ids) for s in statements)
+
+    def test_negative_in_list_threshold(self):
+        """Tests that a negative ``in`` list threshold is not allowed."""
+        with self.assertRaises(IllegalArgumentError):
+            self.manager.create_api(self.Person, collection_name='people1',
+                                    in_list_threshold=-1)
+
     def test_is_null(self):
         """Tests for the ``is_null`` operator."""
         person1 = self.Person(id=1)
@@ -1442,3 +2142,23 @@ class TestAssociationProxy(SearchTestBase):
         document = loads(response.data)
         articles = document['data']
         assert ['1', '2'] == sorted(article['id'] for article in articles)
+
+    def test_filter_relation(self):
+        """Tests for filtering the instances related to a resource via an
+        association proxy with
+        :func:`~flask_restless.search.search_relationship`.
+
+        """
+        article1 = self.Article(id=1)
+        article2 = self.Article(id=2)
+        tag1 = self.Tag(id=1, name=u'foo')
+        tag2 = self.Tag(id=2, name=u'bar')
+        tag3 = self.Tag(id=3, name=u'bar')
+        article1.tags = [tag1, tag2]
+        article2.tags = [tag3]
+        self.session.add_all([article1, article2, tag1, tag2, tag3])
+        self.session.commit()
+        filters = [dict(name='name', op='eq', val='bar')]
+        query = search_relationship(self.session, article1, 'tags',
+                                    filters=filters)
+        assert [tag2] == query.all()
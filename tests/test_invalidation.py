@@ -0,0 +1,231 @@
+# test_invalidation.py - unit tests for sharing invalidations among processes
+#
+# Copyright 2011 Lincoln de Sousa <lincoln@comum.org>.
+# Copyright 2012, 2013, 2014, 2015, 2016 Jeffrey Finkelstein
+#           <jeffrey.finkelstein@gmail.com> and contributors.
+#
+# This file is part of Flask-Restless.
+#
+# Flask-Restless is distributed under both the GNU Affero General Public
+# License version 3 and under the 3-clause BSD license. For more
+# information, see LICENSE.AGPL and LICENSE.BSD.
+"""Unit tests for the :mod:`flask_restless.invalidation` module.
+
+The tests of publishing changes to other processes fork the test
+process with :func:`in_worker`, which stands in for a worker process of
+a server like Gunicorn that serves the same application.
+
+"""
+import os
+import shutil
+import socket
+from tempfile import mkdtemp
+import traceback
+
+from sqlalchemy import Column
+from sqlalchemy import Integer
+from sqlalchemy import Unicode
+
+from flask_restless import APIManager
+from flask_restless import InvalidationBus
+from flask_restless import ResponseCache
+from flask_restless import Transport
+from flask_restless.invalidation import UnixSocketTransport
+
+from .helpers import dumps
+from .helpers import loads
+from .helpers import ManagerTestBase
+from .helpers import skip_unless
+from .helpers import TestCase
+
+#: Whether this platform can fork processes and has Unix domain sockets.
+HAS_UNIX_SOCKETS = hasattr(os, 'fork') and hasattr(socket, 'AF_UNIX')
+
+
+def in_worker(func, *args):
+    """Calls ``func(*args)`` in a child process forked from the current
+    process and returns ``True`` if and only if it returned without
+    raising an exception.
+
+    """
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            func(*args)
+            status = 0
+        except Exception:
+            traceback.print_exc()
+        finally:
+            # Exit without running the cleanup code of the test process.
+            os._exit(status)
+    pid, status = os.waitpid(pid, 0)
+    return os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+
+class LostMessages(Transport):
+    """A transport that reports that messages have been lost."""
+
+    def publish(self, message):
+        pass
+
+    def receive(self):
+        return [], False
+
+
+@skip_unless(HAS_UNIX_SOCKETS, 'requires fork() and Unix domain sockets')
+class TestUnixSocketTransport(TestCase):
+    """Tests for the
+    :class:`~flask_restless.invalidation.UnixSocketTransport` class.
+
+    """
+
+    def setUp(self):
+        self.path = mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_publish(self):
+        """Tests that a message is received by the other transports in
+        the same directory, but not by the transport that published it.
+
+        """
+        sender = UnixSocketTransport(self.path)
+        receiver = UnixSocketTransport(self.path)
+        self.assertEqual(receiver.receive(), ([], True))
+        sender.publish(b'foo')
+        sender.publish(b'bar')
+        self.assertEqual(receiver.receive(), ([b'foo', b'bar'], True))
+        self.assertEqual(receiver.receive(), ([], True))
+        self.assertEqual(sender.receive(), ([], True))
+        sender.close()
+        receiver.close()
+        self.assertEqual(os.listdir(self.path), [])
+
+    def test_other_process(self):
+        """Tests that a message published by another process is
+        received, and that the socket of that process is removed after
+        it exits.
+
+        """
+        transport = UnixSocketTransport(self.path)
+        transport.receive()
+        # The child process binds its own socket, even though it shares
+        # the transport object with this process.
+        self.assertTrue(in_worker(transport.publish, b'foo'))
+        self.assertEqual(transport.receive(), ([b'foo'], True))
+        self.assertEqual(len(os.listdir(self.path)), 2)
+        transport.publish(b'bar')
+        self.assertEqual(len(os.listdir(self.path)), 1)
+
+    def test_overflow(self):
+        """Tests that messages dropped because the queue of the receiver
+        is full are reported as lost.
+
+        """
+        sender = UnixSocketTransport(self.path)
+        receiver = UnixSocketTransport(self.path)
+        receiver.receive()
+        for i in range(1000):
+            sender.publish(b'foo')
+        messages, complete = receiver.receive()
+        self.assertFalse(complete)
+        self.assertTrue(messages)
+        self.assertEqual(receiver.receive(), ([], True))
+
+
+@skip_unless(HAS_UNIX_SOCKETS, 'requires fork() and Unix domain sockets')
+class TestInvalidationBus(ManagerTestBase):
+    """Tests for sharing the invalidations of caches among processes
+    with an :class:`~flask_restless.InvalidationBus`.
+
+    """
+
+    def setUp(self):
+        # The database is in a file, so that it is shared among
+        # processes.
+        self.path = mkdtemp()
+        super(TestInvalidationBus, self).setUp()
+
+        class Person(self.Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+
+        self.Person = Person
+        self.Base.metadata.create_all()
+        self.session.add(Person(id=1, name=u'foo'))
+        self.session.commit()
+        self.socketdir = os.path.join(self.path, 'sockets')
+        self.manager = APIManager(self.flaskapp, session=self.session,
+                                  invalidation_bus=self.socketdir)
+
+    def tearDown(self):
+        super(TestInvalidationBus, self).tearDown()
+        shutil.rmtree(self.path)
+
+    def database_uri(self):
+        return 'sqlite:///{0}'.format(os.path.join(self.path, 'test.db'))
+
+    def fetch_name(self):
+        """Returns the name of the person in the response to a request
+        for the person, ending the session as Flask-SQLAlchemy does at
+        the end of each request.
+
+        """
+        response = self.app.get('/api/person/1')
+        self.session.remove()
+        return loads(response.data)['data']['attributes']['name']
+
+    def test_other_process(self):
+        """Tests that a change committed by another process invalidates
+        the cached responses of this process.
+
+        """
+        cache = ResponseCache()
+        self.manager.create_api(self.Person, methods=['GET', 'PATCH'],
+                                response_cache=cache)
+        self.assertEqual(self.fetch_name(), u'foo')
+        self.assertEqual(self.fetch_name(), u'foo')
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        def update():
+            data = {
+                'data': {
+                    'type': 'person',
+                    'id': '1',
+                    'attributes': {'name': u'bar'}
+                }
+            }
+            response = self.app.patch('/api/person/1', data=dumps(data))
+            assert response.status_code == 204
+
+        self.assertTrue(in_worker(update))
+        self.assertEqual(self.fetch_name(), u'bar')
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_unrelated_tables(self):
+        """Tests that a change to an unrelated table in another process
+        leaves the cached responses of this process.
+
+        """
+        cache = ResponseCache()
+        self.manager.create_api(self.Person, response_cache=cache)
+        self.fetch_name()
+        bus = self.manager.invalidation_bus
+        self.assertTrue(in_worker(bus.publish, set(['article'])))
+        self.fetch_name()
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lost_messages(self):
+        """Tests that the caches are cleared if messages from other
+        processes have been lost.
+
+        """
+        cache = ResponseCache()
+        bus = InvalidationBus(LostMessages())
+        bus.subscribe(cache)
+        cache.set('foo', 'bar', set(['person']))
+        bus.poll()
+        self.assertEqual(len(cache), 0)
@@ -10,12 +10,19 @@
 # License version 3 and under the 3-clause BSD license. For more
 # information, see LICENSE.AGPL and LICENSE.BSD.
 """Unit tests for the :mod:`flask_restless.manager` module."""
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
 from unittest2 import skip
 
 from flask import Flask
+from flask.json import JSONEncoder
 from sqlalchemy import Column
+from sqlalchemy import DateTime
 from sqlalchemy import ForeignKey
 from sqlalchemy import Integer
+from sqlalchemy import Numeric
 from sqlalchemy import Unicode
 from sqlalchemy.orm import backref
 from sqlalchemy.orm import relationship
@@ -24,17 +31,35 @@ from flask_restless import APIManager
 from flask_restless import collection_name
 from flask_restless import DefaultSerializer
 from flask_restless import IllegalArgumentError
+from flask_restless import JSONCodec
 from flask_restless import model_for
+from flask_restless import primary_key_for
 from flask_restless import serializer_for
 from flask_restless import url_for
 
+from .helpers import dumps
 from .helpers import FlaskSQLAlchemyTestBase
 from .helpers import force_content_type_jsonapi
+from .helpers import GLOBAL_FUNCS
+from .helpers import GUID
 from .helpers import loads
 from .helpers import ManagerTestBase
+from .helpers import skip_unless
 from .helpers import SQLAlchemyTestBase
 
 
+def has_module(name):
+    """Returns ``True`` if and only if the module with the given name
+    can be imported.
+
+    """
+    try:
+        __import__(name)
+    except ImportError:
+        return False
+    return True
+
+
 class TestLocalAPIManager(SQLAlchemyTestBase):
     """Provides tests for :class:`flask_restless.APIManager` when the tests
     require that the instance of :class:`flask_restless.APIManager` has not
@@ -201,6 +226,51 @@ class TestLocalAPIManager(SQLAlchemyTestBase):
         self.app.get('/api/person')
         assert increment1 == increment2 == 3
 
+    def test_global_functions_multiple_managers(self):
+        """Tests that the global helper functions find APIs created by
+        any of several :class:`APIManager` objects, and only while those
+        managers are known.
+
+        """
+        manager1 = APIManager(self.flaskapp, session=self.session)
+        manager2 = APIManager(self.flaskapp, session=self.session)
+        manager1.create_api(self.Person, collection_name='people')
+        manager2.create_api(self.Article, primary_key='id')
+        assert collection_name(self.Person) == 'people'
+        assert collection_name(self.Article) == 'article'
+        assert model_for('people') is self.Person
+        assert model_for('article') is self.Article
+        assert isinstance(serializer_for(self.Article), DefaultSerializer)
+        assert primary_key_for(self.Person) == 'id'
+        assert primary_key_for(self.Article()) == 'id'
+        with self.flaskapp.test_request_context():
+            assert url_for(self.Person, 1) == '/api/people/1'
+            assert url_for(self.Article) == '/api/article'
+        for func in GLOBAL_FUNCS:
+            func.created_managers.clear()
+        with self.assertRaises(ValueError):
+            collection_name(self.Person)
+        with self.assertRaises(ValueError):
+            model_for('article')
+
+    def test_recreate_api(self):
+        """Tests that creating a second API for the same model with
+        the same :class:`APIManager` replaces the first one in the
+        global helper functions.
+
+        """
+        manager = APIManager(session=self.session)
+        manager.create_api_blueprint('people', self.Person,
+                                     collection_name='people')
+        manager.create_api_blueprint('persons', self.Person,
+                                     collection_name='persons')
+        assert collection_name(self.Person) == 'persons'
+        assert model_for('persons') is self.Person
+        with self.assertRaises(ValueError):
+            model_for('people')
+        for func in GLOBAL_FUNCS:
+            func.created_managers.clear()
+
     def test_url_prefix(self):
         """Tests for specifying a URL prefix at the manager level but
         not when creating an API.
@@ -246,6 +316,45 @@ class TestLocalAPIManager(SQLAlchemyTestBase):
         response = self.app.get('/foo/article')
         assert response.status_code == 404
 
+    def test_blueprint_url_prefix_links(self):
+        """Tests that links use the URL prefix given when registering
+        a blueprint, even if it differs from the prefix given when
+        creating the blueprint.
+
+        """
+        manager = APIManager(session=self.session, url_prefix='/foo')
+        blueprint = manager.create_api_blueprint('person', self.Person)
+        self.flaskapp.register_blueprint(blueprint, url_prefix='/bar')
+        self.session.add(self.Person(id=1))
+        self.session.commit()
+        response = self.app.get('/bar/person/1')
+        assert response.status_code == 200
+        document = loads(response.data)
+        assert document['links']['self'] == '/bar/person/1'
+        person = document['data']
+        assert person['links']['self'] == 'http://localhost/bar/person/1'
+
+    def test_links_multiple_apps(self):
+        """Tests that links are correct when the same blueprint is
+        registered on applications at different URLs.
+
+        """
+        manager = APIManager(session=self.session)
+        blueprint = manager.create_api_blueprint('person', self.Person)
+        self.flaskapp.register_blueprint(blueprint)
+        flaskapp2 = Flask(__name__)
+        flaskapp2.register_blueprint(blueprint, url_prefix='/bar')
+        testclient2 = flaskapp2.test_client()
+        force_content_type_jsonapi(testclient2)
+        self.session.add(self.Person(id=1))
+        self.session.commit()
+        response = self.app.get('/api/person/1')
+        document = loads(response.data)
+        assert document['links']['self'] == '/api/person/1'
+        response = testclient2.get('/bar/person/1')
+        document = loads(response.data)
+        assert document['links']['self'] == '/bar/person/1'
+
     # # This is a possible feature, but we will not support this for now.
     # def test_append_url_prefix(self):
     #     """Tests that a call to :meth:`APIManager.create_api` can
@@ -456,6 +565,148 @@ class TestAPIManager(ManagerTestBase):
                                     additional_attributes=['extra'])
 
 
+class TestJSONCodec(SQLAlchemyTestBase):
+    """Tests for specifying the JSON codec used by the
+    :class:`flask_restless.APIManager`.
+
+    """
+
+    def setUp(self):
+        super(TestJSONCodec, self).setUp()
+        # Other test classes may leave behind APIManager objects that
+        # created APIs for models named 'person'.
+        for func in GLOBAL_FUNCS:
+            func.created_managers.clear()
+
+        class Person(self.Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+            birthday = Column(DateTime)
+            uuid = Column(GUID)
+            salary = Column(Numeric(10, 2))
+
+        # Decimal objects are not serializable by default, so the codecs
+        # should fall back to this encoder for them.
+        class DecimalEncoder(JSONEncoder):
+
+            def default(self, obj):
+                if isinstance(obj, Decimal):
+                    return str(obj)
+                return super(DecimalEncoder, self).default(obj)
+
+        self.Person = Person
+        self.Base.metadata.create_all()
+        self.flaskapp.json_encoder = DecimalEncoder
+
+    def tearDown(self):
+        """Clear the :class:`~flask_restless.APIManager` objects known by
+        the global helper functions, since this test class creates its
+        own.
+
+        """
+        super(TestJSONCodec, self).tearDown()
+        for func in GLOBAL_FUNCS:
+            func.created_managers.clear()
+
+    def check_codec(self, json_codec):
+        """Creates an API using the given codec and checks that requests
+        are decoded and responses are encoded just as they are by the
+        default codec.
+
+        """
+        manager = APIManager(self.flaskapp, session=self.session,
+                             json_codec=json_codec)
+        manager.create_api(self.Person, methods=['GET', 'POST', 'PATCH'])
+        uuid = UUID('b2ee5d0c-9c1f-4a4e-9c1e-d4b4c0e5b3e1')
+        person = self.Person(id=1, name=u'\u00e9', uuid=uuid,
+                             birthday=datetime(1990, 1, 2, 3, 4, 5),
+                             salary=Decimal('1.50'))
+        self.session.add(person)
+        self.session.commit()
+        response = self.app.get('/api/person/1')
+        assert response.status_code == 200
+        document = loads(response.data)
+        attributes = document['data']['attributes']
+        assert attributes['name'] == u'\u00e9'
+        assert attributes['uuid'] == str(uuid)
+        assert attributes['birthday'] == '1990-01-02T03:04:05'
+        assert attributes['salary'] == '1.50'
+        # Test for decoding the body of a request.
+        data = {'data': {'type': 'person', 'attributes': {'name': u'foo'}}}
+        response = self.app.post('/api/person', data=dumps(data))
+        assert response.status_code == 201
+        document = loads(response.data)
+        assert document['data']['attributes']['name'] == u'foo'
+        response = self.app.post('/api/person', data='Invalid JSON string')
+        assert response.status_code == 400
+        # Test for JSONP responses.
+        response = self.app.get('/api/person/1?callback=foo')
+        assert response.data.startswith(b'foo(')
+        return manager
+
+    def test_default(self):
+        """Tests that the default codec uses the Flask JSON encoder."""
+        self.check_codec(None)
+
+    def test_flask(self):
+        """Tests for explicitly requesting the default codec."""
+        self.check_codec('flask')
+
+    @skip_unless(has_module('orjson'), 'orjson not found')
+    def test_orjson(self):
+        """Tests for encoding and decoding with orjson."""
+        self.check_codec('orjson')
+
+    @skip_unless(has_module('rapidjson'), 'python-rapidjson not found')
+    def test_rapidjson(self):
+        """Tests for encoding and decoding with python-rapidjson."""
+        self.check_codec('rapidjson')
+
+    @skip_unless(has_module('ujson'), 'ujson not found')
+    def test_ujson(self):
+        """Tests for decoding with ujson."""
+        self.check_codec('ujson')
+
+    def test_auto(self):
+        """Tests for automatically choosing the codec from the
+        installed libraries.
+
+        """
+        self.check_codec('auto')
+
+    def test_custom_codec(self):
+        """Tests for providing a custom subclass of
+        :class:`flask_restless.JSONCodec`.
+
+        """
+
+        class MyCodec(JSONCodec):
+
+            def __init__(self):
+                self.calls = []
+
+            def loads(self, data):
+                self.calls.append('loads')
+                return loads(data)
+
+            def dumps(self, obj):
+                self.calls.append('dumps')
+                return dumps(obj)
+
+        codec = MyCodec()
+        manager = self.check_codec(codec)
+        assert manager.json_codec is codec
+        assert 'loads' in codec.calls
+        assert 'dumps' in codec.calls
+
+    def test_unknown_codec(self):
+        """Tests that specifying an unknown codec raises an exception."""
+        with self.assertRaises(ValueError):
+            APIManager(self.flaskapp, session=self.session,
+                       json_codec='bogus')
+
+
 class TestFSA(FlaskSQLAlchemyTestBase):
     """Tests which use models defined using Flask-SQLAlchemy instead of pure
     SQLAlchemy.
@@ -42,6 +42,7 @@ from flask_restless import MultipleExceptions
 from flask_restless import SerializationException
 
 from .helpers import check_sole_error
+from .helpers import count_queries
 from .helpers import GUID
 from .helpers import loads
 from .helpers import ManagerTestBase
@@ -579,6 +580,255 @@ class TestFetchResource(ManagerTestBase):
         self.assertEqual(tag['type'], 'tag')
         self.assertEqual(tag['attributes']['tagid'], 1)
 
+    def test_alternating_sparse_fieldsets(self):
+        """Tests that the serialization of a resource respects the
+        sparse fieldset of each request, even when requests with
+        different sparse fieldsets are interleaved.
+
+        """
+        person = self.Person(id=1, name=u'foo', bedtime=time(20))
+        article = self.Article(id=1, author=person)
+        self.session.add_all([person, article])
+        self.session.commit()
+        self.manager.create_api(self.Person)
+        self.manager.create_api(self.Article)
+        for i in range(2):
+            query_string = {'fields[person]': 'name'}
+            response = self.app.get('/api/person/1', query_string=query_string)
+            document = loads(response.data)
+            person = document['data']
+            self.assertEqual(person['attributes'], {'name': u'foo'})
+            self.assertNotIn('relationships', person)
+            query_string = {'fields[person]': 'articles'}
+            response = self.app.get('/api/person/1', query_string=query_string)
+            document = loads(response.data)
+            person = document['data']
+            self.assertNotIn('attributes', person)
+            self.assertEqual(list(person['relationships']), ['articles'])
+            response = self.app.get('/api/person/1')
+            document = loads(response.data)
+            person = document['data']
+            self.assertEqual(person['attributes']['name'], u'foo')
+            self.assertTrue(person['attributes']['has_early_bedtime'])
+            self.assertEqual(sorted(person['relationships']),
+                             ['articles', 'comments'])
+
+    def test_relationship_added_after_serialization(self):
+        """Tests that a relationship added to a model by a backref on a
+        model mapped after the first request is serialized.
+
+        """
+        person = self.Person(id=1)
+        self.session.add(person)
+        self.session.commit()
+        self.manager.create_api(self.Person)
+        response = self.app.get('/api/person/1')
+        document = loads(response.data)
+        person = document['data']
+        self.assertEqual(sorted(person['relationships']),
+                         ['articles', 'comments'])
+
+        class Photo(self.Base):
+            __tablename__ = 'photo'
+            id = Column(Integer, primary_key=True)
+            owner_id = Column(Integer, ForeignKey('person.id'))
+            owner = relationship('Person', backref=backref('photos'))
+
+        self.Base.metadata.create_all()
+        response = self.app.get('/api/person/1')
+        document = loads(response.data)
+        person = document['data']
+        self.assertEqual(sorted(person['relationships']),
+                         ['articles', 'comments', 'photos'])
+
+
+class TestRelationshipLinkage(ManagerTestBase):
+    """Tests for the number of database queries issued when serializing
+    relationship objects.
+
+    """
+
+    def setUp(self):
+        super(TestRelationshipLinkage, self).setUp()
+
+        class Article(self.Base):
+            __tablename__ = 'article'
+            id = Column(Integer, primary_key=True)
+            author_id = Column(Integer, ForeignKey('person.id'))
+            author = relationship('Person', backref=backref('articles'))
+
+        class Comment(self.Base):
+            __tablename__ = 'comment'
+            id = Column(Integer, primary_key=True)
+            author_id = Column(Integer, ForeignKey('person.id'))
+            author = relationship('Person',
+                                  backref=backref('comments',
+                                                  order_by=lambda:
+                                                  Comment.id.desc()))
+
+        class Person(self.Base):
+            __tablename__ = 'person'
+            id = Column(Integer, primary_key=True)
+            parent_id = Column(Integer, ForeignKey('person.id'))
+            children = relationship('Person')
+
+        class Review(self.Base):
+            __tablename__ = 'review'
+            id = Column(Integer, primary_key=True)
+            # There is no foreign key constraint on this column.
+            reviewer_id = Column(Integer)
+            reviewer = relationship('Person', primaryjoin='foreign('
+                                    'Review.reviewer_id) == Person.id')
+
+        self.Article = Article
+        self.Comment = Comment
+        self.Person = Person
+        self.Review = Review
+        self.Base.metadata.create_all()
+        self.manager.create_api(Article)
+        self.manager.create_api(Comment)
+        self.manager.create_api(Person)
+        self.manager.create_api(Review)
+
+    def test_to_many_one_query_per_relation(self):
+        """Tests that serializing a page of resources issues one query
+        for each to-many relationship, not one query for each resource.
+
+        """
+        for i in range(1, 6):
+            person = self.Person(id=i, parent_id=1 if i > 1 else None)
+            articles = [self.Article(id=2 * i), self.Article(id=2 * i + 1)]
+            comments = [self.Comment(id=2 * i), self.Comment(id=2 * i + 1)]
+            person.articles = articles
+            person.comments = comments
+            self.session.add(person)
+        self.session.commit()
+        self.session.expunge_all()
+        with count_queries(self.engine) as statements:
+            response = self.app.get('/api/person')
+        # There should be exactly one query for each of the to-many
+        # relationships to articles and comments (instead of one for
+        # each person).
+        article_queries = [s for s in statements if 'article' in s]
+        comment_queries = [s for s in statements if 'comment' in s]
+        self.assertEqual(len(article_queries), 1)
+        self.assertEqual(len(comment_queries), 1)
+        document = loads(response.data)
+        people = document['data']
+        self.assertEqual(len(people), 5)
+        for person in people:
+            i = int(person['id'])
+            relationships = person['relationships']
+            articles = relationships['articles']['data']
+            self.assertEqual([a['id'] for a in articles],
+                             [str(2 * i), str(2 * i + 1)])
+            self.assertTrue(all(a['type'] == 'article' for a in articles))
+            # The order of the relationship must be respected.
+            comments = relationships['comments']['data']
+            self.assertEqual([c['id'] for c in comments],
+                             [str(2 * i + 1), str(2 * i)])
+            children = relationships['children']['data']
+            if i == 1:
+                self.assertEqual(sorted(c['id'] for c in children),
+                                 ['2', '3', '4', '5'])
+            else:
+                self.assertEqual(children, [])
+
+    def test_include_one_query_per_relation(self):
+        """Tests that including related resources issues one query for
+        each relationship along the include paths, not one query for
+        each resource.
+
+        """
+        for i in range(1, 6):
+            person = self.Person(id=i)
+            articles = [self.Article(id=2 * i), self.Article(id=2 * i + 1)]
+            comments = [self.Comment(id=2 * i), self.Comment(id=2 * i + 1)]
+            person.articles = articles
+            person.comments = comments
+            self.session.add(person)
+        self.session.commit()
+        self.session.expunge_all()
+        query_string = {'include': 'author,author.comments'}
+        with count_queries(self.engine) as statements:
+            response = self.app.get('/api/article', query_string=query_string)
+        # There should be exactly one query to load the authors of all
+        # the articles and one query to load the comments of all of
+        # those authors.
+        statements = [' '.join(s.split()) for s in statements]
+        author_queries = [s for s in statements if 'FROM person WHERE' in s]
+        comment_queries = [s for s in statements if 'comment' in s]
+        self.assertEqual(len(author_queries), 1)
+        self.assertEqual(len(comment_queries), 1)
+        document = loads(response.data)
+        self.assertEqual(len(document['data']), 10)
+        included = document['included']
+        people = [r for r in included if r['type'] == 'person']
+        comments = [r for r in included if r['type'] == 'comment']
+        self.assertEqual(sorted(p['id'] for p in people),
+                         [str(i) for i in range(1, 6)])
+        self.assertEqual(sorted(int(c['id']) for c in comments),
+                         list(range(2, 12)))
+
+    def test_to_one_from_foreign_key(self):
+        """Tests that serializing a to-one relationship reads the
+        primary key of the related resource from the foreign key column
+        instead of loading the related resource.
+
+        """
+        person = self.Person(id=1)
+        article1 = self.Article(id=1, author=person)
+        article2 = self.Article(id=2)
+        self.session.add_all([person, article1, article2])
+        self.session.commit()
+        self.session.expunge_all()
+        with count_queries(self.engine) as statements:
+            response = self.app.get('/api/article')
+        person_queries = [s for s in statements if 'person' in s]
+        self.assertEqual(person_queries, [])
+        document = loads(response.data)
+        article1, article2 = document['data']
+        author = article1['relationships']['author']['data']
+        self.assertEqual(author, {'id': '1', 'type': 'person'})
+        author = article2['relationships']['author']['data']
+        self.assertIsNone(author)
+
+    def test_to_one_dangling_foreign_key(self):
+        """Tests that a foreign key constraint that the database does not
+        enforce may yield a resource identifier object for a related
+        resource that does not exist, since the related resource is not
+        loaded.
+
+        """
+        # SQLite does not enforce foreign key constraints by default.
+        self.session.add(self.Article(id=1, author_id=2))
+        self.session.commit()
+        self.session.expunge_all()
+        response = self.app.get('/api/article/1')
+        document = loads(response.data)
+        author = document['data']['relationships']['author']['data']
+        self.assertEqual(author, {'id': '2', 'type': 'person'})
+
+    def test_to_one_without_foreign_key_constraint(self):
+        """Tests that a to-one relationship whose join condition is not
+        backed by a foreign key constraint is loaded, so a foreign key
+        value that refers to no row yields a null relationship.
+
+        """
+        person = self.Person(id=1)
+        review1 = self.Review(id=1, reviewer_id=1)
+        review2 = self.Review(id=2, reviewer_id=2)
+        self.session.add_all([person, review1, review2])
+        self.session.commit()
+        self.session.expunge_all()
+        response = self.app.get('/api/review')
+        document = loads(response.data)
+        review1, review2 = document['data']
+        reviewer = review1['relationships']['reviewer']['data']
+        self.assertEqual(reviewer, {'id': '1', 'type': 'person'})
+        reviewer = review2['relationships']['reviewer']['data']
+        self.assertIsNone(reviewer)
+
 
 class TestFetchRelation(ManagerTestBase):
 